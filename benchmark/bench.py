@@ -0,0 +1,227 @@
+import argparse
+import configparser
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+
+sys.path.insert(0, BENCHMARK_DIR)
+
+from corpus import Corpus  # noqa: E402
+from fakes import FakeVault, FakeKubernetes  # noqa: E402
+
+STEPS = ['init', 'up', 'auth', 'secret', 'policy', 'role', 'clean']
+PASSES = ['init', 'reconcile']
+
+
+class Benchmark(object):
+    def __init__(self, size: int, latency_ms: float, concurrency: int = None, log_level: str = 'INFO',
+                 keep: bool = False, use_async: bool = False):
+        self.__size = size
+        self.__latency_seconds = latency_ms / 1000
+        self.__concurrency = concurrency
+        self.__log_level = log_level
+        self.__keep = keep
+        self.__use_async = use_async
+
+    def __properties(self, home: str, vault: FakeVault):
+        properties = configparser.ConfigParser()
+        properties.optionxform = str
+        properties.read(os.path.join(ROOT_DIR, 'application.properties'))
+
+        section = properties['VaultProperties']
+        section['vault.address'] = vault.address
+        section['vault.ping.address'] = f'{vault.address}/v1/sys/health'
+        section['vault.ping.initialDelaySeconds'] = '0'
+        section['vault.ping.periodSeconds'] = '1'
+        section['vault.ping.log.level'] = self.__log_level
+        section['vault.client.log.level'] = self.__log_level
+        section['vault.hcl.cache.enabled'] = 'false'
+        section['vault.watch.enabled'] = 'false'
+        section['vault.trace.enabled'] = 'false'
+        section['vault.async.enabled'] = str(self.__use_async).lower()
+        section['vault.kubernetes.jwtPath'] = os.path.join(home, 'jwt')
+        section['vault.kubernetes.configPath'] = os.path.join(home, 'kubeconfig')
+
+        if self.__concurrency:
+            section['vault.apply.concurrency'] = str(self.__concurrency)
+            section['vault.async.concurrency'] = str(self.__concurrency)
+
+        with open(os.path.join(home, 'application.properties'), 'w') as f:
+            properties.write(f)
+
+    @classmethod
+    def __kubeconfig(cls, home: str, kubernetes: FakeKubernetes):
+        with open(os.path.join(home, 'kubeconfig'), 'w') as f:
+            json.dump({
+                'apiVersion': 'v1',
+                'kind': 'Config',
+                'clusters': [{'name': 'bench', 'cluster': {'server': kubernetes.address}}],
+                'users': [{'name': 'bench', 'user': {'token': 'bench'}}],
+                'contexts': [{'name': 'bench', 'context': {'cluster': 'bench', 'user': 'bench'}}],
+                'current-context': 'bench'
+            }, f)
+
+        with open(os.path.join(home, 'jwt'), 'w') as f:
+            f.write('bench-jwt')
+
+    def run(self) -> dict:
+        home = tempfile.mkdtemp(prefix=f'vault-init-bench-{self.__size}-')
+        os.makedirs(os.path.join(home, 'logs'))
+
+        result = {}
+
+        vault = FakeVault(self.__latency_seconds).start()
+        kubernetes = FakeKubernetes(Corpus.NAMESPACE, Corpus.service_accounts() + ['vault'],
+                                    self.__latency_seconds).start()
+
+        try:
+            started = time.perf_counter()
+            Corpus(home, self.__size).generate()
+            generate_seconds = time.perf_counter() - started
+
+            self.__properties(home, vault)
+            Benchmark.__kubeconfig(home, kubernetes)
+
+            env = dict(os.environ, HOME=home, VAULT_K8S_NAMESPACE=Corpus.NAMESPACE,
+                       KUBERNETES_PORT_443_TCP_ADDR='127.0.0.1')
+            result_path = os.path.join(home, 'result.json')
+
+            with open(os.path.join(home, 'logs', 'bench.log'), 'w') as log:
+                process = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', result_path],
+                                         env=env, stdout=log, stderr=subprocess.STDOUT)
+
+            if process.returncode != 0 or not os.path.isfile(result_path):
+                result = {'error': f'benchmark process exited with {process.returncode}, '
+                                   f'see {os.path.join(home, "logs", "bench.log")}'}
+            else:
+                with open(result_path) as f:
+                    result = json.load(f)
+
+            result.update({
+                'size': self.__size,
+                'latency_ms': self.__latency_seconds * 1000,
+                'async': self.__use_async,
+                'generate_seconds': generate_seconds,
+                'fake_vault_requests': vault.requests,
+                'fake_kubernetes_requests': kubernetes.requests
+            })
+
+            return result
+        finally:
+            vault.stop()
+            kubernetes.stop()
+
+            if not self.__keep and 'error' not in result:
+                shutil.rmtree(home, ignore_errors=True)
+
+
+def child(result_path: str):
+    sys.path.insert(0, SRC_DIR)
+
+    from vault import HCLConfigBundle
+
+    bundle = HCLConfigBundle('WARNING')
+    result = {'bundle_load_seconds': bundle.load_seconds}
+
+    started = time.perf_counter()
+    import run
+    result['startup_seconds'] = time.perf_counter() - started
+
+    from metrics import Metrics
+
+    def step_seconds() -> dict:
+        return {step: sum(Metrics.REGISTRY.get_sample_value('vault_init_step_duration_seconds_sum',
+                                                            {'step': step, 'state': state}) or 0
+                          for state in ('finished', 'failed')) for step in STEPS}
+
+    def vault_requests() -> int:
+        return int(sum(sample.value for metric in Metrics.REGISTRY.collect() for sample in metric.samples
+                       if sample.name == 'vault_init_vault_request_duration_seconds_count'))
+
+    for name in PASSES:
+        steps_before, requests_before = step_seconds(), vault_requests()
+
+        started = time.perf_counter()
+        ok = run.start_vault_init()
+        seconds = time.perf_counter() - started
+
+        steps_after = step_seconds()
+
+        result[name] = {
+            'ok': ok,
+            'seconds': seconds,
+            'steps': {step: steps_after[step] - steps_before[step] for step in STEPS},
+            'vault_requests': vault_requests() - requests_before
+        }
+
+    with open(result_path, 'w') as f:
+        json.dump(result, f)
+
+    from util import Logger
+
+    Logger.close()
+
+    os._exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark vault-init against local fake Vault and Kubernetes APIs.')
+    parser.add_argument('--sizes', default='10,1000,10000',
+                        help='comma separated number of policies and roles per corpus')
+    parser.add_argument('--latency-ms', type=float, default=0, help='latency injected into every fake API call')
+    parser.add_argument('--concurrency', type=int, default=None, help='overrides vault.apply.concurrency')
+    parser.add_argument('--log-level', default='INFO', help='vault-init log level during the benchmark')
+    parser.add_argument('--output', default='bench_results.json', help='file the JSON results are written to')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='run the pipeline through AsyncVaultClient')
+    parser.add_argument('--keep', action='store_true', help='keep the generated HOME directories')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child)
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'results': []
+    }
+
+    for size in [int(size) for size in args.sizes.split(',')]:
+        result = Benchmark(size, args.latency_ms, args.concurrency, args.log_level, args.keep, args.use_async).run()
+        results['results'].append(result)
+
+        if 'error' in result:
+            print(f'size={size}: {result["error"]}')
+            continue
+
+        print(f'size={size}: bundle load {result["bundle_load_seconds"]:.3f}s, startup '
+              f'{result["startup_seconds"]:.3f}s, ' +
+              ', '.join(f'{name} {result[name]["seconds"]:.3f}s ({result[name]["vault_requests"]} requests, '
+                        f'{"ok" if result[name]["ok"] else "failed"})' for name in PASSES))
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+import os
+
+
+class Corpus(object):
+    ENTRIES_PER_FILE = 10
+    SERVICE_ACCOUNTS = 10
+    NAMESPACE = 'bench'
+
+    POLICY = '''policy "{name}" {{
+  enabled = true
+
+  config {{
+    path "kv/{name}/*" {{
+      capabilities = [
+        "read",
+        "list"
+      ]
+    }}
+
+    path "sys/tools/hash" {{
+      capabilities = [
+        "update"
+      ]
+    }}
+  }}
+}}
+'''
+
+    GITHUB_ROLE = '''role "{name}" {{
+  enabled = true
+
+  auth_path = "github"
+
+  org = "bench"
+  team_name = "{name}"
+  policies = [
+    "{policy}"
+  ]
+  type = "github"
+}}
+'''
+
+    KUBE_ROLE = '''role "{name}" {{
+  enabled = true
+
+  auth_path = "dev"
+
+  bound_service_account_name = "{sa_name}"
+  bound_service_account_namespace = "{namespace}"
+  wrap_ttl = "1h"
+  policies = [
+    "{policy}"
+  ]
+  type = "kubernetes"
+}}
+'''
+
+    AUTH = '''auth "github" {
+  enabled = true
+  type = "github"
+  description = "Benchmark GitHub auth backend."
+}
+
+auth "dev" {
+  enabled = true
+  type = "kubernetes"
+  description = "Benchmark Kubernetes auth backend."
+}
+'''
+
+    SECRET = '''secret "{name}" {{
+  enabled = true
+
+  engine = "kv-v2"
+}}
+'''
+
+    def __init__(self, home: str, size: int):
+        self.__home = home
+        self.__size = size
+
+    @classmethod
+    def service_accounts(cls) -> list:
+        return [f'sa-{index}' for index in range(Corpus.SERVICE_ACCOUNTS)]
+
+    def __write(self, config_type: str, prefix: str, entries: list):
+        directory = os.path.join(self.__home, 'hcl', config_type)
+        os.makedirs(directory, exist_ok=True)
+
+        for start in range(0, len(entries), Corpus.ENTRIES_PER_FILE):
+            with open(os.path.join(directory, f'{prefix}-{start // Corpus.ENTRIES_PER_FILE:05d}.hcl'), 'w') as f:
+                f.write('\n'.join(entries[start:start + Corpus.ENTRIES_PER_FILE]))
+
+    def generate(self):
+        policies = [f'bench-policy-{index}' for index in range(self.__size)]
+
+        self.__write('policy', 'policy', [Corpus.POLICY.format(name=name) for name in policies])
+        self.__write('role', 'role', [
+            Corpus.GITHUB_ROLE.format(name=f'bench-role-{index}', policy=policy) if index % 2 else
+            Corpus.KUBE_ROLE.format(name=f'bench-role-{index}', policy=policy, namespace=Corpus.NAMESPACE,
+                                    sa_name=Corpus.service_accounts()[index % Corpus.SERVICE_ACCOUNTS])
+            for index, policy in enumerate(policies)
+        ])
+        self.__write('auth', 'auth', [Corpus.AUTH])
+        self.__write('secret', 'secret', [Corpus.SECRET.format(name=f'bench-kv-{index}')
+                                          for index in range(min(self.__size, 10))])
+
+        return self
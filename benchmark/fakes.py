@@ -0,0 +1,343 @@
+import base64
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+
+class FakeServer(object):
+    def __init__(self, latency_seconds: float = 0):
+        self.latency_seconds = latency_seconds
+        self.requests = 0
+
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def __handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+
+                with fake.lock:
+                    fake.requests += 1
+
+                if fake.latency_seconds:
+                    time.sleep(fake.latency_seconds)
+
+                fake.handle(self, self.command, urlsplit(self.path), body)
+
+            do_GET = do_PUT = do_POST = do_DELETE = do_PATCH = do_LIST = __handle
+
+        self.__server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.__server.daemon_threads = True
+        self.__server.handle_error = lambda request, client_address: None
+        self.__thread = threading.Thread(target=self.__server.serve_forever, name=type(self).__name__, daemon=True)
+
+    @property
+    def address(self) -> str:
+        return f'http://127.0.0.1:{self.__server.server_port}'
+
+    @classmethod
+    def reply(cls, handler, status: int, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else b''
+
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def handle(self, handler, method: str, url, body: dict):
+        raise NotImplementedError
+
+    def start(self):
+        self.__thread.start()
+
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.__server.shutdown()
+        self.__server.server_close()
+
+
+class FakeVault(FakeServer):
+    LIST_FIELDS = ('bound_service_account_names', 'bound_service_account_namespaces', 'policies', 'token_policies')
+
+    def __init__(self, latency_seconds: float = 0):
+        super().__init__(latency_seconds)
+
+        self.__initialized = False
+        self.__sealed = True
+        self.__shares = 0
+        self.__threshold = 0
+        self.__keys = []
+        self.__progress = set()
+
+        self.__tokens = set()
+        self.__auth_methods = {'token/': {'type': 'token', 'description': 'token based credentials'}}
+        self.__mounts = {'sys/': {'type': 'system', 'options': None}, 'cubbyhole/': {'type': 'cubbyhole',
+                                                                                   'options': None}}
+        self.__policies = {'root': '', 'default': ''}
+        self.__store = {}
+        self.__versions = {}
+
+        self.__routes = [
+            ('GET', r'sys/health', self.__health),
+            ('GET', r'sys/seal-status', self.__seal_status),
+            ('GET', r'sys/init', lambda handler, match, body: FakeServer.reply(
+                handler, 200, {'initialized': self.__initialized})),
+            ('PUT', r'sys/init', self.__init),
+            ('PUT', r'sys/unseal', self.__unseal),
+            ('GET', r'auth/token/lookup-self', self.__lookup_self),
+            ('POST', r'auth/token/renew-self', lambda handler, match, body: FakeServer.reply(
+                handler, 200, {'auth': self.__token(handler.headers.get('X-Vault-Token'))})),
+            ('POST', r'auth/kubernetes/login', self.__kubernetes_login),
+            ('GET', r'sys/auth', lambda handler, match, body: self.__listing(handler, self.__auth_methods)),
+            ('POST', r'sys/auth/(.+)/tune', self.__tune_auth),
+            ('POST', r'sys/auth/(.+)', lambda handler, match, body: self.__mount(
+                handler, self.__auth_methods, match, {'type': body.get('type'),
+                                                      'description': body.get('description')})),
+            ('DELETE', r'sys/auth/(.+)', lambda handler, match, body: self.__unmount(
+                handler, self.__auth_methods, match)),
+            ('GET', r'sys/mounts', lambda handler, match, body: self.__listing(handler, self.__mounts)),
+            ('POST', r'sys/mounts/(.+)', lambda handler, match, body: self.__mount(
+                handler, self.__mounts, match, {'type': body.get('type'), 'options': body.get('options')})),
+            ('DELETE', r'sys/mounts/(.+)', lambda handler, match, body: self.__unmount(
+                handler, self.__mounts, match)),
+            ('GET', r'sys/policy', lambda handler, match, body: FakeServer.reply(
+                handler, 200, {'policies': sorted(self.__policies), 'keys': sorted(self.__policies)})),
+            ('GET', r'sys/policy/(.+)', self.__read_policy),
+            ('PUT', r'sys/policy/(.+)', self.__write_policy),
+            ('DELETE', r'sys/policy/(.+)', self.__delete_policy),
+            ('GET', r'([^/]+)/data/(.+)', self.__read_kv),
+            ('POST', r'([^/]+)/data/(.+)', self.__write_kv),
+            ('PUT', r'([^/]+)/data/(.+)', self.__write_kv),
+            ('GET', r'([^/]+)/metadata/(.+)', self.__read_kv_metadata),
+        ]
+
+    def __health(self, handler, match, body):
+        FakeServer.reply(handler, 200, {'initialized': self.__initialized, 'sealed': self.__sealed,
+                                        'standby': False})
+
+    def __seal_status(self, handler, match=None, body=None):
+        FakeServer.reply(handler, 200, {'type': 'shamir', 'initialized': self.__initialized,
+                                        'sealed': self.__sealed, 't': self.__threshold, 'n': self.__shares,
+                                        'progress': len(self.__progress)})
+
+    def __token(self, token: str = None) -> dict:
+        with self.lock:
+            token = token or f's.{uuid.uuid4().hex}'
+            self.__tokens.add(token)
+
+        return {'client_token': token, 'lease_duration': 3600, 'renewable': True}
+
+    def __init(self, handler, match, body):
+        with self.lock:
+            if self.__initialized:
+                return FakeServer.reply(handler, 400, {'errors': ['Vault is already initialized']})
+
+            self.__initialized = True
+            self.__shares = body.get('secret_shares', 1)
+            self.__threshold = body.get('secret_threshold', 1)
+            self.__keys = [uuid.uuid4().hex for _ in range(self.__shares)]
+
+        FakeServer.reply(handler, 200, {'keys': self.__keys, 'keys_base64': self.__keys,
+                                        'root_token': self.__token()['client_token']})
+
+    def __unseal(self, handler, match, body):
+        with self.lock:
+            if body.get('key') in self.__keys:
+                self.__progress.add(body['key'])
+
+            if len(self.__progress) >= self.__threshold:
+                self.__sealed = False
+                self.__progress.clear()
+
+        self.__seal_status(handler)
+
+    def __kubernetes_login(self, handler, match, body):
+        if 'kubernetes/' not in self.__auth_methods:
+            return FakeServer.reply(handler, 400, {'errors': ['no handler for route "auth/kubernetes/login"']})
+
+        FakeServer.reply(handler, 200, {'auth': self.__token()})
+
+    def __lookup_self(self, handler, match, body):
+        if handler.headers.get('X-Vault-Token') not in self.__tokens:
+            return FakeServer.reply(handler, 403, {'errors': ['permission denied']})
+
+        FakeServer.reply(handler, 200, {'data': {'id': handler.headers.get('X-Vault-Token'), 'ttl': 3600}})
+
+    @classmethod
+    def __listing(cls, handler, entries: dict):
+        with_data = dict(entries)
+        with_data['data'] = dict(entries)
+
+        FakeServer.reply(handler, 200, with_data)
+
+    def __mount(self, handler, entries: dict, match, entry: dict):
+        with self.lock:
+            if f'{match.group(1)}/' in entries:
+                return FakeServer.reply(handler, 400, {'errors': [f'path is already in use at {match.group(1)}/']})
+
+            entries[f'{match.group(1)}/'] = entry
+
+        FakeServer.reply(handler, 204)
+
+    def __unmount(self, handler, entries: dict, match):
+        with self.lock:
+            entries.pop(f'{match.group(1)}/', None)
+
+        FakeServer.reply(handler, 204)
+
+    def __tune_auth(self, handler, match, body):
+        with self.lock:
+            if f'{match.group(1)}/' not in self.__auth_methods:
+                return FakeServer.reply(handler, 400, {'errors': ['no mount at path']})
+
+            self.__auth_methods[f'{match.group(1)}/']['description'] = body.get('description')
+
+        FakeServer.reply(handler, 204)
+
+    def __read_policy(self, handler, match, body):
+        if match.group(1) not in self.__policies:
+            return FakeServer.reply(handler, 404, {'errors': []})
+
+        FakeServer.reply(handler, 200, {'name': match.group(1), 'rules': self.__policies[match.group(1)]})
+
+    def __write_policy(self, handler, match, body):
+        with self.lock:
+            self.__policies[match.group(1)] = body.get('policy')
+
+        FakeServer.reply(handler, 204)
+
+    def __delete_policy(self, handler, match, body):
+        with self.lock:
+            self.__policies.pop(match.group(1), None)
+
+        FakeServer.reply(handler, 204)
+
+    def __read_kv(self, handler, match, body):
+        versions = self.__versions.get(match.groups(), [])
+
+        if not versions:
+            return FakeServer.reply(handler, 404, {'errors': []})
+
+        FakeServer.reply(handler, 200, {'data': {'data': versions[-1], 'metadata': {'version': len(versions)}}})
+
+    def __write_kv(self, handler, match, body):
+        with self.lock:
+            versions = self.__versions.setdefault(match.groups(), [])
+            cas = (body.get('options') or {}).get('cas')
+
+            if cas is not None and cas != len(versions):
+                return FakeServer.reply(handler, 400, {'errors': ['check-and-set parameter did not match the current '
+                                                                 'version']})
+
+            versions.append(body.get('data'))
+
+        FakeServer.reply(handler, 200, {'data': {'version': len(versions)}})
+
+    def __read_kv_metadata(self, handler, match, body):
+        if match.groups() not in self.__versions:
+            return FakeServer.reply(handler, 404, {'errors': []})
+
+        FakeServer.reply(handler, 200, {'data': {'current_version': len(self.__versions[match.groups()])}})
+
+    def handle(self, handler, method: str, url, body: dict):
+        path = url.path[len('/v1/'):] if url.path.startswith('/v1/') else url.path.lstrip('/')
+        method = 'PUT' if method == 'POST' and path in ('sys/init', 'sys/unseal') else method
+        method = 'LIST' if method == 'GET' and parse_qs(url.query).get('list', [''])[0].lower() == 'true' else method
+
+        for route_method, pattern, action in self.__routes:
+            match = re.fullmatch(pattern, path)
+
+            if route_method == method and match:
+                return action(handler, match, body)
+
+        with self.lock:
+            if method in ('POST', 'PUT'):
+                self.__store[path] = {key: value.split(',') if key in FakeVault.LIST_FIELDS and isinstance(value, str)
+                                      else value for key, value in body.items()}
+
+                return FakeServer.reply(handler, 204)
+            elif method == 'DELETE':
+                self.__store.pop(path, None)
+
+                return FakeServer.reply(handler, 204)
+            elif method == 'LIST':
+                keys = sorted({key[len(path) + 1:].split('/')[0] + ('/' if '/' in key[len(path) + 1:] else '')
+                               for key in self.__store if key.startswith(f'{path}/')})
+
+                if keys:
+                    return FakeServer.reply(handler, 200, {'data': {'keys': keys}})
+            elif path in self.__store:
+                return FakeServer.reply(handler, 200, {'data': self.__store[path]})
+
+        FakeServer.reply(handler, 404, {'errors': []})
+
+
+class FakeKubernetes(FakeServer):
+    def __init__(self, namespace: str, service_accounts: list, latency_seconds: float = 0):
+        super().__init__(latency_seconds)
+
+        self.__namespace = namespace
+        self.__secrets = [{
+            'metadata': {
+                'name': f'{sa_name}-token',
+                'namespace': namespace,
+                'resourceVersion': '1',
+                'annotations': {'kubernetes.io/service-account.name': sa_name}
+            },
+            'type': 'kubernetes.io/service-account-token',
+            'data': {
+                'token': base64.b64encode(f'jwt-{sa_name}'.encode()).decode(),
+                'ca.crt': base64.b64encode(b'-----BEGIN CERTIFICATE-----').decode()
+            }
+        } for sa_name in service_accounts]
+
+    def __watch(self, handler, timeout_seconds: float):
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Transfer-Encoding', 'chunked')
+        handler.end_headers()
+        handler.wfile.flush()
+
+        self.stopped.wait(timeout_seconds)
+
+        handler.wfile.write(b'0\r\n\r\n')
+
+    def handle(self, handler, method: str, url, body: dict):
+        query = parse_qs(url.query)
+        pod = re.fullmatch(r'/api/v1/namespaces/([^/]+)/pods/([^/]+)', url.path)
+        secrets = re.fullmatch(r'/api/v1/namespaces/([^/]+)/secrets', url.path)
+
+        if pod:
+            FakeServer.reply(handler, 200, {
+                'apiVersion': 'v1',
+                'kind': 'Pod',
+                'metadata': {'name': pod.group(2), 'namespace': pod.group(1)},
+                'spec': {'serviceAccount': 'vault', 'serviceAccountName': 'vault',
+                         'containers': [{'name': 'vault'}]}
+            })
+        elif secrets and query.get('watch', ['false'])[0] == 'true':
+            self.__watch(handler, float(query.get('timeoutSeconds', ['300'])[0]))
+        elif secrets:
+            FakeServer.reply(handler, 200, {
+                'apiVersion': 'v1',
+                'kind': 'SecretList',
+                'metadata': {'resourceVersion': '1'},
+                'items': self.__secrets if secrets.group(1) == self.__namespace else []
+            })
+        else:
+            FakeServer.reply(handler, 404, {'kind': 'Status', 'code': 404, 'message': 'not found'})
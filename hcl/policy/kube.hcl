@@ -88,6 +88,22 @@ policy "kube-internal" {
       ]
     }
 
+    # Keep the leader lock of Vault-Init replicas on the vault.lock.mount kv-v2 engine:
+    # read the record and its metadata, write it with check-and-set
+    path "vault-init/data/*" {
+      capabilities = [
+        "create",
+        "read",
+        "update"
+      ]
+    }
+
+    path "vault-init/metadata/*" {
+      capabilities = [
+        "read"
+      ]
+    }
+
     # Manage secrets engines
     path "sys/mounts/*" {
       capabilities = [
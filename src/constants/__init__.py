@@ -1 +1,2 @@
-from .constants import AppConstants, InitConstants, EnvConstants, HealthProbeConstants
+from .constants import AppConstants, InitConstants, EnvConstants, HealthProbeConstants, ReconcileConstants, \
+    NotificationConstants
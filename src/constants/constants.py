@@ -2,10 +2,14 @@ class AppConstants(object):
     DEFAULT_WEB_PORT = 5000
     DEFAULT_WS_PORT = 4000
     HOST = '127.0.0.1'
+    LOG_TAIL_LINES = 100
+    LOG_TAIL_STREAMS = 2
+    LOG_TAIL_KEEPALIVE_SECONDS = 15
 
 
 class InitConstants(object):
     INIT_STEP = 'init'
+    LEAD_STEP = 'lead'
     UP_STEP = 'up'
     AUTH_STEP = 'auth'
     SECRET_STEP = 'secret'
@@ -30,3 +34,20 @@ class HealthProbeConstants(object):
     PERIOD = 5
     SUCCESS_THRESHOLD = 1
     TIMEOUT = 3
+    CONNECT_TIMEOUT = 3
+    MAX_PERIOD = 30
+    BACKOFF_MULTIPLIER = 2
+    JITTER = 0.2
+    DEADLINE = 120
+
+
+class ReconcileConstants(object):
+    UNCHANGED = 'unchanged'
+    UPDATED = 'updated'
+    REMOVED = 'removed'
+
+
+class NotificationConstants(object):
+    QUEUE_SIZE = 1000
+    CLIENT_BUFFER_SIZE = 100
+    HISTORY_SIZE = 500
@@ -1,2 +1,3 @@
 from .exceptions import HealthProbeFailedException, StepFailedException, MessagedException
-from .vault import VaultNotReadyException, ValidationException, VaultClientNotAuthenticatedException
+from .vault import VaultNotReadyException, ValidationException, VaultClientNotAuthenticatedException, \
+    EntriesFailedException, CircuitOpenException, ExportFailedException
@@ -14,3 +14,28 @@ class ValidationException(MessagedException):
 class VaultClientNotAuthenticatedException(MessagedException):
     def __init__(self):
         super().__init__('Vault client is not authorized to work with Vault.')
+
+
+class EntriesFailedException(MessagedException):
+    def __init__(self, config_type: str, errors: dict):
+        self.__errors = errors
+        super().__init__(f'Failed to apply {len(errors)} {config_type} entries: {", ".join(sorted(errors))}')
+
+    @property
+    def errors(self) -> dict:
+        return self.__errors
+
+
+class ExportFailedException(MessagedException):
+    def __init__(self, errors: dict):
+        self.__errors = errors
+        super().__init__(f'Failed to export {len(errors)} entries: {", ".join(sorted(errors))}')
+
+    @property
+    def errors(self) -> dict:
+        return self.__errors
+
+
+class CircuitOpenException(MessagedException):
+    def __init__(self, address: str, seconds: float):
+        super().__init__(f'Vault at {address} stayed unhealthy for {seconds:.0f}s, writes were not sent.')
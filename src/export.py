@@ -0,0 +1,59 @@
+import argparse
+import atexit
+import os
+import sys
+
+from exceptions import MessagedException
+from util import Logger
+from vault import VaultClient, VaultProperties
+
+logger = Logger.getLogger('export')
+
+atexit.register(Logger.close)
+
+
+def export_target(address: str, directory: str) -> bool:
+    client = None
+
+    try:
+        client = VaultClient(address)
+        client.export_configs(directory)
+
+        return True
+    except MessagedException as e:
+        logger.error(f'Unable to export Vault configs from {address}: {e}')
+
+        return False
+    finally:
+        if client is not None:
+            client.close_client()
+
+
+def main() -> int:
+    vault_properties = VaultProperties()
+
+    parser = argparse.ArgumentParser(description='Export live Vault configs into the HCL layout.')
+    parser.add_argument('--output', default=vault_properties.vault_export_path,
+                        help='directory to write {auth,policy,role,secret} folders into')
+    parser.add_argument('--target', action='append', default=[],
+                        help='name of a vault.targets entry to export (default: all of them)')
+
+    args = parser.parse_args()
+
+    targets = vault_properties.vault_targets
+
+    if not targets:
+        return 0 if export_target(vault_properties.vault_address, args.output) else 1
+
+    unknown = set(args.target) - targets.keys()
+
+    if unknown:
+        parser.error(f'unknown targets: {", ".join(sorted(unknown))}')
+
+    exported = [export_target(targets[name], os.path.join(args.output, name)) for name in args.target or targets]
+
+    return 0 if all(exported) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,2 @@
+from .hooks import Instrumentation, Hook, Call
+from .sinks import MetricsHook, JsonLinesSink, SpanExporter
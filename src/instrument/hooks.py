@@ -0,0 +1,111 @@
+import threading
+import time
+
+
+class Call(object):
+    __slots__ = ('component', 'method', 'path', 'status', 'bytes', 'error', 'started_at', 'ended_at', 'duration',
+                 '_started')
+
+    def __init__(self, component: str, method: str, path: str):
+        self.component = component
+        self.method = method
+        self.path = path
+        self.status = None
+        self.bytes = None
+        self.error = None
+        self.started_at = time.time_ns()
+        self.ended_at = None
+        self.duration = None
+
+        self._started = time.perf_counter()
+
+    def to_dict(self) -> dict:
+        return {
+            'component': self.component,
+            'method': self.method,
+            'path': self.path,
+            'status': self.status,
+            'bytes': self.bytes,
+            'error': self.error,
+            'started_at': self.started_at,
+            'duration': self.duration
+        }
+
+
+class Hook(object):
+    def on_start(self, call: Call):
+        pass
+
+    def on_end(self, call: Call):
+        pass
+
+    def close(self):
+        pass
+
+
+class Instrumentation(object):
+    VAULT = 'vault'
+    KUBERNETES = 'kubernetes'
+
+    __lock = threading.Lock()
+    __hooks = ()
+
+    @classmethod
+    def subscribe(cls, hook: Hook):
+        with Instrumentation.__lock:
+            Instrumentation.__hooks = Instrumentation.__hooks + (hook,)
+
+        return hook
+
+    @classmethod
+    def unsubscribe(cls, hook: Hook):
+        with Instrumentation.__lock:
+            Instrumentation.__hooks = tuple(subscribed for subscribed in Instrumentation.__hooks
+                                            if subscribed is not hook)
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return bool(Instrumentation.__hooks)
+
+    @classmethod
+    def start(cls, component: str, method: str, path: str):
+        hooks = Instrumentation.__hooks
+
+        if not hooks:
+            return None
+
+        call = Call(component, method, path)
+
+        for hook in hooks:
+            try:
+                hook.on_start(call)
+            except Exception:
+                pass
+
+        return call
+
+    @classmethod
+    def end(cls, call: Call, status=None, size: int = None, error: Exception = None):
+        if call is None:
+            return
+
+        call.duration = time.perf_counter() - call._started
+        call.ended_at = call.started_at + int(call.duration * 1e9)
+        call.status = status
+        call.bytes = size
+        call.error = type(error).__name__ if error is not None else None
+
+        for hook in Instrumentation.__hooks:
+            try:
+                hook.on_end(call)
+            except Exception:
+                pass
+
+    @classmethod
+    def close(cls):
+        with Instrumentation.__lock:
+            hooks = Instrumentation.__hooks
+            Instrumentation.__hooks = ()
+
+        for hook in hooks:
+            hook.close()
@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+
+from metrics import Metrics
+from .hooks import Hook, Call, Instrumentation
+
+
+class MetricsHook(Hook):
+    def on_end(self, call: Call):
+        if call.component == Instrumentation.VAULT:
+            path = Metrics.vault_path(call.path)
+            histogram = Metrics.VAULT_REQUEST_DURATION
+        else:
+            path = Metrics.kube_path(call.path)
+            histogram = Metrics.KUBE_REQUEST_DURATION
+
+        histogram.labels(call.method, path, str(call.status or 'error')).observe(call.duration)
+
+
+class FileSink(Hook):
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.__lock = threading.Lock()
+        self.__file = open(path, 'a', encoding='utf-8')
+
+    def write(self, line: str):
+        with self.__lock:
+            if not self.__file.closed:
+                self.__file.write(line + '\n')
+
+    def close(self):
+        with self.__lock:
+            self.__file.close()
+
+
+class JsonLinesSink(FileSink):
+    def on_end(self, call: Call):
+        self.write(json.dumps(call.to_dict()))
+
+
+class SpanExporter(FileSink):
+    SPAN_KIND_CLIENT = 3
+    STATUS_OK = 1
+    STATUS_ERROR = 2
+
+    def __init__(self, path: str, service_name: str = 'vault-init', batch_size: int = 100):
+        super().__init__(path)
+
+        self.__service_name = service_name
+        self.__batch_size = batch_size
+
+        self.__lock = threading.Lock()
+        self.__spans = []
+
+    @classmethod
+    def __attribute(cls, key: str, value) -> dict:
+        return {'key': key, 'value': {'intValue': str(value)} if isinstance(value, int) else {'stringValue': value}}
+
+    @classmethod
+    def __span(cls, call: Call) -> dict:
+        attributes = [
+            SpanExporter.__attribute('http.method', call.method),
+            SpanExporter.__attribute('http.target', call.path),
+            SpanExporter.__attribute('peer.service', call.component)
+        ]
+
+        if isinstance(call.status, int):
+            attributes.append(SpanExporter.__attribute('http.status_code', call.status))
+
+        if call.bytes is not None:
+            attributes.append(SpanExporter.__attribute('http.response_content_length', call.bytes))
+
+        failed = call.error is not None or not isinstance(call.status, int) or call.status >= 400
+
+        return {
+            'traceId': os.urandom(16).hex(),
+            'spanId': os.urandom(8).hex(),
+            'name': f'{call.method} {call.path}',
+            'kind': SpanExporter.SPAN_KIND_CLIENT,
+            'startTimeUnixNano': str(call.started_at),
+            'endTimeUnixNano': str(call.ended_at),
+            'attributes': attributes,
+            'status': {'code': SpanExporter.STATUS_ERROR if failed else SpanExporter.STATUS_OK,
+                       'message': call.error or ''}
+        }
+
+    def __export(self, spans: list):
+        if not spans:
+            return
+
+        self.write(json.dumps({
+            'resourceSpans': [{
+                'resource': {'attributes': [SpanExporter.__attribute('service.name', self.__service_name)]},
+                'scopeSpans': [{'scope': {'name': self.__service_name}, 'spans': spans}]
+            }]
+        }))
+
+    def on_end(self, call: Call):
+        with self.__lock:
+            self.__spans.append(SpanExporter.__span(call))
+
+            if len(self.__spans) < self.__batch_size:
+                return
+
+            spans, self.__spans = self.__spans, []
+
+        self.__export(spans)
+
+    def close(self):
+        with self.__lock:
+            spans, self.__spans = self.__spans, []
+
+        self.__export(spans)
+
+        super().close()
+
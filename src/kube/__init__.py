@@ -1 +1 @@
-from .client import KubernetesClient
+from .client import KubernetesClient, InstrumentedApiClient
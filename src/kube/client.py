@@ -1,37 +1,214 @@
 import base64
 import os
+import threading
+import time
 
-from kubernetes import client, config
+from kubernetes import client, config, watch
+from kubernetes.client.rest import ApiException, RESTResponse
 
 from constants import EnvConstants
+from instrument import Instrumentation
 from util import Logger
 
 
+class InstrumentedApiClient(client.ApiClient):
+    def request(self, method, url, *args, **kwargs):
+        call = Instrumentation.start(Instrumentation.KUBERNETES, method, url)
+
+        if call is None:
+            return super().request(method, url, *args, **kwargs)
+
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except ApiException as e:
+            Instrumentation.end(call, e.status, error=e)
+            raise
+        except Exception as e:
+            Instrumentation.end(call, error=e)
+            raise
+
+        Instrumentation.end(call, response.status, len(response.data) if isinstance(response, RESTResponse) else None)
+
+        return response
+
+
+class SecretIndex(object):
+    SA_TOKEN_TYPE = 'kubernetes.io/service-account-token'
+    SA_NAME_ANNOTATION = 'kubernetes.io/service-account.name'
+    WATCH_TIMEOUT_SECONDS = 300
+
+    def __init__(self, core_v1_api, namespace: str, log_level: str = 'INFO'):
+        self.__log = Logger.getLogger(SecretIndex.__name__)
+        self.__log.setLevel(log_level)
+
+        self.__core_v1_api = core_v1_api
+        self.__namespace = namespace
+
+        self.__lock = threading.Lock()
+        self.__by_secret = {}
+        self.__by_account = {}
+        self.__resource_version = None
+
+        self.__watch = None
+        self.__stopped = threading.Event()
+
+        self.__list()
+
+        self.__watcher = threading.Thread(target=self.__run, name=f'{SecretIndex.__name__}-{namespace}', daemon=True)
+        self.__watcher.start()
+
+    @classmethod
+    def __decode(cls, secret) -> dict:
+        return {
+            'jwt': base64.b64decode(secret.data['token']).decode(),
+            'ca': base64.b64decode(secret.data['ca.crt']).decode(),
+        }
+
+    def __put(self, secret):
+        annotations = secret.metadata.annotations or {}
+        sa_name = annotations.get(SecretIndex.SA_NAME_ANNOTATION)
+
+        if sa_name is None or not secret.data:
+            return
+
+        self.__by_secret[secret.metadata.name] = sa_name
+        self.__by_account.setdefault(sa_name, {})[secret.metadata.name] = SecretIndex.__decode(secret)
+
+    def __remove(self, secret):
+        sa_name = self.__by_secret.pop(secret.metadata.name, None)
+
+        if sa_name is not None:
+            self.__by_account.get(sa_name, {}).pop(secret.metadata.name, None)
+
+    def __list(self):
+        secrets = self.__core_v1_api.list_namespaced_secret(namespace=self.__namespace,
+                                                            field_selector=f'type={SecretIndex.SA_TOKEN_TYPE}')
+
+        with self.__lock:
+            self.__by_secret.clear()
+            self.__by_account.clear()
+
+            for secret in secrets.items:
+                self.__put(secret)
+
+            self.__resource_version = secrets.metadata.resource_version
+
+        self.__log.debug(f'Indexed {len(self.__by_secret)} service account secrets in {self.__namespace}.')
+
+    def __run(self):
+        while not self.__stopped.is_set():
+            self.__watch = watch.Watch()
+
+            try:
+                for event in self.__watch.stream(self.__core_v1_api.list_namespaced_secret,
+                                                 namespace=self.__namespace,
+                                                 field_selector=f'type={SecretIndex.SA_TOKEN_TYPE}',
+                                                 resource_version=self.__resource_version,
+                                                 timeout_seconds=SecretIndex.WATCH_TIMEOUT_SECONDS):
+                    if event['type'] == 'ERROR':
+                        self.__log.debug(f'Secret watch in {self.__namespace} expired, re-listing.')
+                        self.__relist()
+                        break
+
+                    secret = event['object']
+
+                    with self.__lock:
+                        if event['type'] == 'DELETED':
+                            self.__remove(secret)
+                        else:
+                            self.__remove(secret)
+                            self.__put(secret)
+
+                        self.__resource_version = secret.metadata.resource_version
+            except ApiException as e:
+                if e.status != 410:
+                    self.__log.warning(f'Secret watch in {self.__namespace} failed: {e.reason}')
+
+                    self.__stopped.wait(5)
+
+                if not self.__stopped.is_set():
+                    self.__relist()
+            except Exception as e:
+                self.__log.warning(f'Secret watch in {self.__namespace} failed: {e}')
+
+                self.__stopped.wait(5)
+
+    def __relist(self):
+        try:
+            self.__list()
+        except Exception as e:
+            self.__log.warning(f'Unable to re-list secrets in {self.__namespace}: {e}')
+
+    def get(self, sa_name: str) -> dict:
+        with self.__lock:
+            secrets = self.__by_account.get(sa_name)
+
+            return dict(next(iter(secrets.values()))) if secrets else {}
+
+    def close(self):
+        self.__stopped.set()
+
+        if self.__watch is not None:
+            self.__watch.stop()
+
+
 class KubernetesClient(object):
-    def __init__(self,  log_level: str = 'INFO'):
+    def __init__(self,  log_level: str = 'INFO', config_file: str = None, pod_account_ttl: float = 60):
         self.__log = Logger.getLogger(KubernetesClient.__name__)
         self.__log.setLevel(log_level)
+        self.__log_level = log_level
 
-        if EnvConstants.K8S_ADDRESS in os.environ:
+        if config_file:
+            config.load_kube_config(config_file=config_file)
+        elif EnvConstants.K8S_ADDRESS in os.environ:
             config.load_incluster_config()
         else:
             config.load_kube_config()
 
-        self.__core_v1_api = client.CoreV1Api()
+        self.__core_v1_api = client.CoreV1Api(InstrumentedApiClient())
+
+        self.__lock = threading.Lock()
+        self.__namespace_locks = {}
+        self.__secret_indexes = {}
+        # a pod recreated under the same name can run as another service account, so lookups expire
+        self.__pod_accounts = {}
+        self.__pod_account_ttl = pod_account_ttl
+
+    def __secret_index(self, namespace: str) -> SecretIndex:
+        with self.__lock:
+            namespace_lock = self.__namespace_locks.setdefault(namespace, threading.Lock())
+
+        with namespace_lock:
+            if namespace not in self.__secret_indexes:
+                self.__secret_indexes[namespace] = SecretIndex(self.__core_v1_api, namespace, self.__log_level)
+
+            return self.__secret_indexes[namespace]
 
     def get_service_account_name_for_pod(self, pod_name: str, namespace: str):
+        with self.__lock:
+            sa_name, expires_at = self.__pod_accounts.get((namespace, pod_name), (None, 0))
+
+            if time.monotonic() < expires_at:
+                return sa_name
+
         pod = self.__core_v1_api.read_namespaced_pod(pod_name, namespace)
+        sa_name = pod.spec.service_account if pod else None
+
+        with self.__lock:
+            self.__pod_accounts[(namespace, pod_name)] = (sa_name, time.monotonic() + self.__pod_account_ttl)
+
+        return sa_name
 
-        return pod.spec.service_account if pod else None
+    def get_pods(self, namespace: str, label_selector: str) -> list:
+        return self.__core_v1_api.list_namespaced_pod(namespace, label_selector=label_selector).items
 
     def get_service_account_secrets(self, sa_name: str, namespace: str):
-        secrets = self.__core_v1_api.list_namespaced_secret(namespace=namespace)
+        return self.__secret_index(namespace).get(sa_name)
 
-        for secret in secrets.items:
-            if secret.metadata.annotations['kubernetes.io/service-account.name'] == sa_name:
-                return {
-                    'jwt': base64.b64decode(secret.data['token']).decode(),
-                    'ca': base64.b64decode(secret.data['ca.crt']).decode(),
-                }
+    def close(self):
+        with self.__lock:
+            for index in self.__secret_indexes.values():
+                index.close()
 
-        return {}
+            self.__secret_indexes.clear()
+            self.__pod_accounts.clear()
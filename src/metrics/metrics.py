@@ -0,0 +1,90 @@
+from typing import Final
+from urllib.parse import urlsplit
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+
+class Metrics(object):
+    NAMESPACE: Final = 'vault_init'
+    API_BUCKETS: Final = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+    STEP_BUCKETS: Final = (.1, .5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+    REGISTRY: Final = CollectorRegistry()
+
+    STEP_DURATION: Final = Histogram('step_duration_seconds', 'Time spent running an init step.',
+                                     ['step', 'state'], namespace=NAMESPACE, buckets=STEP_BUCKETS,
+                                     registry=REGISTRY)
+    VAULT_REQUEST_DURATION: Final = Histogram('vault_request_duration_seconds', 'Latency of Vault API calls.',
+                                              ['method', 'path', 'status'], namespace=NAMESPACE,
+                                              buckets=API_BUCKETS, registry=REGISTRY)
+    KUBE_REQUEST_DURATION: Final = Histogram('kubernetes_request_duration_seconds',
+                                             'Latency of Kubernetes API calls.', ['method', 'path', 'status'],
+                                             namespace=NAMESPACE, buckets=API_BUCKETS, registry=REGISTRY)
+    ENTRIES_APPLIED: Final = Counter('entries_applied_total', 'HCL entries reconciled against Vault.',
+                                     ['config_type', 'action'], namespace=NAMESPACE, registry=REGISTRY)
+    PROBE_ATTEMPTS: Final = Counter('health_probe_attempts_total', 'Health probe attempts.',
+                                    ['probe', 'result'], namespace=NAMESPACE, registry=REGISTRY)
+    NODE_SEALED: Final = Gauge('node_sealed', 'Whether a Vault replica is sealed (1) or unsealed (0).', ['address'],
+                               namespace=NAMESPACE, registry=REGISTRY)
+    VAULT_CONCURRENCY_LIMIT: Final = Gauge('vault_concurrency_limit',
+                                           'Current adaptive limit of in-flight Vault calls.', ['address'],
+                                           namespace=NAMESPACE, registry=REGISTRY)
+    VAULT_CIRCUIT_OPEN: Final = Gauge('vault_circuit_open', 'Whether Vault writes are paused by the circuit breaker.',
+                                      ['address'], namespace=NAMESPACE, registry=REGISTRY)
+    VAULT_RETRIES: Final = Counter('vault_request_retries_total', 'Vault API calls retried.', ['reason'],
+                                   namespace=NAMESPACE, registry=REGISTRY)
+    PROBE_TIME_TO_READY: Final = Gauge('health_probe_time_to_ready_seconds',
+                                       'Time until the last health probe succeeded.', ['probe'],
+                                       namespace=NAMESPACE, registry=REGISTRY)
+    SNAPSHOT_LOOKUPS: Final = Counter('snapshot_lookups_total', 'Vault state reads served from the snapshot (hit) '
+                                      'or loaded from Vault (miss).', ['key', 'result'], namespace=NAMESPACE,
+                                      registry=REGISTRY)
+    NOTIFICATION_QUEUE_DEPTH: Final = Gauge('notification_queue_depth',
+                                            'Step updates waiting to be dispatched to the UI clients.',
+                                            namespace=NAMESPACE, registry=REGISTRY)
+    NOTIFICATION_CLIENT_DEPTH: Final = Gauge('notification_client_queue_depth_max',
+                                             'Step updates waiting for the slowest UI client.',
+                                             namespace=NAMESPACE, registry=REGISTRY)
+    NOTIFICATION_CLIENTS: Final = Gauge('notification_clients', 'Connected UI clients.', namespace=NAMESPACE,
+                                        registry=REGISTRY)
+    NOTIFICATION_DROPPED: Final = Counter('notification_dropped_total',
+                                          'Step updates dropped from the queue and UI clients dropped for lagging.',
+                                          ['kind'], namespace=NAMESPACE, registry=REGISTRY)
+
+    @classmethod
+    def vault_path(cls, url: str) -> str:
+        segments = [segment for segment in url.split('?')[0].split('/') if segment]
+
+        if segments and segments[0] == 'v1':
+            segments = segments[1:]
+
+        if not segments:
+            return '/'
+
+        if segments[0] == 'sys':
+            templated = segments[:2] + [':name'] * min(1, len(segments) - 2)
+        elif segments[0] == 'auth':
+            templated = segments[:1] + [':mount'] * min(1, len(segments) - 1) + segments[2:3] + \
+                        [':name'] * min(1, len(segments) - 3)
+        else:
+            templated = [':mount'] + [':path'] * min(1, len(segments) - 1)
+
+        return '/' + '/'.join(templated)
+
+    @classmethod
+    def kube_path(cls, url: str) -> str:
+        segments = [segment for segment in urlsplit(url).path.split('/') if segment]
+        resource = 3 if segments[:1] == ['apis'] else 2
+
+        if segments[resource:resource + 1] == ['namespaces'] and len(segments) > resource + 2:
+            segments[resource + 1] = ':namespace'
+            resource += 2
+
+        if len(segments) > resource + 1:
+            segments[resource + 1] = ':name'
+
+        return '/' + '/'.join(segments)
+
+    @classmethod
+    def exposition(cls) -> tuple:
+        return generate_latest(Metrics.REGISTRY), CONTENT_TYPE_LATEST
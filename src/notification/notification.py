@@ -1,15 +1,249 @@
+import json
+import socket
+import threading
+from collections import OrderedDict, deque
+
+from constants import NotificationConstants
+from metrics import Metrics
+from util import Logger
+
+
+class ClientChannel(object):
+    def __init__(self, client: dict, server, buffer_size: int, on_overflow):
+        self.__client = client
+        self.__server = server
+        self.__buffer_size = buffer_size
+        self.__on_overflow = on_overflow
+
+        self.__pending = OrderedDict()
+        self.__condition = threading.Condition()
+        self.__closed = False
+
+        self.__sender = threading.Thread(target=self.__run, name=f'{ClientChannel.__name__}-{client["id"]}',
+                                         daemon=True)
+        self.__sender.start()
+
+    @property
+    def depth(self) -> int:
+        with self.__condition:
+            return len(self.__pending)
+
+    def offer(self, key, message: str):
+        with self.__condition:
+            if self.__closed:
+                return
+
+            self.__pending[key] = message
+            self.__pending.move_to_end(key)
+
+            overflow = len(self.__pending) > self.__buffer_size
+
+            self.__condition.notify()
+
+        if overflow:
+            self.__on_overflow(self.__client)
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while not self.__pending and not self.__closed:
+                    self.__condition.wait()
+
+                if self.__closed:
+                    return
+
+                _, message = self.__pending.popitem(last=False)
+
+            try:
+                self.__server.send_message(self.__client, message)
+            except Exception:
+                self.__on_overflow(self.__client)
+
+    def close(self):
+        with self.__condition:
+            self.__closed = True
+            self.__pending.clear()
+            self.__condition.notify()
+
+        try:
+            self.__client['handler'].keep_alive = False
+            self.__client['handler'].request.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
+
+
 class NotificationEngine(object):
-    def __init__(self, output):
+    REPLAY_KEY = (None, 'replay')
+
+    def __init__(self, server, queue_size: int = NotificationConstants.QUEUE_SIZE,
+                 client_buffer_size: int = NotificationConstants.CLIENT_BUFFER_SIZE,
+                 history_size: int = NotificationConstants.HISTORY_SIZE):
+        self.__log = Logger.getLogger(NotificationEngine.__name__)
+
         self.__last = None
-        self.__output = output
+        self.__server = server
+        self.__queue_size = queue_size
+        self.__client_buffer_size = client_buffer_size
+
+        self.__queue = OrderedDict()
+        self.__condition = threading.Condition()
+        self.__sequence = 0
+
+        self.__history = deque(maxlen=history_size)
+        self.__state = {}
+
+        self.__clients_lock = threading.Lock()
+        self.__clients = {}
+        self.__live = set()
+
+        self.__dropped_messages = 0
+        self.__dropped_clients = 0
+
+        Metrics.NOTIFICATION_QUEUE_DEPTH.set_function(lambda: self.queue_depth)
+        Metrics.NOTIFICATION_CLIENT_DEPTH.set_function(lambda: max(self.client_depths.values(), default=0))
+        Metrics.NOTIFICATION_CLIENTS.set_function(lambda: len(self.client_depths))
+
+        self.__server.set_fn_new_client(lambda client, _: self.__connect(client))
+        self.__server.set_fn_client_left(lambda client, _: self.__disconnect(client))
+        self.__server.set_fn_message_received(lambda client, _, message: self.__replay(client, message))
+
+        self.__dispatcher = threading.Thread(target=self.__run, name=NotificationEngine.__name__, daemon=True)
+        self.__dispatcher.start()
+
+    def __connect(self, client: dict):
+        channel = ClientChannel(client, self.__server, self.__client_buffer_size, self.__drop)
+
+        with self.__clients_lock:
+            self.__clients[client['id']] = channel
+
+    def __disconnect(self, client: dict):
+        if client is None:
+            return
+
+        with self.__clients_lock:
+            channel = self.__clients.pop(client['id'], None)
+            self.__live.discard(client['id'])
+
+        if channel is not None:
+            channel.close()
+
+    def __replay(self, client: dict, message: str):
+        try:
+            since = int(json.loads(message).get('since', -1))
+        except (ValueError, TypeError, AttributeError):
+            self.__log.debug(f'Ignoring unexpected message from notification client {client["id"]}.')
+            return
 
-    def notify(self, message: str):
-        self.__output(message)
-        self.__last = message
+        with self.__clients_lock:
+            channel = self.__clients.get(client['id'])
 
-    def emit_last(self):
-        return self.__output(self.__last)
+        if channel is None:
+            return
+
+        with self.__condition:
+            if 0 <= since <= self.__sequence and (since == self.__sequence or self.__history[0][0] <= since + 1):
+                updates = {}
+
+                for sequence, update in self.__history:
+                    if sequence > since:
+                        updates.update(update)
+
+                replay = json.dumps({'seq': self.__sequence, 'replay': True, 'steps': updates})
+            else:
+                replay = json.dumps({'seq': self.__sequence, 'replay': True, 'snapshot': True, 'steps': self.__state})
+
+            channel.offer(NotificationEngine.REPLAY_KEY, replay)
+
+            # live deltas start after the replay, and the ones it already covers are dropped by their seq
+            with self.__clients_lock:
+                if client['id'] in self.__clients:
+                    self.__live.add(client['id'])
+
+    def __drop(self, client: dict):
+        with self.__clients_lock:
+            if client['id'] not in self.__clients:
+                return
+
+            self.__dropped_clients += 1
+
+        Metrics.NOTIFICATION_DROPPED.labels('client').inc()
+
+        self.__log.warning(f'Dropping notification client {client["id"]} since it fell too far behind.')
+
+        self.__disconnect(client)
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while not self.__queue:
+                    self.__condition.wait()
+
+                key, message = self.__queue.popitem(last=False)
+
+            with self.__clients_lock:
+                channels = [self.__clients[client_id] for client_id in self.__live]
+
+            for channel in channels:
+                channel.offer(key, message)
+
+    def notify(self, update: dict, key: str = None):
+        with self.__condition:
+            self.__sequence += 1
+
+            self.__history.append((self.__sequence, update))
+            self.__state.update(update)
+
+            message = json.dumps({'seq': self.__sequence, 'steps': update})
+            queue_key = (key, self.__sequence if key is None else None)
+
+            self.__queue[queue_key] = message
+            self.__queue.move_to_end(queue_key)
+
+            if len(self.__queue) > self.__queue_size:
+                self.__queue.popitem(last=False)
+                self.__dropped_messages += 1
+
+                Metrics.NOTIFICATION_DROPPED.labels('message').inc()
+
+            self.__last = message
+
+            self.__condition.notify()
+
+    def snapshot(self) -> str:
+        with self.__condition:
+            return json.dumps({'seq': self.__sequence, 'snapshot': True, 'steps': self.__state})
 
     @property
     def last(self):
         return self.__last
+
+    @property
+    def sequence(self) -> int:
+        return self.__sequence
+
+    @property
+    def queue_depth(self) -> int:
+        with self.__condition:
+            return len(self.__queue)
+
+    @property
+    def client_depths(self) -> dict:
+        with self.__clients_lock:
+            return {client_id: channel.depth for client_id, channel in self.__clients.items()}
+
+    @property
+    def dropped_messages(self) -> int:
+        return self.__dropped_messages
+
+    @property
+    def dropped_clients(self) -> int:
+        return self.__dropped_clients
+
+    def stats(self) -> dict:
+        return {
+            'sequence': self.__sequence,
+            'queue_depth': self.queue_depth,
+            'client_depths': self.client_depths,
+            'dropped_messages': self.__dropped_messages,
+            'dropped_clients': self.__dropped_clients
+        }
@@ -1,33 +1,72 @@
 import atexit
+import json
 import logging
 import os
 import threading
-from time import sleep
 
-from flask import Flask, render_template
+from flask import Flask, Response, render_template, jsonify, request
 from waitress import serve
 from websocket_server import WebsocketServer
 
 from constants import AppConstants, InitConstants, EnvConstants
-from exceptions import StepFailedException
+from instrument import Instrumentation, MetricsHook, JsonLinesSink, SpanExporter
+from metrics import Metrics
 from notification import NotificationEngine
-from util import Steps, Chain
-from vault import VaultClient
+from util import Steps, StepGraph, Logger
+from vault import VaultClient, AsyncVaultClient, VaultProperties, ConfigType, HCLWatcher, VaultTargets
 
 app = Flask(__name__, static_folder=f'{os.environ[EnvConstants.HOME]}/src/templates/frontend')
 socket: WebsocketServer = WebsocketServer(AppConstants.DEFAULT_WS_PORT, host=AppConstants.HOST, loglevel=logging.ERROR)
 
-vault = VaultClient()
+vault_properties = VaultProperties()
 
-notifications_engine: NotificationEngine = NotificationEngine(socket.send_message_to_all)
+Instrumentation.subscribe(MetricsHook())
 
-steps: Steps = Steps().step(InitConstants.INIT_STEP) \
-    .step(InitConstants.UP_STEP) \
-    .step(InitConstants.AUTH_STEP) \
-    .step(InitConstants.SECRET_STEP) \
-    .step(InitConstants.POLICY_STEP) \
-    .step(InitConstants.ROLE_STEP) \
-    .step(InitConstants.CLEAN_STEP)
+if vault_properties.vault_trace_enabled:
+    Instrumentation.subscribe(SpanExporter(vault_properties.vault_trace_path)
+                              if vault_properties.vault_trace_format == 'otlp'
+                              else JsonLinesSink(vault_properties.vault_trace_path))
+
+logger = Logger.getLogger('run')
+
+notifications_engine: NotificationEngine = NotificationEngine(socket)
+
+log_tails = threading.BoundedSemaphore(AppConstants.LOG_TAIL_STREAMS)
+
+
+def init_steps() -> Steps:
+    return Steps().step(InitConstants.INIT_STEP) \
+        .step(InitConstants.LEAD_STEP) \
+        .step(InitConstants.UP_STEP) \
+        .step(InitConstants.AUTH_STEP) \
+        .step(InitConstants.SECRET_STEP) \
+        .step(InitConstants.POLICY_STEP) \
+        .step(InitConstants.ROLE_STEP) \
+        .step(InitConstants.CLEAN_STEP)
+
+
+if vault_properties.vault_targets:
+    targets = VaultTargets(vault_properties.vault_targets, init_steps, notifications_engine.notify)
+    vault = pipeline = steps = None
+
+    targets.notify_all()
+else:
+    targets = None
+    vault = VaultClient()
+    pipeline = AsyncVaultClient(vault.reconciler, vault.token_manager,
+                                on_root_token=vault.adopt_root_token, limiter=vault.limiter).blocking() \
+        if vault_properties.vault_async_enabled else vault
+    steps: Steps = init_steps().with_checkpoint(vault.checkpoint)
+
+    notifications_engine.notify(steps.to_dict())
+
+watch_steps = [
+    (ConfigType.AUTH, InitConstants.AUTH_STEP, lambda client, names: client.enable_auth_backends(names), []),
+    (ConfigType.SECRET, InitConstants.SECRET_STEP, lambda client, names: client.enable_secrets(names), []),
+    (ConfigType.POLICY, InitConstants.POLICY_STEP, lambda client, names: client.apply_policies(names), []),
+    (ConfigType.ROLE, InitConstants.ROLE_STEP, lambda client, names: client.apply_auth_roles(names),
+     [(ConfigType.AUTH, InitConstants.AUTH_STEP)])
+]
 
 
 @app.route('/')
@@ -35,73 +74,212 @@ def index():
     return render_template('index.html')
 
 
-def __wait_for_vault():
-    for _ in range(3):
-        if not vault.is_running():
-            sleep(30)
-        else:
-            return True
-
-    return False
-
-
-def __read_last_trace():
-    with open('{0}/logs/app.log'.format(os.environ[EnvConstants.HOME]), 'r') as f:
-        return f.readlines()[-1]
-
-
-def start_vault_init():
-    Chain.fill(steps.state(InitConstants.INIT_STEP, InitConstants.ACTIVE_STATE)) \
-        .then(lambda state: notifications_engine.notify(state.to_str())) \
-        .then(lambda _: Chain.resolve(steps.state(InitConstants.INIT_STEP, InitConstants.FINISHED_STATE)) if vault.init_vault() else Chain.reject(
-            StepFailedException(InitConstants.INIT_STEP, "Vault wasn't unsealed or not started"))) \
-        .then(lambda state: notifications_engine.notify(state.to_str())) \
-        .then(lambda _: Chain.resolve(steps.state(InitConstants.UP_STEP, InitConstants.ACTIVE_STATE))) \
-        .then(lambda state: notifications_engine.notify(state.to_str())) \
-        .then(lambda _: Chain.resolve(steps.state(InitConstants.UP_STEP, InitConstants.FINISHED_STATE)) if __wait_for_vault() else Chain.reject(
-            StepFailedException(InitConstants.UP_STEP, "Vault can't start"))) \
-        .then(lambda state: notifications_engine.notify(state.to_str())) \
-        .then(lambda _: Chain.resolve(steps.state(InitConstants.AUTH_STEP, InitConstants.ACTIVE_STATE))) \
-        .then(lambda state: notifications_engine.notify(state.to_str())) \
-        .then(lambda _: Chain.resolve(steps.state(InitConstants.AUTH_STEP, InitConstants.FINISHED_STATE)) if vault.enable_auth_backends() else Chain.reject(
-            StepFailedException(InitConstants.AUTH_STEP, "Vault wasn't unsealed or not started or internal authentication failed"))) \
-        .then(lambda state: notifications_engine.notify(state.to_str())) \
-        .then(lambda _: Chain.resolve(steps.state(InitConstants.SECRET_STEP, InitConstants.ACTIVE_STATE))) \
-        .then(lambda state: notifications_engine.notify(state.to_str())) \
-        .then(lambda _: Chain.resolve(steps.state(InitConstants.SECRET_STEP, InitConstants.FINISHED_STATE)) if vault.enable_secrets() else Chain.reject(
-            StepFailedException(InitConstants.SECRET_STEP, "Vault wasn't unsealed or not started or internal authentication failed"))) \
-        .then(lambda state: notifications_engine.notify(state.to_str())) \
-        .then(lambda _: Chain.resolve(steps.state(InitConstants.POLICY_STEP, InitConstants.ACTIVE_STATE))) \
-        .then(lambda state: notifications_engine.notify(state.to_str())) \
-        .then(lambda _: Chain.resolve(steps.state(InitConstants.POLICY_STEP, InitConstants.FINISHED_STATE)) if vault.apply_policies() else Chain.reject(
-            StepFailedException(InitConstants.POLICY_STEP, "Vault wasn't unsealed or not started or internal authentication failed"))) \
-        .then(lambda state: notifications_engine.notify(state.to_str())) \
-        .then(lambda _: Chain.resolve(steps.state(InitConstants.ROLE_STEP, InitConstants.ACTIVE_STATE))) \
-        .then(lambda state: notifications_engine.notify(state.to_str())) \
-        .then(lambda _: Chain.resolve(steps.state(InitConstants.ROLE_STEP, InitConstants.FINISHED_STATE)) if vault.apply_auth_roles() else Chain.reject(
-            StepFailedException(InitConstants.ROLE_STEP, "Vault wasn't unsealed or not started or internal authentication failed"))) \
-        .then(lambda state: notifications_engine.notify(state.to_str())) \
-        .then(lambda _: Chain.resolve(steps.state(InitConstants.CLEAN_STEP, InitConstants.ACTIVE_STATE))) \
-        .then(lambda state: notifications_engine.notify(state.to_str())) \
-        .then(lambda _: Chain.resolve(steps.state(InitConstants.CLEAN_STEP, InitConstants.FINISHED_STATE)) if vault.void_root_token() else Chain.reject(
-            StepFailedException(InitConstants.CLEAN_STEP, "Resources were busy - not able to perform cleaning"))) \
-        .then(lambda state: notifications_engine.notify(state.to_str())) \
-        .catch(lambda e: notifications_engine.notify(steps.trace_last(InitConstants.FAILED_STATE, __read_last_trace()).to_str())) \
-        .done()
+@app.route('/metrics')
+def metrics():
+    payload, content_type = Metrics.exposition()
+
+    return Response(payload, content_type=content_type)
+
+
+@app.route('/health/nodes')
+def health_nodes():
+    if targets is not None:
+        return jsonify({target.name: target.client.cluster.health() for target in targets.targets
+                        if target.client is not None})
+
+    return jsonify(vault.cluster.health())
+
+
+@app.route('/notifications')
+def notifications_status():
+    return jsonify(notifications_engine.stats())
+
+
+@app.route('/targets')
+def targets_status():
+    return jsonify(targets.status() if targets is not None else {})
+
+
+@app.route('/logs')
+def logs_tail():
+    step = request.args.get('step')
+    lines = request.args.get('lines', AppConstants.LOG_TAIL_LINES, type=int)
+
+    if request.args.get('follow', 'true').lower() != 'true':
+        return jsonify(Logger.buffer.tail(step, lines))
+
+    # every follower holds a waitress thread, so they are capped to keep the UI responsive
+    if not log_tails.acquire(blocking=False):
+        return jsonify({'error': 'Too many log tails are open, try again later'}), 429
+
+    def stream():
+        sequence = Logger.buffer.sequence
+        entries = [entry for entry in Logger.buffer.tail(step, lines) if entry['sequence'] <= sequence]
+
+        while True:
+            for entry in entries:
+                yield f'data: {json.dumps(entry)}\n\n'
+
+            if not entries:
+                yield ': keep-alive\n\n'
+
+            entries, sequence = Logger.buffer.since(sequence, step, AppConstants.LOG_TAIL_KEEPALIVE_SECONDS)
+
+    response = Response(stream(), content_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
+    response.call_on_close(log_tails.release)
+
+    return response
+
+
+def __fail_step(client_steps: Steps, notify):
+    return lambda step, e: notify(client_steps.trace(step, InitConstants.FAILED_STATE).delta(step), step)
+
+
+def __lead(leader: VaultClient, client_steps: Steps, step: str, action):
+    def run() -> bool:
+        while not leader.lock.leading:
+            followed = leader.lock.follow(step, leader.config_bundle.digest)
+
+            if followed is not None:
+                return followed
+
+            if not leader.lock.elect(client_steps, leader.config_bundle.digest):
+                return False
+
+        return action()
+
+    return run
+
+
+def __publish(leader: VaultClient, notify):
+    def run(update: dict, key: str = None):
+        notify(update, key)
+        leader.lock.touch()
+
+    return run
+
+
+def init_graph(client, leader: VaultClient, client_steps: Steps, notify) -> StepGraph:
+    lead = lambda step, action: __lead(leader, client_steps, step, action)
+
+    return StepGraph(client_steps, __publish(leader, notify)) \
+        .node(InitConstants.INIT_STEP, client.init_vault,
+              "Vault wasn't unsealed or not started") \
+        .node(InitConstants.LEAD_STEP, lambda: leader.lock.elect(client_steps, leader.config_bundle.digest),
+              "Leader election timed out", InitConstants.INIT_STEP) \
+        .node(InitConstants.UP_STEP, client.wait_until_running,
+              "Vault can't start", InitConstants.LEAD_STEP) \
+        .node(InitConstants.AUTH_STEP, lead(InitConstants.AUTH_STEP, client.enable_auth_backends),
+              "Vault wasn't unsealed or not started or internal authentication failed", InitConstants.UP_STEP,
+              resumable=True) \
+        .node(InitConstants.SECRET_STEP, lead(InitConstants.SECRET_STEP, client.enable_secrets),
+              "Vault wasn't unsealed or not started or internal authentication failed", InitConstants.UP_STEP,
+              resumable=True) \
+        .node(InitConstants.POLICY_STEP, lead(InitConstants.POLICY_STEP, client.apply_policies),
+              "Vault wasn't unsealed or not started or internal authentication failed", InitConstants.UP_STEP,
+              resumable=True) \
+        .node(InitConstants.ROLE_STEP, lead(InitConstants.ROLE_STEP, client.apply_auth_roles),
+              "Vault wasn't unsealed or not started or internal authentication failed", InitConstants.AUTH_STEP,
+              resumable=True) \
+        .node(InitConstants.CLEAN_STEP, lambda: leader.void_root_token() and client.void_root_token(),
+              "Resources were busy - not able to perform cleaning",
+              InitConstants.SECRET_STEP, InitConstants.POLICY_STEP, InitConstants.ROLE_STEP) \
+        .catch(__fail_step(client_steps, notify))
+
+
+def changes_graph(client, leader: VaultClient, client_steps: Steps, notify, changes: dict) -> StepGraph:
+    graph = StepGraph(client_steps, __publish(leader, notify))
+
+    for config_type, step, action, requires in watch_steps:
+        if config_type in changes:
+            # followers wait on the leader's state of this step, not on the one left by the last run
+            notify(client_steps.step(step).delta(step), step)
+
+            graph.node(step, __lead(leader, client_steps, step,
+                                    lambda names=changes[config_type], apply=action: apply(client, names)),
+                       "Vault wasn't unsealed or not started or internal authentication failed",
+                       *[required for required_type, required in requires if required_type in changes])
+
+    return graph.catch(__fail_step(client_steps, notify))
+
+
+def run_init(client, leader: VaultClient, client_steps: Steps, notify) -> bool:
+    succeeded = init_graph(client, leader, client_steps, notify).run()
+
+    leader.lock.release(succeeded)
+
+    if not succeeded:
+        return False
+
+    leader.checkpoint.complete()
+
+    return True
+
+
+def run_changes(client, leader: VaultClient, client_steps: Steps, notify, changes: dict) -> bool:
+    succeeded = changes_graph(client, leader, client_steps, notify, changes).run()
+
+    leader.lock.release(succeeded)
+
+    return succeeded
+
+
+def start_vault_init() -> bool:
+    if targets is not None:
+        return targets.run(lambda target: run_init(target.pipeline, target.client, target.steps, target.notify))
+
+    return run_init(pipeline, vault, steps, notifications_engine.notify)
+
+
+def apply_changes(changes: dict) -> bool:
+    if targets is not None:
+        return targets.run(lambda target: run_changes(target.pipeline, target.client, target.steps, target.notify,
+                                                      changes))
+
+    return run_changes(pipeline, vault, steps, notifications_engine.notify, changes)
+
+
+def start_vault_watch():
+    source = targets if targets is not None else vault
+    watcher = HCLWatcher(source.config_paths, vault_properties.vault_watch_poll_seconds,
+                         vault_properties.vault_watch_debounce_seconds, vault_properties.vault_client_log_level)
+
+    while True:
+        try:
+            changes = source.reload_configs(watcher.wait())
+        except Exception as e:
+            logger.error(f'Unable to reload HCL configs: {e}')
+            continue
+
+        if changes:
+            apply_changes(changes)
+
+
+def start_vault():
+    if start_vault_init() and vault_properties.vault_watch_enabled:
+        start_vault_watch()
 
 
 def start_socket():
-    socket.set_fn_new_client(lambda client, server: server.send_message(client, notifications_engine.last))
     socket.run_forever()
 
 
-atexit.register(vault.close_client)
+atexit.register(Logger.close)
+atexit.register(Instrumentation.close)
+
+if targets is not None:
+    atexit.register(targets.close)
+else:
+    atexit.register(vault.close_client)
+
+    if pipeline is not vault:
+        atexit.register(pipeline.close_client)
 
 if __name__ == "__main__":
     websocket_task = threading.Thread(target=start_socket)
     websocket_task.setDaemon(True)
 
-    vault_task = threading.Thread(target=start_vault_init)
+    vault_task = threading.Thread(target=start_vault)
     vault_task.setDaemon(True)
 
     websocket_task.start()
@@ -1,37 +1,85 @@
-var socket = new WebSocket("ws://localhost:4000");
+var lastSeq = -1;
 
-const App = () => {
-    const [steps, setSteps] = React.useState({});
+const connect = (onMessage) => {
+    const socket = new WebSocket("ws://localhost:4000");
+
+    let replayed = false;
+
+    socket.onopen = function() {
+        socket.send(JSON.stringify({since: lastSeq}));
+    };
 
     socket.onmessage = function(event) {
-        setSteps(JSON.parse(event.data));
+        const message = JSON.parse(event.data);
+
+        // deltas only apply on top of this connection's replay, which may also be a snapshot after a restart
+        if (message.replay) {
+            replayed = true;
+        } else if (!replayed || message.seq <= lastSeq) {
+            return;
+        }
+
+        lastSeq = message.seq;
+        onMessage(message);
     };
 
+    socket.onclose = function() {
+        setTimeout(() => connect(onMessage), 1000);
+    };
+};
+
+const STEPS = ["init", "lead", "up", "auth", "secret", "policy", "role", "clean"];
+
+const StepList = (props) => {
     return (
         <Steps>
-            <Step title={i18next.t("step.init.title")}
-                  type={steps.init ? steps.init.state : StepType.none}
-                  description={steps.init && steps.init.state === "failed" && steps.init.trace ? steps.init.trace : i18next.t("step.init.description")} />
-            <Step title={i18next.t("step.up.title")}
-                  type={steps.up ? steps.up.state : StepType.none}
-                  description={steps.init && steps.up.state === "failed" && steps.up.trace ? steps.up.trace : i18next.t("step.up.description")} />
-            <Step title={i18next.t("step.auth.title")}
-                  type={steps.auth ? steps.auth.state : StepType.none}
-                  description={steps.init && steps.auth.state === "failed" && steps.auth.trace ? steps.auth.trace : i18next.t("step.auth.description")} />
-            <Step title={i18next.t("step.secret.title")}
-                  type={steps.secret ? steps.secret.state : StepType.none}
-                  description={steps.secret && steps.secret.state === "failed" && steps.secret.trace ? steps.secret.trace : i18next.t("step.secret.description")} />
-            <Step title={i18next.t("step.policy.title")}
-                  type={steps.policy ? steps.policy.state : StepType.none}
-                  description={steps.policy && steps.policy.state === "failed" && steps.policy.trace ? steps.policy.trace : i18next.t("step.policy.description")} />
-            <Step title={i18next.t("step.role.title")}
-                  type={steps.role ? steps.role.state : StepType.none}
-                  description={steps.role && steps.role.state === "failed" && steps.role.trace ? steps.role.trace : i18next.t("step.role.description")} />
-            <Step title={i18next.t("step.clean.title")}
-                  type={steps.clean ? steps.clean.state : StepType.none}
-                  description={steps.clean && steps.clean.state === "failed" && steps.clean.trace ? steps.clean.trace : i18next.t("step.clean.description")} />
+            {STEPS.map((name) => {
+                const step = props.steps[name];
+
+                return <Step key={name}
+                             title={i18next.t(`step.${name}.title`)}
+                             type={step ? step.state : StepType.none}
+                             description={step && step.state === "failed" && step.trace ? step.trace : i18next.t(`step.${name}.description`)} />;
+            })}
         </Steps>
-     );
+    );
 };
-  
-ReactDOM.render(<App/>, document.getElementById("app"));
\ No newline at end of file
+
+const byTarget = (steps) => Object.keys(steps).reduce((targets, key) => {
+    const separator = key.lastIndexOf("/");
+    const target = separator < 0 ? "" : key.substring(0, separator);
+
+    targets[target] = Object.assign(targets[target] || {}, {[key.substring(separator + 1)]: steps[key]});
+
+    return targets;
+}, {});
+
+const App = () => {
+    const [steps, setSteps] = React.useState({});
+
+    React.useEffect(() => {
+        connect((message) => setSteps((current) => message.snapshot
+            ? message.steps
+            : Object.assign({}, current, message.steps)));
+    }, []);
+
+    const targets = byTarget(steps);
+    const names = Object.keys(targets);
+
+    if (names.every((name) => !name)) {
+        return <StepList steps={targets[""] || {}} />;
+    }
+
+    return (
+        <div>
+            {names.map((name) => (
+                <section key={name} className="target">
+                    <h2>{name}</h2>
+                    <StepList steps={targets[name]} />
+                </section>
+            ))}
+        </div>
+    );
+};
+
+ReactDOM.render(<App/>, document.getElementById("app"));
@@ -8,6 +8,10 @@ i18next.init({
                 "title": "Init",
                 "description": "Vault initializing process. Vault is hit with configured number of unseal key shares, so after getting keys app performs unsealing. In the end - checks if Vault was initialized and unsealed."
             },
+            "lead": {
+                "title": "Leader election",
+                "description": "Taking a lease on the leader lock in Vault. Only the leader reconciles HCL configurations, other replicas wait and report the leader's result."
+            },
             "up": {
                 "title": "Vault is up",
                 "description": "Checking whether the Vault is running and ready to receive requests."
@@ -1,2 +1,6 @@
-from .util import Steps, Chain
-from .logger import Logger
+from .util import Steps, Chain, StepGraph
+from .properties import AppProperties
+from .logger import Logger, LoggerProperties, JsonFormatter, RingBufferHandler
+from .pool import TaskPool
+from .session import PooledSession
+from .checkpoint import Checkpoint
@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+
+from .logger import Logger
+
+
+class Checkpoint(object):
+    def __init__(self, path: str = None, version: str = None, log_level: str = 'INFO'):
+        self.__log = Logger.getLogger(Checkpoint.__name__)
+        self.__log.setLevel(log_level)
+
+        self.__path = path
+        self.__version = version
+        self.__lock = threading.Lock()
+
+        self.__confirmed = set()
+        self.__file = None
+
+        if path is not None:
+            self.__open()
+
+    def __read(self) -> list:
+        records = []
+
+        try:
+            with open(self.__path, 'r') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.__log.warning(f'Ignoring unreadable checkpoint {self.__path}: {e}')
+
+        return records
+
+    def __open(self):
+        records = self.__read()
+
+        if records and records[0].get('version') == self.__version:
+            records = [record for record in records if 'kind' in record]
+
+            if records:
+                self.__log.info(f'Resuming from checkpoint {self.__path} - {len(records)} confirmed items.')
+        else:
+            if records:
+                self.__log.info(f'Discarding checkpoint {self.__path} since the HCL bundle has changed.')
+
+            records = []
+
+        self.__confirmed = {(record['kind'], record['name']) for record in records}
+
+        tmp_path = f'{self.__path}.{os.getpid()}.tmp'
+
+        try:
+            os.makedirs(os.path.dirname(self.__path), exist_ok=True)
+
+            with open(tmp_path, 'w') as f:
+                f.writelines(json.dumps(record) + '\n' for record in [{'version': self.__version}] + records)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(tmp_path, self.__path)
+
+            self.__file = open(self.__path, 'a')
+        except OSError as e:
+            self.__log.warning(f'Unable to write checkpoint {self.__path}, progress won\'t be resumed: {e}')
+
+    def __write(self, record: dict):
+        self.__file.write(json.dumps(record) + '\n')
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+
+    @property
+    def active(self) -> bool:
+        return self.__file is not None
+
+    def confirmed(self, kind: str, name: str) -> bool:
+        with self.__lock:
+            return (kind, name) in self.__confirmed
+
+    def confirm(self, kind: str, name: str, **details):
+        with self.__lock:
+            if self.__file is None or (kind, name) in self.__confirmed:
+                return
+
+            self.__confirmed.add((kind, name))
+
+            try:
+                self.__write(dict(details, kind=kind, name=name))
+            except OSError as e:
+                self.__log.warning(f'Unable to write checkpoint {self.__path}: {e}')
+
+    def complete(self):
+        with self.__lock:
+            if self.__file is None:
+                return
+
+            self.__file.close()
+            self.__file = None
+            self.__confirmed.clear()
+
+            try:
+                os.remove(self.__path)
+            except OSError:
+                pass
+
+    def close(self):
+        with self.__lock:
+            if self.__file is not None:
+                self.__file.close()
+                self.__file = None
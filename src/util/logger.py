@@ -1,25 +1,269 @@
+import contextlib
+import contextvars
+import copy
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
 from constants import EnvConstants
+from .properties import AppProperties
+
+
+class LoggerProperties(AppProperties):
+    @property
+    def log_path(self) -> str:
+        return os.path.join(os.environ[EnvConstants.HOME], self.read(LoggerProperties.__name__, 'log.path'))
+
+    @property
+    def log_max_bytes(self) -> int:
+        return int(self.read(LoggerProperties.__name__, 'log.maxBytes'))
+
+    @property
+    def log_backup_count(self) -> int:
+        return int(self.read(LoggerProperties.__name__, 'log.backupCount'))
+
+    @property
+    def log_format(self) -> str:
+        return self.read(LoggerProperties.__name__, 'log.format').lower()
+
+    @property
+    def log_console_level(self) -> str:
+        return self.read(LoggerProperties.__name__, 'log.console.level')
+
+    @property
+    def log_queue_enabled(self) -> bool:
+        return self.read(LoggerProperties.__name__, 'log.queue.enabled').lower() == 'true'
+
+    @property
+    def log_buffer_capacity(self) -> int:
+        return int(self.read(LoggerProperties.__name__, 'log.buffer.capacity'))
+
+    @property
+    def log_buffer_step_capacity(self) -> int:
+        return int(self.read(LoggerProperties.__name__, 'log.buffer.stepCapacity'))
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+
+        return json.dumps(entry)
+
+
+class RecordQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+
+        # merges args but keeps the traceback apart, so the listener's formatter decides how to render it
+        record.msg = record.getMessage()
+        record.args = None
+
+        # the listener thread has its own context, so the step tag is taken on the logging thread
+        record.step = RingBufferHandler.STEP.get()
+
+        if record.exc_info:
+            record.exc_text = record.exc_text or RingBufferHandler.FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+
+        return record
+
+
+class RingBufferHandler(logging.Handler):
+    STEP = contextvars.ContextVar('step', default=None)
+    FORMATTER = logging.Formatter()
+
+    def __init__(self, capacity: int = 1000, step_capacity: int = 200):
+        # NOTSET lets Logger.sync() barriers through, the file and console handlers drop them
+        super().__init__(logging.NOTSET)
+
+        self.__step_capacity = step_capacity
+
+        self.__condition = threading.Condition()
+        self.__records = deque(maxlen=capacity)
+        self.__steps: dict = {}
+        self.__sequence = 0
+
+    @property
+    def sequence(self) -> int:
+        return self.__sequence
+
+    @classmethod
+    def __matches(cls, entry: dict, step: str) -> bool:
+        return step is None or entry['step'] is not None \
+            and (entry['step'] == step or entry['step'].startswith(f'{step}/'))
+
+    @classmethod
+    def line(cls, entry: dict) -> str:
+        line = f'{entry["asctime"]} - {entry["logger"]} - {entry["level"]} - {entry["message"]}'
+
+        return f'{line}\n{entry["exception"]}' if 'exception' in entry else line
+
+    def emit(self, record: logging.LogRecord):
+        barrier = getattr(record, 'barrier', None)
+
+        if barrier is not None:
+            barrier.set()
+            return
+
+        try:
+            entry = {
+                'asctime': RingBufferHandler.FORMATTER.formatTime(record),
+                'level': record.levelname,
+                'levelno': record.levelno,
+                'logger': record.name,
+                'thread': record.threadName,
+                'step': record.step if hasattr(record, 'step') else RingBufferHandler.STEP.get(),
+                'message': record.getMessage()
+            }
+
+            if record.exc_info or record.exc_text:
+                entry['exception'] = record.exc_text or RingBufferHandler.FORMATTER.formatException(record.exc_info)
+        except Exception:
+            self.handleError(record)
+            return
+
+        with self.__condition:
+            self.__sequence += 1
+            entry['sequence'] = self.__sequence
+
+            self.__records.append(entry)
+
+            if entry['step'] is not None:
+                if entry['step'] not in self.__steps:
+                    self.__steps[entry['step']] = deque(maxlen=self.__step_capacity)
+
+                self.__steps[entry['step']].append(entry)
+
+            self.__condition.notify_all()
+
+    def tail(self, step: str = None, lines: int = 100) -> list:
+        with self.__condition:
+            records = list(self.__steps[step]) if step in self.__steps \
+                else [entry for entry in self.__records if RingBufferHandler.__matches(entry, step)]
+
+            return records[-lines:] if lines > 0 else []
+
+    def since(self, sequence: int, step: str = None, timeout: float = None) -> tuple:
+        with self.__condition:
+            self.__condition.wait_for(lambda: self.__sequence > sequence, timeout)
+
+            return [entry for entry in self.__records if entry['sequence'] > sequence
+                    and RingBufferHandler.__matches(entry, step)], self.__sequence
+
+    def last(self, step: str) -> str:
+        with self.__condition:
+            records = self.__steps.get(step, ())
+
+            # the step's own error beats whatever other threads logged after it
+            for entry in reversed(records):
+                if entry['levelno'] >= logging.ERROR:
+                    return RingBufferHandler.line(entry)
+
+            return RingBufferHandler.line(records[-1]) if records else None
 
 
 class Logger(object):
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    properties = LoggerProperties()
+
+    formatter = JsonFormatter() if properties.log_format == 'json' \
+        else logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     root_logger = logging.getLogger()
 
-    file_handler = RotatingFileHandler(filename="{0}/logs/app.log".format(os.environ[EnvConstants.HOME]),
-                                       mode='w', maxBytes=10000, backupCount=1)
+    file_handler = RotatingFileHandler(filename=properties.log_path, mode='w', maxBytes=properties.log_max_bytes,
+                                       backupCount=properties.log_backup_count)
     file_handler.setFormatter(formatter)
     file_handler.setLevel(logging.DEBUG)
-    root_logger.addHandler(file_handler)
 
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
-    console_handler.setLevel(logging.INFO)
-    root_logger.addHandler(console_handler)
+    console_handler.setLevel(properties.log_console_level)
+
+    # kept in memory for failure traces and /logs, so neither of them reads the log file back
+    buffer = RingBufferHandler(properties.log_buffer_capacity, properties.log_buffer_step_capacity)
+
+    if properties.log_queue_enabled:
+        listener = QueueListener(queue.SimpleQueue(), file_handler, console_handler, buffer,
+                                 respect_handler_level=True)
+        listener.start()
+
+        queue_handler = RecordQueueHandler(listener.queue)
+        root_logger.addHandler(queue_handler)
+    else:
+        listener = queue_handler = None
+
+        root_logger.addHandler(file_handler)
+        root_logger.addHandler(console_handler)
+        root_logger.addHandler(buffer)
+
+    __lock = threading.Lock()
 
     @classmethod
     def getLogger(cls, name: str):
         return logging.getLogger(name)
+
+    @classmethod
+    def step(cls) -> str:
+        return RingBufferHandler.STEP.get()
+
+    @classmethod
+    @contextlib.contextmanager
+    def tagged(cls, step: str):
+        token = RingBufferHandler.STEP.set(step)
+
+        try:
+            yield
+        finally:
+            RingBufferHandler.STEP.reset(token)
+
+    @classmethod
+    def sync(cls, timeout: float = 5) -> bool:
+        with cls.__lock:
+            if cls.listener is None:
+                return True
+
+            barrier = threading.Event()
+
+            record = logging.makeLogRecord({'levelno': logging.NOTSET, 'barrier': barrier})
+            cls.listener.queue.put_nowait(record)
+
+        return barrier.wait(timeout)
+
+    @classmethod
+    def last(cls, step: str) -> str:
+        # records queued by this thread reach the buffer before the barrier does
+        cls.sync()
+
+        return cls.buffer.last(step)
+
+    @classmethod
+    def close(cls):
+        with cls.__lock:
+            if cls.listener is not None:
+                cls.listener.stop()
+                cls.listener = None
+
+                # records logged by later exit hooks are written synchronously
+                cls.root_logger.removeHandler(cls.queue_handler)
+                cls.root_logger.addHandler(cls.file_handler)
+                cls.root_logger.addHandler(cls.console_handler)
+                cls.root_logger.addHandler(cls.buffer)
+
+            for handler in (cls.file_handler, cls.console_handler):
+                handler.flush()
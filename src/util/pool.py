@@ -0,0 +1,54 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .logger import Logger
+
+
+class TaskPool(object):
+    def __init__(self, workers: int = 1, name: str = 'TaskPool', log_level: str = 'INFO'):
+        self.__log = Logger.getLogger(TaskPool.__name__)
+        self.__log.setLevel(log_level)
+
+        self.__workers = max(1, workers)
+        self.__executor = ThreadPoolExecutor(max_workers=self.__workers, thread_name_prefix=name) \
+            if self.__workers > 1 else None
+
+    @property
+    def workers(self) -> int:
+        return self.__workers
+
+    def __failed(self, item, error: Exception) -> Exception:
+        # callers report the failures by item, the traceback is only kept here
+        self.__log.debug(f'Task for {item} failed: {error}', exc_info=error)
+
+        return error
+
+    def run(self, task, items) -> tuple:
+        results = {}
+        errors = {}
+
+        if self.__executor is None:
+            for item in items:
+                try:
+                    results[item] = task(item)
+                except Exception as e:
+                    errors[item] = self.__failed(item, e)
+
+            return results, errors
+
+        # every task gets its own copy of the caller's context, so log records keep the caller's step tag
+        futures = {self.__executor.submit(contextvars.copy_context().run, task, item): item for item in items}
+
+        for future in as_completed(futures):
+            item = futures[future]
+
+            try:
+                results[item] = future.result()
+            except Exception as e:
+                errors[item] = self.__failed(item, e)
+
+        return results, errors
+
+    def close(self):
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=True)
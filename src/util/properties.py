@@ -0,0 +1,13 @@
+import os
+from configparser import ConfigParser
+
+from constants import EnvConstants
+
+
+class AppProperties(object):
+    def __init__(self):
+        self.__config = ConfigParser()
+        self.__config.read(f'{os.environ[EnvConstants.HOME]}/application.properties')
+
+    def read(self, section_name: str, property_key: str):
+        return self.__config[section_name][property_key]
@@ -0,0 +1,27 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PooledSession(requests.Session):
+    def __init__(self, pool_size: int = 10, keep_alive: bool = True, timeout_seconds: float = 30):
+        super().__init__()
+
+        self.__timeout_seconds = timeout_seconds
+
+        # no retries down here, the Vault adapter and the health probes retry with their own policies
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
+        if not keep_alive:
+            self.headers['Connection'] = 'close'
+
+    @property
+    def timeout_seconds(self) -> float:
+        return self.__timeout_seconds
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.__timeout_seconds)
+
+        return super().request(method, url, **kwargs)
@@ -1,52 +1,99 @@
 import json
-
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from constants import InitConstants
+from exceptions import StepFailedException, ValidationException
+from metrics import Metrics
+from .checkpoint import Checkpoint
 from .logger import Logger
 
 
 class Steps(object):
+    CHECKPOINT_KIND = 'step'
+    SCOPE_SEPARATOR = '/'
+
     def __init__(self):
+        self.__lock = threading.RLock()
         self.__registry: dict = {}
 
         self.__last_step = None
+        self.__scope = None
+        self.__checkpoint = Checkpoint()
+
+    def with_checkpoint(self, checkpoint: Checkpoint):
+        self.__checkpoint = checkpoint
+
+        return self
+
+    def with_scope(self, scope: str):
+        self.__scope = scope
+
+        return self
+
+    def key(self, step: str) -> str:
+        return step if self.__scope is None else f'{self.__scope}{Steps.SCOPE_SEPARATOR}{step}'
+
+    def confirmed(self, step: str) -> bool:
+        return self.__checkpoint.confirmed(Steps.CHECKPOINT_KIND, step)
 
     def step(self, step: str):
-        self.__registry[step] = {
-            'state': 'none'
-        }
+        with self.__lock:
+            self.__registry[step] = {
+                'state': 'none'
+            }
 
-        self.__last_step = step
+            self.__last_step = step
 
         return self
 
     def state(self, step: str, state: str):
-        self.__registry[step] = {
-            'state': state
-        }
+        with self.__lock:
+            self.__registry[step] = {
+                'state': state
+            }
 
-        self.__last_step = step
+            self.__last_step = step
+
+        if state == InitConstants.FINISHED_STATE:
+            self.__checkpoint.confirm(Steps.CHECKPOINT_KIND, step)
 
         return self
 
-    def trace(self, step: str, state: str, trace: str):
-        self.__registry[step] = {
-            'state': state,
-            'trace': trace
-        }
+    def trace(self, step: str, state: str, trace: str = None):
+        trace = trace or Logger.last(self.key(step))
+
+        with self.__lock:
+            self.__registry[step] = {
+                'state': state,
+                'trace': trace
+            }
 
-        self.__last_step = step
+            self.__last_step = step
 
         return self
 
-    def trace_last(self, state: str, trace: str):
-        self.__registry[self.__last_step] = {
-            'state': state,
-            'trace': trace
-        }
+    def trace_last(self, state: str, trace: str = None):
+        with self.__lock:
+            self.__registry[self.__last_step] = {
+                'state': state,
+                'trace': trace or Logger.last(self.key(self.__last_step))
+            }
 
         return self
 
+    def delta(self, step: str) -> dict:
+        with self.__lock:
+            return {step: dict(self.__registry[step])}
+
+    def to_dict(self) -> dict:
+        with self.__lock:
+            return {step: dict(state) for step, state in self.__registry.items()}
+
     def to_str(self):
-        return json.dumps(self.__registry)
+        with self.__lock:
+            return json.dumps(self.__registry)
 
 
 class Reject(object):
@@ -89,7 +136,7 @@ class Chain(object):
 
         return self
 
-    def done(self):
+    def done(self) -> bool:
         for method in self.__call_stack:
             if not self.__rejected:
                 try:
@@ -111,6 +158,8 @@ class Chain(object):
             else:
                 break
 
+        return not self.__rejected
+
     @classmethod
     def reject(cls, exception: Exception):
         return Reject(exception)
@@ -128,3 +177,114 @@ class Chain(object):
     @classmethod
     def link(cls):
         return Chain()
+
+
+class StepGraph(object):
+    def __init__(self, steps: Steps, notify):
+        self.__log = Logger.getLogger(StepGraph.__name__)
+        self.__log.setLevel('INFO')
+
+        self.__steps = steps
+        self.__notify = notify
+
+        self.__nodes: dict = {}
+        self.__error_handler = lambda step, e: None
+
+    def node(self, step: str, action, reason: str, *requires: str, resumable: bool = False):
+        self.__nodes[step] = {
+            'action': action,
+            'reason': reason,
+            'requires': set(requires),
+            'resumable': resumable
+        }
+
+        return self
+
+    def catch(self, error_handler):
+        self.__error_handler = error_handler
+
+        return self
+
+    def __validate(self):
+        for step, node in self.__nodes.items():
+            unknown = node['requires'] - self.__nodes.keys()
+
+            if unknown:
+                raise ValidationException(f'Step "{step}" requires unknown steps: {", ".join(sorted(unknown))}')
+
+    def __execute(self, step: str) -> bool:
+        with Logger.tagged(self.__steps.key(step)):
+            return self.__run_node(step)
+
+    def __run_node(self, step: str) -> bool:
+        node = self.__nodes[step]
+        started = time.perf_counter()
+
+        if node['resumable'] and self.__steps.confirmed(step):
+            self.__log.info(f'Step "{step}" skipped since it was confirmed by the checkpoint.')
+
+            self.__notify(self.__steps.state(step, InitConstants.FINISHED_STATE).delta(step), step)
+
+            return True
+
+        done = Chain.fill(self.__steps.state(step, InitConstants.ACTIVE_STATE)) \
+            .then(lambda state: self.__notify(state.delta(step), step)) \
+            .then(lambda _: Chain.resolve(self.__steps.state(step, InitConstants.FINISHED_STATE)) if node['action']()
+                  else Chain.reject(StepFailedException(step, node['reason']))) \
+            .then(lambda state: self.__notify(state.delta(step), step)) \
+            .catch(lambda e: self.__error_handler(step, e)) \
+            .done()
+
+        Metrics.STEP_DURATION.labels(step, InitConstants.FINISHED_STATE if done else InitConstants.FAILED_STATE) \
+            .observe(time.perf_counter() - started)
+
+        return done
+
+    def run(self) -> bool:
+        self.__validate()
+
+        pending = set(self.__nodes)
+        finished = set()
+        failed = set()
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, len(self.__nodes)), thread_name_prefix=StepGraph.__name__) \
+                as executor:
+            while pending or running:
+                skipped = True
+
+                while skipped:
+                    skipped = False
+
+                    for step in sorted(pending):
+                        requires = self.__nodes[step]['requires']
+
+                        if requires & failed:
+                            self.__log.info(f'Step "{step}" skipped since its prerequisites have failed.')
+
+                            self.__notify(self.__steps.trace(step, InitConstants.FAILED_STATE,
+                                                             f'Skipped since {", ".join(sorted(requires & failed))} '
+                                                             f'failed: {self.__nodes[step]["reason"]}').delta(step),
+                                          step)
+
+                            pending.discard(step)
+                            failed.add(step)
+                            skipped = True
+                        elif requires <= finished:
+                            pending.discard(step)
+                            running[executor.submit(self.__execute, step)] = step
+
+                if not running:
+                    if pending:
+                        raise ValidationException(f'Steps have circular prerequisites: {", ".join(sorted(pending))}')
+
+                    break
+
+                completed, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in completed:
+                    step = running.pop(future)
+
+                    (finished if future.result() else failed).add(step)
+
+        return not failed
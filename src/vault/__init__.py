@@ -1,2 +1,13 @@
 from .vault import VaultClient
-from .config import HCLConfigBundle, HCLConfig, ConfigType, VaultProperties
+from .aio import AsyncVaultClient
+from .cluster import VaultCluster
+from .lock import LeaderLock
+from .limiter import AdaptiveLimiter, CircuitBreaker, RetryPolicy
+from .targets import VaultTarget, VaultTargets
+from .config import HCLConfigBundle, HCLConfig, HCLParser, ConfigType, VaultProperties
+from .cache import HCLCache
+from .export import HCLExporter, HCLWriter
+from .reconcile import ReconcileReport, StateDiff
+from .snapshot import VaultSnapshot
+from .token import TokenManager
+from .watch import HCLWatcher
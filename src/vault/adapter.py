@@ -0,0 +1,123 @@
+import re
+import time
+
+from hvac import utils
+from hvac.adapters import JSONAdapter
+from requests.exceptions import ConnectionError, ConnectTimeout, Timeout
+from urllib3.exceptions import NewConnectionError
+
+from instrument import Instrumentation
+from metrics import Metrics
+from .limiter import AdaptiveLimiter, RetryPolicy
+
+
+class InstrumentedAdapter(JSONAdapter):
+    READ_METHODS = ('GET', 'LIST', 'HEAD')
+    IDEMPOTENT_METHODS = ('PUT', 'POST', 'DELETE')
+    NON_IDEMPOTENT_PATHS = re.compile(r'/?(v1/)?(sys/init|sys/(auth|mounts)/[^/]+|sys/generate-root/.*|'
+                                      r'auth/token/create.*|auth/.+/login(/[^/]+)?|sys/wrapping/wrap)')
+    RATE_LIMITED = 429
+    UNHEALTHY = (500, 502, 503, 504)
+
+    def __init__(self, *args, limiter: AdaptiveLimiter = None, retry: RetryPolicy = None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.__limiter = limiter
+        self.__retry = retry or RetryPolicy(0)
+
+    def __send(self, method, url, headers, **kwargs):
+        started = self.__limiter.acquire(method.upper() not in InstrumentedAdapter.READ_METHODS) \
+            if self.__limiter is not None else None
+        call = Instrumentation.start(Instrumentation.VAULT, method.upper(), url)
+        response = error = None
+
+        try:
+            response = super(JSONAdapter, self).request(method, url, headers, False, **kwargs)
+
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if response is not None:
+                Instrumentation.end(call, response.status_code, len(response.content))
+            else:
+                Instrumentation.end(call, error=error)
+
+            if started is not None:
+                self.__limiter.release(started, response is None
+                                       or response.status_code == InstrumentedAdapter.RATE_LIMITED
+                                       or response.status_code in InstrumentedAdapter.UNHEALTHY)
+
+    @classmethod
+    def __checked(cls, payload) -> bool:
+        # a check-and-set write that landed fails the CAS on retry, so the caller would read it as lost
+        return isinstance(payload, dict) and isinstance(payload.get('options'), dict) \
+            and payload['options'].get('cas') is not None
+
+    @classmethod
+    def unsent(cls, error: Exception) -> bool:
+        # the connection was never opened, so even a login or a check-and-set write can be sent again
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+
+        return isinstance(error, ConnectTimeout) or isinstance(reason, NewConnectionError)
+
+    @classmethod
+    def retryable(cls, method: str, url: str, status: int = None, payload=None, unsent: bool = False) -> bool:
+        if unsent or status == InstrumentedAdapter.RATE_LIMITED or method.upper() in InstrumentedAdapter.READ_METHODS:
+            return True
+
+        return method.upper() in InstrumentedAdapter.IDEMPOTENT_METHODS \
+            and not InstrumentedAdapter.NON_IDEMPOTENT_PATHS.fullmatch(url) \
+            and not InstrumentedAdapter.__checked(payload)
+
+    def request(self, method, url, headers=None, raise_exception=True, **kwargs):
+        headers = headers or {}
+        attempt = 0
+
+        while True:
+            try:
+                response = self.__send(method, url, headers, **kwargs)
+            except (ConnectionError, Timeout) as e:
+                if attempt >= self.__retry.attempts or not InstrumentedAdapter.retryable(
+                        method, url, payload=kwargs.get('json'), unsent=InstrumentedAdapter.unsent(e)):
+                    raise
+
+                Metrics.VAULT_RETRIES.labels(type(e).__name__).inc()
+                time.sleep(self.__retry.delay(attempt))
+                attempt += 1
+
+                continue
+
+            if attempt < self.__retry.attempts and (response.status_code == InstrumentedAdapter.RATE_LIMITED or
+                                                    response.status_code in InstrumentedAdapter.UNHEALTHY) \
+                    and InstrumentedAdapter.retryable(method, url, response.status_code, kwargs.get('json')):
+                Metrics.VAULT_RETRIES.labels(str(response.status_code)).inc()
+                time.sleep(self.__retry.delay(attempt, response.headers.get('Retry-After')))
+                attempt += 1
+
+                continue
+
+            break
+
+        if not response.ok and raise_exception and not self.ignore_exceptions:
+            text = errors = None
+
+            if response.headers.get('Content-Type') == 'application/json':
+                try:
+                    errors = response.json().get('errors')
+                except Exception:
+                    pass
+
+            if errors is None:
+                text = response.text
+
+            utils.raise_for_error(method, url, response.status_code, text, errors=errors)
+
+        if response.status_code == 200:
+            try:
+                return response.json()
+            except ValueError:
+                pass
+
+        return response
@@ -0,0 +1,345 @@
+import asyncio
+import contextvars
+import json
+import threading
+
+import aiohttp
+from hvac import exceptions, utils
+
+from exceptions import HealthProbeFailedException
+from instrument import Instrumentation
+from metrics import Metrics
+from util import Logger
+from .adapter import InstrumentedAdapter
+from .config import ConfigType, VaultProperties
+from .limiter import AdaptiveLimiter, RetryPolicy
+from .probe import HealthProbe
+from .reconcile import ReconcileReport, Reconciler, VaultRequest
+from .snapshot import VaultSnapshot
+from .token import TokenManager
+
+
+class AsyncVaultApi(object):
+    def __init__(self, address: str, session: aiohttp.ClientSession, limiter: AdaptiveLimiter = None,
+                 retry: RetryPolicy = None):
+        self.__address = address.rstrip('/')
+        self.__session = session
+        self.__limiter = limiter
+        self.__retry = retry or RetryPolicy(0)
+
+        self.token = None
+
+    async def __send(self, method: str, url: str, payload: dict, headers: dict, options: dict) -> tuple:
+        # the limiter is shared with the sync client and blocks, so waiting for a slot happens off the loop
+        started = await asyncio.get_running_loop().run_in_executor(
+            None, self.__limiter.acquire, method not in InstrumentedAdapter.READ_METHODS) \
+            if self.__limiter is not None else None
+        call = Instrumentation.start(Instrumentation.VAULT, method, url)
+        status = None
+
+        try:
+            async with self.__session.request(method, self.__address + url, json=payload, headers=headers,
+                                              **options) as response:
+                status = response.status
+                body = await response.read()
+        except Exception as e:
+            Instrumentation.end(call, error=e)
+            raise
+        finally:
+            if started is not None:
+                self.__limiter.release(started, status is None or status == InstrumentedAdapter.RATE_LIMITED
+                                       or status in InstrumentedAdapter.UNHEALTHY)
+
+        return status, body, response.headers, call
+
+    async def request(self, method: str, path: str, payload: dict = None, missing_ok: bool = False,
+                      wrap_ttl: str = None, timeout: tuple = None):
+        url = f'/v1/{path.lstrip("/")}'
+        headers = {'X-Vault-Token': self.token} if self.token else {}
+
+        if wrap_ttl:
+            headers['X-Vault-Wrap-TTL'] = str(wrap_ttl)
+
+        options = {'timeout': aiohttp.ClientTimeout(sock_connect=timeout[0], total=sum(timeout))} if timeout else {}
+        attempt = 0
+
+        while True:
+            try:
+                status, body, response_headers, call = await self.__send(method, url, payload, headers, options)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= self.__retry.attempts or not InstrumentedAdapter.retryable(
+                        method, url, payload=payload, unsent=isinstance(e, aiohttp.ClientConnectorError)):
+                    raise
+
+                Metrics.VAULT_RETRIES.labels(type(e).__name__).inc()
+                await asyncio.sleep(self.__retry.delay(attempt))
+                attempt += 1
+
+                continue
+
+            if attempt < self.__retry.attempts and (status == InstrumentedAdapter.RATE_LIMITED or
+                                                    status in InstrumentedAdapter.UNHEALTHY) \
+                    and InstrumentedAdapter.retryable(method, url, status, payload):
+                Instrumentation.end(call, status, len(body))
+                Metrics.VAULT_RETRIES.labels(str(status)).inc()
+                await asyncio.sleep(self.__retry.delay(attempt, response_headers.get('Retry-After')))
+                attempt += 1
+
+                continue
+
+            break
+
+        data = json.loads(body) if body else None
+        error = None
+
+        if status >= 400 and not (status == 404 and missing_ok):
+            errors = data.get('errors') if isinstance(data, dict) else None
+
+            try:
+                utils.raise_for_error(method, url, status, None if errors else body.decode(), errors=errors)
+            except exceptions.VaultError as e:
+                error = e
+
+        Instrumentation.end(call, status, len(body), error)
+
+        if error is not None:
+            raise error
+
+        return None if status == 404 else data
+
+    async def get(self, path: str, missing_ok: bool = False, timeout: tuple = None):
+        return await self.request('GET', path, missing_ok=missing_ok, timeout=timeout)
+
+    async def post(self, path: str, payload: dict = None):
+        return await self.request('POST', path, payload)
+
+    async def put(self, path: str, payload: dict = None):
+        return await self.request('PUT', path, payload)
+
+    async def delete(self, path: str):
+        return await self.request('DELETE', path)
+
+
+class BlockingFacade(object):
+    def __init__(self, client):
+        self.__client = client
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.__client, name)
+
+        if not asyncio.iscoroutinefunction(attribute):
+            return attribute
+
+        return lambda *args, **kwargs: self.__client.run(attribute(*args, **kwargs))
+
+
+class AsyncVaultClient(object):
+    def __init__(self, reconciler: Reconciler, token_manager: TokenManager, address: str = None,
+                 on_root_token=None, limiter: AdaptiveLimiter = None):
+        self.__vault_properties = VaultProperties()
+
+        self.__log = Logger.getLogger(AsyncVaultClient.__name__)
+        self.__log.setLevel(self.__vault_properties.vault_client_log_level)
+
+        self.__reconciler = reconciler
+        self.__token_manager = token_manager
+        self.__address = address or self.__vault_properties.vault_address
+        self.__on_root_token = on_root_token or (lambda token: None)
+        self.__limiter = limiter
+
+        self.__root_token = None
+
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.__loop.run_forever, name=AsyncVaultClient.__name__, daemon=True)
+        self.__thread.start()
+
+        self.__session, self.__api, self.__semaphore = self.run(self.__open())
+
+    async def __open(self) -> tuple:
+        concurrency = self.__vault_properties.vault_async_concurrency
+
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=concurrency,
+                                           force_close=not self.__vault_properties.vault_http_keep_alive),
+            timeout=aiohttp.ClientTimeout(total=self.__vault_properties.vault_http_timeout_seconds))
+
+        return session, AsyncVaultApi(self.__address, session, self.__limiter,
+                                      RetryPolicy(self.__vault_properties.vault_retry_attempts,
+                                                  self.__vault_properties.vault_retry_base_seconds,
+                                                  self.__vault_properties.vault_retry_max_seconds)), \
+            asyncio.Semaphore(concurrency)
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(AsyncVaultClient.__tagged(Logger.step(), coroutine),
+                                                self.__loop).result()
+
+    def blocking(self) -> BlockingFacade:
+        return BlockingFacade(self)
+
+    # Private helpers
+    @classmethod
+    async def __tagged(cls, step: str, coroutine):
+        # the loop thread has its own context, so the caller's step tag is carried over explicitly
+        with Logger.tagged(step):
+            return await coroutine
+
+    async def __blocking(self, func, *args):
+        return await self.__loop.run_in_executor(None, contextvars.copy_context().run, func, *args)
+
+    async def __perform(self, request):
+        if isinstance(request, tuple):
+            return tuple(await asyncio.gather(*[self.__perform(item) for item in request]))
+
+        if request.method == VaultRequest.STATE:
+            path, extract = VaultSnapshot.SOURCES[request.state]
+
+            return extract(await self.__api.get(path))
+        elif request.method == VaultRequest.CALL:
+            return await self.__blocking(request)
+        elif request.method == VaultRequest.READ:
+            return await self.__api.get(request.path, missing_ok=True)
+
+        return await self.__api.request(request.method, request.path, request.data, wrap_ttl=request.wrap_ttl)
+
+    async def __drive(self, plan):
+        response = error = None
+
+        while True:
+            try:
+                request = plan.throw(error) if error is not None else plan.send(response)
+            except StopIteration as e:
+                return e.value
+
+            try:
+                response, error = await self.__perform(request), None
+            except Exception as e:
+                response, error = None, e
+
+    async def __bounded(self, config_type: ConfigType, plan, name: str):
+        async with self.__semaphore:
+            action = await self.__drive(plan(name))
+
+        return await self.__blocking(self.__reconciler.confirm, config_type, name, action)
+
+    async def __apply_all(self, config_type: ConfigType, entries: dict, plan):
+        names = self.__reconciler.pending(config_type, entries)
+
+        outcomes = await asyncio.gather(*[self.__bounded(config_type, plan, name) for name in names],
+                                        return_exceptions=True)
+
+        self.__reconciler.record(config_type,
+                                 {name: outcome for name, outcome in zip(names, outcomes)
+                                  if not isinstance(outcome, Exception)},
+                                 {name: outcome for name, outcome in zip(names, outcomes)
+                                  if isinstance(outcome, Exception)})
+
+    async def __running(self, timeout: tuple = None) -> bool:
+        seal_status = await self.__api.get('sys/seal-status', timeout=timeout)
+
+        return seal_status['initialized'] and not seal_status['sealed']
+
+    async def __authenticated(self) -> bool:
+        try:
+            await self.__api.get('auth/token/lookup-self')
+        except (exceptions.Forbidden, exceptions.Unauthorized, exceptions.InvalidPath):
+            return False
+
+        return True
+
+    def __adopt_root_token(self, token: str):
+        self.__root_token = token
+        self.__on_root_token(token)
+
+    # Misc
+    @property
+    def report(self) -> ReconcileReport:
+        return self.__reconciler.report
+
+    def void_root_token(self) -> bool:
+        self.__root_token = None
+
+        return True
+
+    async def __close(self):
+        await self.__session.close()
+
+    def close_client(self):
+        self.void_root_token()
+        self.run(self.__close())
+
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+
+    def wait_until_running(self) -> bool:
+        health_probe = HealthProbe.of(self.__vault_properties, HealthProbe.RUNNING,
+                                      self.__vault_properties.vault_up_failure_threshold,
+                                      self.__vault_properties.vault_up_deadline_seconds)
+
+        try:
+            return health_probe.run(lambda timeout: self.run(self.__running(timeout)), check=bool)
+        except HealthProbeFailedException:
+            return False
+
+    # Core
+    async def auth(self) -> bool:
+        if self.__root_token:
+            self.__api.token = self.__root_token
+        elif self.__token_manager.active or self.__api.token is None or \
+                'kubernetes/' in await self.__api.get('sys/auth'):
+            self.__api.token = await self.__blocking(self.__token_manager.token)
+
+        return await self.__authenticated()
+
+    async def enable_secrets(self, names: set = None) -> bool:
+        if not await self.auth() or not await self.__running():
+            return False
+
+        backends = await self.__perform(VaultRequest.listing(VaultSnapshot.MOUNTS))
+        secrets = self.__reconciler.select(ConfigType.SECRET, names)
+
+        await self.__apply_all(ConfigType.SECRET, secrets,
+                               lambda secret: self.__reconciler.secret(secret, secrets[secret], backends))
+
+        return True
+
+    async def apply_policies(self, names: set = None) -> bool:
+        if not await self.auth() or not await self.__running():
+            return False
+
+        policy_names = await self.__perform(VaultRequest.listing(VaultSnapshot.POLICIES))
+        policies = self.__reconciler.select(ConfigType.POLICY, names)
+
+        await self.__apply_all(ConfigType.POLICY, policies,
+                               lambda policy: self.__reconciler.policy(policy, policies[policy], policy_names))
+
+        return True
+
+    async def enable_auth_backends(self, names: set = None) -> bool:
+        if not await self.auth() or not await self.__running():
+            return False
+
+        if names is None:
+            await self.__drive(self.__reconciler.internal_kube_auth(
+                await self.__blocking(lambda: self.__token_manager.jwt)))
+
+        auth_backends = await self.__perform(VaultRequest.listing(VaultSnapshot.AUTH_METHODS))
+        auth_list = self.__reconciler.select(ConfigType.AUTH, names)
+
+        await self.__apply_all(ConfigType.AUTH, auth_list,
+                               lambda auth_path: self.__reconciler.auth(auth_path, auth_list[auth_path], auth_backends))
+
+        return True
+
+    async def apply_auth_roles(self, names: set = None) -> bool:
+        if not await self.auth() or not await self.__running():
+            return False
+
+        auth_backends = await self.__perform(VaultRequest.listing(VaultSnapshot.AUTH_METHODS))
+        roles = self.__reconciler.select(ConfigType.ROLE, names)
+
+        await self.__apply_all(ConfigType.ROLE, roles,
+                               lambda role_name: self.__reconciler.role(role_name, roles[role_name], auth_backends))
+
+        return True
+
+    async def init_vault(self) -> bool:
+        return await self.__drive(self.__reconciler.init_vault(self.__adopt_root_token))
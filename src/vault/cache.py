@@ -0,0 +1,120 @@
+import hashlib
+import os
+import pickle
+import threading
+
+from util import Logger
+
+
+class HCLCache(object):
+    VERSION = 1
+
+    def __init__(self, path: str, log_level: str = 'INFO'):
+        self.__log = Logger.getLogger(HCLCache.__name__)
+        self.__log.setLevel(log_level)
+
+        self.__path = path
+        self.__lock = threading.Lock()
+
+        self.__entries = self.__read()
+        self.__seen = set()
+        self.__dirty = False
+
+        self.__hits = 0
+        self.__misses = 0
+
+    def __read(self) -> dict:
+        try:
+            with open(self.__path, 'rb') as f:
+                cached = pickle.load(f)
+
+            if cached.get('version') == HCLCache.VERSION:
+                return cached['entries']
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.__log.warning(f'Ignoring unreadable HCL cache {self.__path}: {e}')
+
+        return {}
+
+    @property
+    def hits(self) -> int:
+        return self.__hits
+
+    @property
+    def misses(self) -> int:
+        return self.__misses
+
+    @classmethod
+    def digest(cls, content: bytes) -> str:
+        return hashlib.sha256(content).hexdigest()
+
+    def lookup(self, filename: str) -> dict:
+        stat = os.stat(filename)
+
+        with self.__lock:
+            self.__seen.add(filename)
+            entry = self.__entries.get(filename)
+
+        if entry and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            with self.__lock:
+                self.__hits += 1
+
+            return entry
+
+        lookup = {
+            'mtime': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'hash': None,
+            'config': None
+        }
+
+        if entry:
+            with open(filename, 'rb') as f:
+                lookup['hash'] = HCLCache.digest(f.read())
+
+            if entry['hash'] == lookup['hash']:
+                lookup['config'] = entry['config']
+
+                self.store(filename, lookup)
+
+                with self.__lock:
+                    self.__hits += 1
+
+                return lookup
+
+        with self.__lock:
+            self.__misses += 1
+
+        return lookup
+
+    def store(self, filename: str, entry: dict):
+        with self.__lock:
+            self.__seen.add(filename)
+            self.__entries[filename] = entry
+            self.__dirty = True
+
+    def save(self):
+        with self.__lock:
+            stale = self.__entries.keys() - self.__seen
+
+            for filename in stale:
+                del self.__entries[filename]
+
+            if not self.__dirty and not stale:
+                return
+
+            entries = dict(self.__entries)
+            self.__dirty = False
+
+        os.makedirs(os.path.dirname(self.__path), exist_ok=True)
+
+        tmp_path = f'{self.__path}.{os.getpid()}.tmp'
+
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'version': HCLCache.VERSION, 'entries': entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            os.replace(tmp_path, self.__path)
+        except OSError as e:
+            self.__log.warning(f'Unable to write HCL cache {self.__path}: {e}')
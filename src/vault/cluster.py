@@ -0,0 +1,152 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import hvac
+
+from metrics import Metrics
+from util import Logger
+from .adapter import InstrumentedAdapter
+
+
+class VaultCluster(object):
+    def __init__(self, discover, session, unseal_attempts: int = 5, retry_seconds: float = 2,
+                 refresh_seconds: float = 30, log_level: str = 'INFO'):
+        self.__log = Logger.getLogger(VaultCluster.__name__)
+        self.__log.setLevel(log_level)
+
+        self.__discover = discover
+        self.__session = session
+        self.__unseal_attempts = max(1, unseal_attempts)
+        self.__retry_seconds = retry_seconds
+        self.__refresh_seconds = refresh_seconds
+
+        self.__lock = threading.Lock()
+        self.__refreshing = threading.Lock()
+        self.__clients = {}
+        self.__nodes = {}
+        self.__addresses = []
+        self.__refreshed_at = None
+
+    def __client(self, address: str) -> hvac.Client:
+        with self.__lock:
+            if address not in self.__clients:
+                self.__clients[address] = hvac.Client(url=address, adapter=InstrumentedAdapter, session=self.__session,
+                                                      timeout=self.__session.timeout_seconds)
+
+            return self.__clients[address]
+
+    def __record(self, address: str, **state):
+        with self.__lock:
+            node = self.__nodes.setdefault(address, {'initialized': None, 'sealed': None, 'error': None})
+            node.update(state)
+
+        if state.get('sealed') is not None:
+            Metrics.NODE_SEALED.labels(address).set(1 if state['sealed'] else 0)
+
+    def __read(self, address: str) -> dict:
+        try:
+            status = self.__client(address).sys.read_seal_status()
+        except Exception as e:
+            self.__record(address, error=str(e))
+
+            raise
+
+        self.__record(address, initialized=status['initialized'], sealed=status['sealed'], error=None)
+
+        return status
+
+    def __unseal_node(self, address: str, keys: list) -> bool:
+        started = time.monotonic()
+
+        for attempt in range(1, self.__unseal_attempts + 1):
+            try:
+                status = self.__read(address)
+
+                for key in keys:
+                    if not status['sealed']:
+                        break
+
+                    status = self.__client(address).sys.submit_unseal_key(key)
+
+                self.__record(address, initialized=status.get('initialized', True), sealed=status['sealed'],
+                              error=None)
+
+                if not status['sealed']:
+                    self.__record(address, unseal_seconds=time.monotonic() - started)
+                    self.__log.info(f'Vault replica {address} was unsealed.')
+
+                    return True
+            except Exception as e:
+                self.__record(address, error=str(e))
+                self.__log.warning(f'Unable to unseal Vault replica {address} (attempt {attempt}): {e}')
+
+            if attempt < self.__unseal_attempts:
+                time.sleep(self.__retry_seconds)
+
+        self.__log.error(f'Vault replica {address} is still sealed after {self.__unseal_attempts} attempts.')
+
+        return False
+
+    def __each(self, task) -> dict:
+        if not self.__addresses:
+            return {}
+
+        if len(self.__addresses) == 1:
+            return {self.__addresses[0]: task(self.__addresses[0])}
+
+        with ThreadPoolExecutor(max_workers=len(self.__addresses), thread_name_prefix=VaultCluster.__name__) \
+                as executor:
+            futures = [executor.submit(contextvars.copy_context().run, task, address) for address in self.__addresses]
+
+            return {address: future.result() for address, future in zip(self.__addresses, futures)}
+
+    @property
+    def addresses(self) -> list:
+        return list(self.__addresses)
+
+    @property
+    def nodes(self) -> dict:
+        with self.__lock:
+            return {address: dict(self.__nodes.get(address, {})) for address in self.__addresses}
+
+    def refresh(self, max_age_seconds: float = 0) -> list:
+        with self.__refreshing:
+            if self.__refreshed_at is not None and time.monotonic() - self.__refreshed_at < max_age_seconds:
+                return self.addresses
+
+            addresses = list(dict.fromkeys(self.__discover()))
+
+            if addresses != self.__addresses:
+                self.__log.info(f'Discovered Vault replicas: {", ".join(addresses)}.')
+
+            self.__addresses = addresses
+            self.__refreshed_at = time.monotonic()
+
+        return self.addresses
+
+    def unseal(self, keys: list) -> bool:
+        self.refresh()
+
+        started = time.monotonic()
+        results = self.__each(lambda address: self.__unseal_node(address, keys))
+
+        self.__log.info(f'Unsealed {sum(results.values())} of {len(results)} Vault replicas in '
+                        f'{time.monotonic() - started:.2f}s.')
+
+        return all(results.values())
+
+    def health(self) -> dict:
+        # served on every /health/nodes request, so replicas aren't listed through the Kubernetes API each time
+        self.refresh(self.__refresh_seconds)
+
+        def read(address: str):
+            try:
+                self.__read(address)
+            except Exception:
+                pass
+
+        self.__each(read)
+
+        return self.nodes
@@ -1,12 +1,18 @@
 import glob
+import json
 import os
-from configparser import ConfigParser
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
-from util import Logger
+from util import Logger, AppProperties
 
-import hcl
+from hcl.api import isHcl
+from hcl.parser import HclParser
 
 from constants import EnvConstants
+from exceptions import ValidationException
+from .cache import HCLCache
 
 
 class NoValue(Enum):
@@ -31,22 +37,82 @@ class ConfigType(AutoNumber):
     SECRET = ('secret', '/hcl/secret')
 
 
+class HCLParser(object):
+    __parser = None
+    __lock = threading.Lock()
+
+    @classmethod
+    def loads(cls, content: str) -> dict:
+        if not isHcl(content):
+            return json.loads(content)
+
+        with cls.__lock:
+            if cls.__parser is None:
+                cls.__parser = HclParser()
+
+            return cls.__parser.parse(content)
+
+    @classmethod
+    def parse(cls, filename: str) -> tuple:
+        with open(filename, 'rb') as f:
+            content = f.read()
+
+        return HCLCache.digest(content), cls.loads(content.decode())
+
+
 class HCLConfig(object):
-    def __init__(self, config_type: ConfigType):
+    def __init__(self, config_type: ConfigType, files: list):
         self.__log = Logger.getLogger(HCLConfig.__name__)
 
+        self.__config_type = config_type
         self.__config = {}
+        self.__sources = {}
+        self.__removed = {}
+
+        HCLConfig.__load_configs(config_type.config_type, files, self.__add)
+
+    def __swap(self, filename: str, conf: dict = None) -> dict:
+        previous = {name: self.__config[name] for name in self.__sources if self.__sources[name] == filename}
+
+        for name in previous:
+            del self.__sources[name]
+            del self.__config[name]
 
-        HCLConfig.__load_configs(f'{os.environ[EnvConstants.HOME]}{config_type.path}', config_type.config_type,
-                                 lambda conf_name, config: self.__config.update({conf_name: config}))
+        try:
+            HCLConfig.__load_configs(self.__config_type.config_type, [(filename, conf)] if conf else [], self.__add)
+        except ValidationException:
+            self.__swap(filename, {self.__config_type.config_type: previous})
+
+            raise
+
+        return previous
+
+    def replace(self, filename: str, conf: dict = None) -> set:
+        previous = self.__swap(filename, conf)
+        current = {name for name in self.__sources if self.__sources[name] == filename}
+
+        # the last config of a removed entry is kept, so it can still be taken out of Vault
+        removed = {name: previous[name] for name in previous if name not in self.__config}
+
+        self.__removed.update(removed)
+
+        for name in current:
+            self.__removed.pop(name, None)
+
+        return {name for name in current if previous.get(name) != self.__config[name]} | set(removed)
+
+    def __add(self, filename: str, conf_name: str, config: dict):
+        if conf_name in self.__sources:
+            raise ValidationException(f'"{conf_name}" is defined both in {self.__sources[conf_name]} and {filename}')
+
+        self.__sources[conf_name] = filename
+        self.__config[conf_name] = config
 
     @classmethod
-    def __load_configs(cls, path: str, config_type: str, func):
-        for filename in glob.glob(os.path.join(path, '*.hcl')):
-            with open(filename, 'r') as f:
-                conf = hcl.load(f)
-                for name in conf[config_type]:
-                    func(name, conf[config_type][name])
+    def __load_configs(cls, config_type: str, files: list, func):
+        for filename, conf in files:
+            for name in conf.get(config_type, {}):
+                func(filename, name, conf[config_type][name])
 
     def is_entry_enabled(self, name: str):
         return name in self.__config and self.__config[name]['enabled']
@@ -57,16 +123,118 @@ class HCLConfig(object):
     def get_all(self):
         return self.__config
 
+    def get_removed(self) -> dict:
+        return self.__removed
+
 
 class HCLConfigBundle(object):
-    def __init__(self, log_level: str = 'INFO'):
+    def __init__(self, log_level: str = 'INFO', cache_path: str = None, parse_workers: int = 1):
         self.__log = Logger.getLogger(HCLConfigBundle.__name__)
         self.__log.setLevel(log_level)
 
         self.__bundle = {}
+        self.__digest = None
+        self.__cache = HCLCache(cache_path, log_level) if cache_path else None
+        self.__parse_workers = parse_workers
+
+        started = time.perf_counter()
+
+        files = {config: sorted(glob.glob(os.path.join(HCLConfigBundle.directory(config), '*.hcl')))
+                 for config in ConfigType}
+
+        parsed = self.__parse_all(sorted({filename for filenames in files.values() for filename in filenames}))
+
+        for config in ConfigType:
+            self.__bundle.update({config.config_type: HCLConfig(
+                config, [(filename, parsed[filename]) for filename in files[config]])})
+
+        self.__load_seconds = time.perf_counter() - started
+
+        if self.__cache is not None:
+            self.__cache.save()
+
+            self.__log.info(f'HCL bundle loaded in {self.__load_seconds:.3f}s '
+                            f'({"warm" if not self.__cache.misses else "cold"} - cached files: '
+                            f'{self.__cache.hits}, parsed files: {self.__cache.misses}).')
+        else:
+            self.__log.info(f'HCL bundle loaded in {self.__load_seconds:.3f}s.')
+
+    @classmethod
+    def directory(cls, config_type: ConfigType) -> str:
+        return f'{os.environ[EnvConstants.HOME]}{config_type.path}'
+
+    def reload(self, filenames: set) -> dict:
+        parsed = self.__parse_all(sorted(filename for filename in filenames if os.path.isfile(filename)))
+
+        changes = {}
 
         for config in ConfigType:
-            self.__bundle.update({config.config_type: HCLConfig(config)})
+            for filename in sorted(filenames):
+                if os.path.dirname(filename) != HCLConfigBundle.directory(config):
+                    continue
+
+                names = self.__bundle[config.config_type].replace(filename, parsed.get(filename))
+
+                if names:
+                    changes.setdefault(config, set()).update(names)
+
+        if changes:
+            self.__digest = None
+
+        if self.__cache is not None:
+            self.__cache.save()
+
+        self.__log.info(f'HCL bundle reloaded {len(filenames)} files - changed entries: ' +
+                        (', '.join(f'{config.config_type}: {len(names)}' for config, names in changes.items()) or
+                         'none') + '.')
+
+        return changes
+
+    def __parse_all(self, filenames: list) -> dict:
+        parsed = {}
+        lookups = {}
+
+        for filename in filenames:
+            lookup = self.__cache.lookup(filename) if self.__cache is not None else None
+
+            if lookup is not None and lookup['config'] is not None:
+                parsed[filename] = lookup['config']
+            else:
+                lookups[filename] = lookup
+
+        misses = list(lookups)
+
+        if self.__parse_workers > 1 and len(misses) > 1:
+            with ProcessPoolExecutor(max_workers=self.__parse_workers) as executor:
+                results = list(executor.map(HCLParser.parse, misses,
+                                            chunksize=max(1, len(misses) // (self.__parse_workers * 4))))
+        else:
+            results = [HCLParser.parse(filename) for filename in misses]
+
+        for filename, (digest, config) in zip(misses, results):
+            parsed[filename] = config
+
+            if lookups[filename] is not None:
+                self.__cache.store(filename, dict(lookups[filename], hash=digest, config=config))
+
+        return parsed
+
+    @property
+    def digest(self) -> str:
+        if self.__digest is None:
+            self.__digest = HCLCache.digest(json.dumps({config_type: config.get_all() for config_type, config
+                                                        in self.__bundle.items()}, sort_keys=True,
+                                                       default=str).encode())
+
+        return self.__digest
+
+    @property
+    def load_seconds(self) -> float:
+        return self.__load_seconds
+
+    @property
+    def cache(self) -> HCLCache:
+        return self.__cache
 
     def is_bundle_config_enabled(self, config_type: ConfigType, name: str):
         return config_type.config_type in self.__bundle and self.__bundle[config_type.config_type].is_entry_enabled(
@@ -78,14 +246,8 @@ class HCLConfigBundle(object):
     def get_whole_bundle_config(self, config_type: ConfigType):
         return self.__bundle[config_type.config_type].get_all()
 
-
-class AppProperties(object):
-    def __init__(self):
-        self.__config = ConfigParser()
-        self.__config.read(f'{os.environ[EnvConstants.HOME]}/application.properties')
-
-    def read(self, section_name: str, property_key: str):
-        return self.__config[section_name][property_key]
+    def get_removed_bundle_config(self, config_type: ConfigType) -> dict:
+        return self.__bundle[config_type.config_type].get_removed()
 
 
 class VaultProperties(AppProperties):
@@ -109,6 +271,14 @@ class VaultProperties(AppProperties):
     def vault_kube_internal_ttl(self) -> str:
         return self.read(VaultProperties.__name__, 'vault.kubernetes.internal.wrapTTL')
 
+    @property
+    def vault_kube_config_path(self) -> str:
+        return self.read(VaultProperties.__name__, 'vault.kubernetes.configPath') or None
+
+    @property
+    def vault_kube_pod_account_ttl(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.kubernetes.podAccountTtlSeconds'))
+
     @property
     def vault_key_threshold(self) -> int:
         return int(self.read(VaultProperties.__name__, 'vault.key.threshold'))
@@ -137,6 +307,34 @@ class VaultProperties(AppProperties):
     def vault_ping_timeout_seconds(self) -> int:
         return int(self.read(VaultProperties.__name__, 'vault.ping.timeoutSeconds'))
 
+    @property
+    def vault_ping_connect_timeout_seconds(self) -> int:
+        return int(self.read(VaultProperties.__name__, 'vault.ping.connectTimeoutSeconds'))
+
+    @property
+    def vault_ping_max_period_seconds(self) -> int:
+        return int(self.read(VaultProperties.__name__, 'vault.ping.maxPeriodSeconds'))
+
+    @property
+    def vault_ping_backoff_multiplier(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.ping.backoffMultiplier'))
+
+    @property
+    def vault_ping_jitter(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.ping.jitter'))
+
+    @property
+    def vault_ping_deadline_seconds(self) -> int:
+        return int(self.read(VaultProperties.__name__, 'vault.ping.deadlineSeconds'))
+
+    @property
+    def vault_up_failure_threshold(self) -> int:
+        return int(self.read(VaultProperties.__name__, 'vault.up.failureThreshold'))
+
+    @property
+    def vault_up_deadline_seconds(self) -> int:
+        return int(self.read(VaultProperties.__name__, 'vault.up.deadlineSeconds'))
+
     @property
     def vault_ping_log_level(self) -> str:
         return self.read(VaultProperties.__name__, 'vault.ping.log.level')
@@ -144,3 +342,241 @@ class VaultProperties(AppProperties):
     @property
     def vault_client_log_level(self) -> str:
         return self.read(VaultProperties.__name__, 'vault.client.log.level')
+
+    @property
+    def vault_apply_concurrency(self) -> int:
+        return int(self.read(VaultProperties.__name__, 'vault.apply.concurrency'))
+
+    @property
+    def vault_kube_jwt_path(self) -> str:
+        return self.read(VaultProperties.__name__, 'vault.kubernetes.jwtPath')
+
+    @property
+    def vault_token_renew_ratio(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.token.renewRatio'))
+
+    @property
+    def vault_hcl_cache_path(self) -> str:
+        if self.read(VaultProperties.__name__, 'vault.hcl.cache.enabled').lower() != 'true':
+            return None
+
+        return os.path.join(os.environ[EnvConstants.HOME], self.read(VaultProperties.__name__, 'vault.hcl.cache.path'))
+
+    @property
+    def vault_checkpoint_path(self) -> str:
+        if self.read(VaultProperties.__name__, 'vault.checkpoint.enabled').lower() != 'true':
+            return None
+
+        return os.path.join(os.environ[EnvConstants.HOME], self.read(VaultProperties.__name__, 'vault.checkpoint.path'))
+
+    @property
+    def vault_export_path(self) -> str:
+        return os.path.join(os.environ[EnvConstants.HOME], self.read(VaultProperties.__name__, 'vault.export.path'))
+
+    @property
+    def vault_export_concurrency(self) -> int:
+        return int(self.read(VaultProperties.__name__, 'vault.export.concurrency'))
+
+    @property
+    def vault_export_wrap_ttl(self) -> str:
+        return self.read(VaultProperties.__name__, 'vault.export.wrapTTL')
+
+    @property
+    def vault_lock_enabled(self) -> bool:
+        return self.read(VaultProperties.__name__, 'vault.lock.enabled').lower() == 'true'
+
+    @property
+    def vault_lock_mount(self) -> str:
+        return self.read(VaultProperties.__name__, 'vault.lock.mount')
+
+    @property
+    def vault_lock_path(self) -> str:
+        return self.read(VaultProperties.__name__, 'vault.lock.path')
+
+    @property
+    def vault_lock_lease_seconds(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.lock.leaseSeconds'))
+
+    @property
+    def vault_lock_poll_seconds(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.lock.pollSeconds'))
+
+    @property
+    def vault_lock_wait_seconds(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.lock.waitSeconds'))
+
+    @property
+    def vault_lock_result_ttl_seconds(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.lock.resultTtlSeconds'))
+
+    @property
+    def vault_hcl_parse_workers(self) -> int:
+        return int(self.read(VaultProperties.__name__, 'vault.hcl.parse.workers'))
+
+    @property
+    def vault_watch_enabled(self) -> bool:
+        return self.read(VaultProperties.__name__, 'vault.watch.enabled').lower() == 'true'
+
+    @property
+    def vault_watch_poll_seconds(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.watch.pollSeconds'))
+
+    @property
+    def vault_watch_debounce_seconds(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.watch.debounceSeconds'))
+
+    @property
+    def vault_trace_enabled(self) -> bool:
+        return self.read(VaultProperties.__name__, 'vault.trace.enabled').lower() == 'true'
+
+    @property
+    def vault_trace_format(self) -> str:
+        return self.read(VaultProperties.__name__, 'vault.trace.format').lower()
+
+    @property
+    def vault_trace_path(self) -> str:
+        return os.path.join(os.environ[EnvConstants.HOME], self.read(VaultProperties.__name__, 'vault.trace.path'))
+
+    @property
+    def vault_http_pool_size(self) -> int:
+        return int(self.read(VaultProperties.__name__, 'vault.http.pool.size'))
+
+    @property
+    def vault_http_keep_alive(self) -> bool:
+        return self.read(VaultProperties.__name__, 'vault.http.keepAlive').lower() == 'true'
+
+    @property
+    def vault_http_timeout_seconds(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.http.timeoutSeconds'))
+
+    @property
+    def vault_async_enabled(self) -> bool:
+        return self.read(VaultProperties.__name__, 'vault.async.enabled').lower() == 'true'
+
+    @property
+    def vault_async_concurrency(self) -> int:
+        return int(self.read(VaultProperties.__name__, 'vault.async.concurrency'))
+
+    @property
+    def vault_replicas_discovery(self) -> str:
+        return self.read(VaultProperties.__name__, 'vault.replicas.discovery').lower()
+
+    @property
+    def vault_replicas_addresses(self) -> list:
+        addresses = self.read(VaultProperties.__name__, 'vault.replicas.addresses')
+
+        return [address.strip() for address in addresses.split(',') if address.strip()]
+
+    @property
+    def vault_replicas_label_selector(self) -> str:
+        return self.read(VaultProperties.__name__, 'vault.replicas.labelSelector')
+
+    @property
+    def vault_replicas_address_template(self) -> str:
+        return self.read(VaultProperties.__name__, 'vault.replicas.addressTemplate')
+
+    @property
+    def vault_replicas_unseal_attempts(self) -> int:
+        return int(self.read(VaultProperties.__name__, 'vault.replicas.unsealAttempts'))
+
+    @property
+    def vault_replicas_retry_seconds(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.replicas.retrySeconds'))
+
+    @property
+    def vault_replicas_refresh_seconds(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.replicas.refreshSeconds'))
+
+    @property
+    def vault_limiter_enabled(self) -> bool:
+        return self.read(VaultProperties.__name__, 'vault.limiter.enabled').lower() == 'true'
+
+    @property
+    def vault_limiter_initial_limit(self) -> int:
+        return int(self.read(VaultProperties.__name__, 'vault.limiter.initialLimit'))
+
+    @property
+    def vault_limiter_min_limit(self) -> int:
+        return int(self.read(VaultProperties.__name__, 'vault.limiter.minLimit'))
+
+    @property
+    def vault_limiter_max_limit(self) -> int:
+        return int(self.read(VaultProperties.__name__, 'vault.limiter.maxLimit'))
+
+    @property
+    def vault_limiter_backoff_ratio(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.limiter.backoffRatio'))
+
+    @property
+    def vault_limiter_latency_tolerance(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.limiter.latencyTolerance'))
+
+    @property
+    def vault_breaker_failure_threshold(self) -> int:
+        return int(self.read(VaultProperties.__name__, 'vault.breaker.failureThreshold'))
+
+    @property
+    def vault_breaker_open_seconds(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.breaker.openSeconds'))
+
+    @property
+    def vault_breaker_max_open_seconds(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.breaker.maxOpenSeconds'))
+
+    @property
+    def vault_breaker_max_wait_seconds(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.breaker.maxWaitSeconds'))
+
+    @property
+    def vault_retry_attempts(self) -> int:
+        return int(self.read(VaultProperties.__name__, 'vault.retry.attempts'))
+
+    @property
+    def vault_retry_base_seconds(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.retry.baseSeconds'))
+
+    @property
+    def vault_retry_max_seconds(self) -> float:
+        return float(self.read(VaultProperties.__name__, 'vault.retry.maxSeconds'))
+
+    @property
+    def vault_targets(self) -> dict:
+        targets = {}
+
+        for target in self.read(VaultProperties.__name__, 'vault.targets').split(','):
+            name, separator, address = target.strip().partition('=')
+
+            if not separator or not name.strip() or not address.strip():
+                if target.strip():
+                    raise ValidationException(f'Vault target "{target.strip()}" must be set as <name>=<address>')
+
+                continue
+
+            if '/' in name or name.strip() in targets:
+                raise ValidationException(f'Vault target name "{name.strip()}" must be unique and cannot contain "/"')
+
+            targets[name.strip()] = address.strip()
+
+        return targets
+
+    @property
+    def vault_targets_namespaces(self) -> dict:
+        namespaces = {}
+
+        for target in self.read(VaultProperties.__name__, 'vault.targets.namespaces').split(','):
+            name, separator, namespace = target.strip().partition('=')
+
+            if not separator or not name.strip() or not namespace.strip():
+                if target.strip():
+                    raise ValidationException(f'Vault target namespace "{target.strip()}" must be set as '
+                                              f'<name>=<namespace>')
+
+                continue
+
+            namespaces[name.strip()] = namespace.strip()
+
+        return namespaces
+
+    @property
+    def vault_targets_concurrency(self) -> int:
+        return int(self.read(VaultProperties.__name__, 'vault.targets.concurrency'))
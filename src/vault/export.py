@@ -0,0 +1,250 @@
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from hvac import exceptions
+
+from exceptions import ExportFailedException
+from util import Logger
+from .config import ConfigType, HCLParser
+from .reconcile import StateDiff
+from .snapshot import VaultSnapshot
+
+
+class HCLWriter(object):
+    INDENT = '  '
+    IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_-]*')
+    LABELED_BLOCKS = ('path',)
+
+    @classmethod
+    def __key(cls, key: str) -> str:
+        return key if cls.IDENTIFIER.fullmatch(key) else json.dumps(key)
+
+    @classmethod
+    def __value(cls, value) -> str:
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        elif isinstance(value, (int, float)):
+            return str(value)
+
+        return json.dumps(str(value))
+
+    @classmethod
+    def __block(cls, header: str, body: dict, depth: int) -> list:
+        indent = cls.INDENT * depth
+
+        return [f'{indent}{header} {{', *cls.__body(body, depth + 1), f'{indent}}}']
+
+    @classmethod
+    def __body(cls, body: dict, depth: int) -> list:
+        indent = cls.INDENT * depth
+        lines = []
+
+        for key, value in body.items():
+            if key in cls.LABELED_BLOCKS and isinstance(value, (dict, list)):
+                for labeled in value if isinstance(value, list) else [value]:
+                    for label, block in labeled.items():
+                        lines += cls.__block(f'{cls.__key(key)} {json.dumps(label)}', block, depth)
+            elif isinstance(value, dict):
+                lines += cls.__block(cls.__key(key), value, depth)
+            elif isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+                for item in value:
+                    lines += cls.__block(cls.__key(key), item, depth)
+            elif isinstance(value, list):
+                items = [f'{indent}{cls.INDENT}{cls.__value(item)}' for item in value]
+
+                lines += [f'{indent}{cls.__key(key)} = [', ',\n'.join(items), f'{indent}]'] if items \
+                    else [f'{indent}{cls.__key(key)} = []']
+            elif value is not None:
+                lines.append(f'{indent}{cls.__key(key)} = {cls.__value(value)}')
+
+        return lines
+
+    @classmethod
+    def dumps(cls, config_type: ConfigType, name: str, body: dict) -> str:
+        return '\n'.join(cls.__block(f'{config_type.config_type} {json.dumps(name)}', body, 0)) + '\n'
+
+
+class HCLExporter(object):
+    SYSTEM_MOUNTS = ('sys/', 'cubbyhole/', 'identity/')
+    SYSTEM_AUTH_METHODS = ('token/', 'kubernetes/')
+    SYSTEM_POLICIES = ('root',)
+
+    def __init__(self, api, snapshot: VaultSnapshot, directory: str, concurrency: int = 16,
+                 reserved_mounts: tuple = (), wrap_ttl: str = '15m', log_level: str = 'INFO'):
+        self.__log = Logger.getLogger(HCLExporter.__name__)
+        self.__log.setLevel(log_level)
+
+        self.__api = api
+        self.__snapshot = snapshot
+        self.__directory = directory
+        self.__concurrency = max(1, concurrency)
+        self.__reserved_mounts = HCLExporter.SYSTEM_MOUNTS + tuple(f'{mount}/' for mount in reserved_mounts)
+        self.__wrap_ttl = wrap_ttl
+        self.__wrap_ttl_filled = False
+
+    def __path(self, config_type: ConfigType, name: str = None) -> str:
+        directory = os.path.join(self.__directory, config_type.config_type)
+
+        return directory if name is None else os.path.join(directory, f'{re.sub(r"[^A-Za-z0-9._-]+", "_", name)}.hcl')
+
+    def __list(self, path: str) -> list:
+        try:
+            response = self.__api.list(path)
+        except exceptions.InvalidPath:
+            return []
+
+        return response['data']['keys'] if response else []
+
+    def __read(self, path: str) -> dict:
+        try:
+            response = self.__api.read(path)
+        except exceptions.InvalidPath:
+            return None
+
+        return response['data'] if response else None
+
+    def __policy(self, name: str) -> dict:
+        return {'enabled': True, 'config': HCLParser.loads(self.__api.sys.read_policy(name)['rules'])}
+
+    def __fill_wrap_ttl(self) -> str:
+        # wrap_ttl is sent as a header when the role is written, Vault doesn't keep it on the role
+        self.__wrap_ttl_filled = True
+
+        return self.__wrap_ttl
+
+    def __kube_role(self, auth_path: str, role_name: str) -> dict:
+        role = self.__read(f'auth/{auth_path}/role/{role_name}')
+
+        if role is None:
+            return None
+
+        accounts = role.get('bound_service_account_names') or []
+        namespaces = role.get('bound_service_account_namespaces') or []
+
+        if len(accounts) > 1 or len(namespaces) > 1:
+            self.__log.warning(f'Kubernetes role {role_name} is bound to several service accounts, '
+                               f'only the first one is exported.')
+
+        return {
+            'enabled': True,
+            'auth_path': auth_path,
+            'bound_service_account_name': accounts[0] if accounts else None,
+            'bound_service_account_namespace': namespaces[0] if namespaces else None,
+            'wrap_ttl': self.__fill_wrap_ttl(),
+            'policies': sorted(role.get('token_policies') or role.get('policies') or []),
+            'type': 'kubernetes'
+        }
+
+    def __github_role(self, auth_path: str, organization: str, team_name: str) -> dict:
+        team = self.__read(f'auth/{auth_path}/map/teams/{team_name}')
+
+        if team is None:
+            return None
+
+        return {
+            'enabled': True,
+            'auth_path': auth_path,
+            'org': organization,
+            'team_name': team_name,
+            'policies': sorted(policy for policy in (team.get('value') or '').split(',') if policy),
+            'type': 'github'
+        }
+
+    @classmethod
+    def __listed(cls, entries: dict) -> list:
+        return sorted((path, entry) for path, entry in entries.items()
+                      if path.endswith('/') and isinstance(entry, dict))
+
+    def __entries(self, auth_methods: dict, mounts: dict, policies: list):
+        for auth_path, method in HCLExporter.__listed(auth_methods):
+            if auth_path not in HCLExporter.SYSTEM_AUTH_METHODS:
+                yield ConfigType.AUTH, auth_path.rstrip('/'), lambda method=method: {
+                    'enabled': True, 'type': method.get('type'), 'description': method.get('description') or ''}
+
+        for path, mount in HCLExporter.__listed(mounts):
+            if path not in self.__reserved_mounts:
+                engine = StateDiff.KV_V2_ENGINE if StateDiff.engine_matches(StateDiff.KV_V2_ENGINE, mount) \
+                    else mount.get('type')
+
+                yield ConfigType.SECRET, path.rstrip('/'), lambda engine=engine: {'enabled': True, 'engine': engine}
+
+        for policy in sorted(policies):
+            if policy not in HCLExporter.SYSTEM_POLICIES:
+                yield ConfigType.POLICY, policy, lambda policy=policy: self.__policy(policy)
+
+        for auth_path, method in HCLExporter.__listed(auth_methods):
+            auth_path = auth_path.rstrip('/')
+
+            if f'{auth_path}/' in HCLExporter.SYSTEM_AUTH_METHODS:
+                continue
+
+            if method.get('type') == 'kubernetes':
+                for role_name in self.__list(f'auth/{auth_path}/role'):
+                    yield ConfigType.ROLE, role_name, \
+                        lambda auth_path=auth_path, role_name=role_name: self.__kube_role(auth_path, role_name)
+            elif method.get('type') == 'github':
+                organization = (self.__read(f'auth/{auth_path}/config') or {}).get('organization')
+
+                for team_name in self.__list(f'auth/{auth_path}/map/teams'):
+                    yield ConfigType.ROLE, f'{auth_path}-{team_name}', \
+                        lambda auth_path=auth_path, organization=organization, team_name=team_name: \
+                        self.__github_role(auth_path, organization, team_name)
+
+    def __write(self, config_type: ConfigType, name: str, body: dict):
+        path = self.__path(config_type, name)
+
+        with open(f'{path}.tmp', 'w') as f:
+            f.write(HCLWriter.dumps(config_type, name, body))
+
+        os.replace(f'{path}.tmp', path)
+
+    def __collect(self, futures, running: dict, counts: dict, errors: dict):
+        for future in futures:
+            config_type, name = running.pop(future)
+
+            try:
+                body = future.result()
+            except Exception as e:
+                self.__log.error(f'Unable to export {config_type.config_type} {name}: {e}')
+
+                errors[f'{config_type.config_type}/{name}'] = e
+                continue
+
+            if body is not None:
+                self.__write(config_type, name, body)
+
+                counts[config_type.config_type] += 1
+
+    def export(self) -> dict:
+        for config_type in ConfigType:
+            os.makedirs(self.__path(config_type), exist_ok=True)
+
+        counts = {config_type.config_type: 0 for config_type in ConfigType}
+        errors = {}
+        running = {}
+
+        entries = self.__entries(self.__snapshot.auth_methods(), self.__snapshot.mounts(),
+                                 self.__snapshot.policies())
+
+        with ThreadPoolExecutor(max_workers=self.__concurrency, thread_name_prefix=HCLExporter.__name__) as executor:
+            for config_type, name, fetch in entries:
+                if len(running) >= self.__concurrency * 2:
+                    self.__collect(wait(running, return_when=FIRST_COMPLETED)[0], running, counts, errors)
+
+                running[executor.submit(fetch)] = (config_type, name)
+
+            self.__collect(list(running), running, counts, errors)
+
+        self.__log.info(f'Exported Vault configs to {self.__directory} - '
+                        f'{", ".join(f"{config_type}: {count}" for config_type, count in counts.items())}.')
+
+        if self.__wrap_ttl_filled:
+            self.__log.warning(f'Vault does not return the wrap_ttl of Kubernetes roles, they were exported with '
+                               f'{self.__wrap_ttl} from vault.export.wrapTTL.')
+
+        if errors:
+            raise ExportFailedException(errors)
+
+        return counts
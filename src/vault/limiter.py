@@ -0,0 +1,194 @@
+import random
+import threading
+import time
+
+from exceptions import CircuitOpenException
+from metrics import Metrics
+from util import Logger
+
+
+class RetryPolicy(object):
+    def __init__(self, attempts: int = 3, base_seconds: float = 0.2, max_seconds: float = 5):
+        self.__attempts = max(0, attempts)
+        self.__base_seconds = base_seconds
+        self.__max_seconds = max_seconds
+
+    @property
+    def attempts(self) -> int:
+        return self.__attempts
+
+    def delay(self, attempt: int, retry_after: str = None) -> float:
+        delay = random.uniform(0, min(self.__max_seconds, self.__base_seconds * 2 ** attempt))
+
+        try:
+            return max(delay, min(self.__max_seconds, float(retry_after))) if retry_after else delay
+        except ValueError:
+            return delay
+
+
+class CircuitBreaker(object):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold: int = 5, open_seconds: float = 5, max_open_seconds: float = 60):
+        self.__failure_threshold = max(1, failure_threshold)
+        self.__base_open_seconds = open_seconds
+        self.__max_open_seconds = max(open_seconds, max_open_seconds)
+
+        self.__state = CircuitBreaker.CLOSED
+        self.__failures = 0
+        self.__opened_at = 0
+        self.__open_seconds = open_seconds
+        self.__trial = False
+
+    @property
+    def state(self) -> str:
+        return self.__state
+
+    def wait_seconds(self, now: float):
+        if self.__state == CircuitBreaker.OPEN:
+            remaining = self.__opened_at + self.__open_seconds - now
+
+            if remaining > 0:
+                return remaining
+
+            self.__state = CircuitBreaker.HALF_OPEN
+            self.__trial = False
+
+        if self.__state == CircuitBreaker.HALF_OPEN:
+            if self.__trial:
+                return None
+
+            self.__trial = True
+
+        return 0
+
+    def record(self, healthy: bool, now: float) -> bool:
+        if healthy:
+            self.__failures = 0
+
+            if self.__state != CircuitBreaker.CLOSED:
+                self.__state = CircuitBreaker.CLOSED
+                self.__open_seconds = self.__base_open_seconds
+
+                return True
+
+            return False
+
+        self.__failures += 1
+
+        if self.__state == CircuitBreaker.HALF_OPEN:
+            self.__open_seconds = min(self.__max_open_seconds, self.__open_seconds * 2)
+        elif self.__state == CircuitBreaker.OPEN or self.__failures < self.__failure_threshold:
+            return False
+
+        self.__state = CircuitBreaker.OPEN
+        self.__opened_at = now
+        self.__trial = False
+
+        return True
+
+
+class AdaptiveLimiter(object):
+    FAST_SMOOTHING = 0.3
+    SLOW_SMOOTHING = 0.02
+
+    def __init__(self, address: str, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 64,
+                 backoff_ratio: float = 0.5, latency_tolerance: float = 2, breaker: CircuitBreaker = None,
+                 max_wait_seconds: float = 60, log_level: str = 'INFO'):
+        self.__log = Logger.getLogger(AdaptiveLimiter.__name__)
+        self.__log.setLevel(log_level)
+
+        self.__address = address
+        self.__min_limit = max(1, min_limit)
+        self.__max_limit = max(self.__min_limit, max_limit)
+        self.__backoff_ratio = backoff_ratio
+        self.__latency_tolerance = latency_tolerance
+        self.__breaker = breaker or CircuitBreaker()
+        self.__max_wait_seconds = max_wait_seconds
+
+        self.__condition = threading.Condition()
+        self.__limit = float(min(self.__max_limit, max(self.__min_limit, initial_limit)))
+        self.__in_flight = 0
+        self.__latency = None
+        self.__baseline = None
+        self.__backed_off_at = 0
+
+        Metrics.VAULT_CONCURRENCY_LIMIT.labels(address).set(self.__limit)
+        Metrics.VAULT_CIRCUIT_OPEN.labels(address).set(0)
+
+    @property
+    def limit(self) -> int:
+        return int(self.__limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self.__in_flight
+
+    @property
+    def circuit(self) -> str:
+        return self.__breaker.state
+
+    def acquire(self, write: bool) -> float:
+        waiting_since = time.monotonic()
+
+        with self.__condition:
+            while True:
+                now = time.monotonic()
+                wait = None
+
+                if self.__in_flight < int(self.__limit):
+                    wait = self.__breaker.wait_seconds(now) if write else 0
+
+                    if wait == 0:
+                        break
+
+                if write and self.__breaker.state != CircuitBreaker.CLOSED \
+                        and now - waiting_since >= self.__max_wait_seconds:
+                    raise CircuitOpenException(self.__address, now - waiting_since)
+
+                self.__condition.wait(min(wait or self.__max_wait_seconds, self.__max_wait_seconds))
+
+            self.__in_flight += 1
+
+        return time.monotonic()
+
+    def release(self, started: float, failed: bool):
+        now = time.monotonic()
+        latency = now - started
+
+        with self.__condition:
+            self.__in_flight -= 1
+
+            if not failed:
+                self.__latency = latency if self.__latency is None \
+                    else self.__latency + AdaptiveLimiter.FAST_SMOOTHING * (latency - self.__latency)
+                self.__baseline = latency if self.__baseline is None \
+                    else self.__baseline + AdaptiveLimiter.SLOW_SMOOTHING * (latency - self.__baseline)
+
+            slow = not failed and self.__latency > self.__baseline * self.__latency_tolerance
+
+            if failed or slow:
+                if started >= self.__backed_off_at:
+                    self.__limit = max(self.__min_limit, self.__limit * self.__backoff_ratio)
+                    self.__backed_off_at = now
+
+                    self.__log.debug(f'Vault at {self.__address} is congested ({"failed" if failed else "slow"} '
+                                     f'call in {latency:.3f}s), in-flight limit lowered to {int(self.__limit)}.')
+            else:
+                self.__limit = min(self.__max_limit, self.__limit + 1 / self.__limit)
+
+            if self.__breaker.record(not failed, now):
+                opened = self.__breaker.state == CircuitBreaker.OPEN
+
+                Metrics.VAULT_CIRCUIT_OPEN.labels(self.__address).set(1 if opened else 0)
+
+                if opened:
+                    self.__log.warning(f'Vault at {self.__address} looks unhealthy, pausing writes.')
+                else:
+                    self.__log.info(f'Vault at {self.__address} recovered, resuming writes.')
+
+            Metrics.VAULT_CONCURRENCY_LIMIT.labels(self.__address).set(int(self.__limit))
+
+            self.__condition.notify_all()
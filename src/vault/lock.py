@@ -0,0 +1,308 @@
+import socket
+import threading
+import time
+import uuid
+
+from hvac import exceptions
+
+from constants import InitConstants
+from util import Logger, Steps
+from .snapshot import VaultSnapshot
+
+
+class LeaderLock(object):
+    RESULT_STATES = (InitConstants.FINISHED_STATE, InitConstants.FAILED_STATE)
+
+    def __init__(self, api, snapshot: VaultSnapshot, authenticate, mount: str, path: str, lease_seconds: float = 30,
+                 poll_seconds: float = 2, wait_seconds: float = 600, result_ttl_seconds: float = 600,
+                 enabled: bool = True, log_level: str = 'INFO'):
+        self.__log = Logger.getLogger(LeaderLock.__name__)
+        self.__log.setLevel(log_level)
+
+        self.__api = api
+        self.__snapshot = snapshot
+        self.__authenticate = authenticate
+        self.__mount = mount
+        self.__path = path
+        self.__lease_seconds = lease_seconds
+        self.__poll_seconds = poll_seconds
+        self.__wait_seconds = wait_seconds
+        self.__result_ttl_seconds = result_ttl_seconds
+        self.__enabled = enabled
+
+        self.__identity = f'{socket.gethostname()}-{uuid.uuid4().hex[:8]}'
+
+        self.__lock = threading.RLock()
+        self.__electing = threading.Lock()
+        self.__stopped = threading.Event()
+        self.__changed = threading.Event()
+        self.__resigned = threading.Event()
+        self.__heartbeat = None
+
+        self.__leading = not enabled
+        self.__version = None
+        self.__steps = None
+        self.__bundle = None
+        self.__mounted = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.__enabled
+
+    @property
+    def identity(self) -> str:
+        return self.__identity
+
+    @property
+    def leading(self) -> bool:
+        return self.__leading
+
+    def __read(self) -> tuple:
+        try:
+            response = self.__api.secrets.kv.v2.read_secret_version(path=self.__path, mount_point=self.__mount)
+
+            return response['data']['metadata']['version'], response['data']['data']
+        except exceptions.InvalidPath:
+            pass
+
+        try:
+            metadata = self.__api.secrets.kv.v2.read_secret_metadata(path=self.__path, mount_point=self.__mount)
+
+            return metadata['data']['current_version'], None
+        except exceptions.InvalidPath:
+            return 0, None
+
+    def __write(self, record: dict, version: int):
+        try:
+            response = self.__api.secrets.kv.v2.create_or_update_secret(path=self.__path, secret=record, cas=version,
+                                                                        mount_point=self.__mount)
+        except exceptions.InvalidRequest:
+            return None
+
+        return response['data']['version']
+
+    def __ensure_mount(self):
+        if self.__mounted:
+            return
+
+        try:
+            mounted = f'{self.__mount}/' in self.__snapshot.mounts()
+        except exceptions.Forbidden:
+            # replicas logged in with the internal role can't list mounts, the leader has enabled it for them
+            mounted = True
+
+        if not mounted:
+            self.__log.info(f'Enabling kv-v2 on path /{self.__mount} for the leader lock.')
+
+            try:
+                self.__api.sys.enable_secrets_engine('kv-v2', path=self.__mount)
+            except exceptions.InvalidRequest:
+                pass
+
+            self.__snapshot.invalidate(VaultSnapshot.MOUNTS)
+
+        self.__mounted = True
+
+    def __record(self, **fields) -> dict:
+        return dict({
+            'holder': self.__identity,
+            'bundle': self.__bundle,
+            'expires_at': time.time() + self.__lease_seconds,
+            'steps': self.__steps.to_dict() if self.__steps is not None else {},
+            'result': None,
+            'finished_at': None
+        }, **fields)
+
+    def __reusable(self, record: dict) -> bool:
+        return record.get('result') == InitConstants.FINISHED_STATE and record.get('bundle') == self.__bundle \
+            and time.time() - (record.get('finished_at') or 0) < self.__result_ttl_seconds
+
+    def __held(self, record: dict) -> bool:
+        return record.get('result') is None and record.get('expires_at', 0) > time.time()
+
+    def __try_acquire(self) -> bool:
+        version, record = self.__read()
+
+        if record is not None and record.get('holder') != self.__identity \
+                and (self.__reusable(record) or self.__held(record)):
+            return False
+
+        with self.__lock:
+            written = self.__write(self.__record(), version)
+
+            if written is None:
+                # a retried write may have landed already, so the lock is only lost if someone else holds it now
+                written, record = self.__read()
+
+                if record is None or record.get('holder') != self.__identity or record.get('result') is not None:
+                    return False
+
+            self.__version = written
+
+            return True
+
+    def __renew(self, **fields) -> bool:
+        with self.__lock:
+            version = self.__write(self.__record(**fields), self.__version)
+
+            if version is None:
+                # a retried write may have landed already, so the lock is only lost if someone else holds it now
+                version, record = self.__read()
+
+                if record is None or record.get('holder') != self.__identity or record.get('result') is not None:
+                    return False
+
+            self.__version = version
+
+            return True
+
+    def __beat(self):
+        published = time.monotonic()
+
+        while self.__leading:
+            due = published + self.__lease_seconds / 3
+
+            # step changes are coalesced, followers only read the record every poll_seconds anyway
+            if self.__changed.wait(max(0.0, due - time.monotonic())):
+                self.__resigned.wait(max(0.0, min(due, published + self.__poll_seconds) - time.monotonic()))
+
+            if self.__resigned.is_set():
+                return
+
+            self.__changed.clear()
+            self.publish()
+
+            published = time.monotonic()
+
+    def touch(self):
+        if self.__enabled and self.__leading:
+            self.__changed.set()
+
+    def publish(self):
+        with self.__lock:
+            if not self.__enabled or not self.__leading:
+                return
+
+            try:
+                renewed = self.__renew()
+            except Exception as e:
+                self.__log.warning(f'Unable to renew the leader lock: {e}')
+                return
+
+            if not renewed:
+                self.__log.error('Leader lock was taken over by another instance.')
+
+                self.__leading = False
+
+    def elect(self, steps: Steps, bundle: str) -> bool:
+        self.__steps = steps
+        self.__bundle = bundle
+
+        with self.__electing:
+            if self.__leading:
+                return True
+
+            deadline = time.monotonic() + self.__wait_seconds
+
+            while time.monotonic() < deadline and not self.__stopped.is_set():
+                try:
+                    if self.__authenticate():
+                        self.__ensure_mount()
+
+                        if self.__try_acquire():
+                            self.__log.info(f'Acquired the leader lock as {self.__identity}.')
+
+                            # the previous heartbeat has stopped once it saw the release or the takeover
+                            if self.__heartbeat is not None:
+                                self.__heartbeat.join()
+
+                            self.__leading = True
+                            self.__changed.clear()
+                            self.__resigned.clear()
+                            self.__heartbeat = threading.Thread(target=self.__beat, name=LeaderLock.__name__,
+                                                                daemon=True)
+                            self.__heartbeat.start()
+                        else:
+                            self.__log.info('Another instance holds the leader lock, following its progress.')
+
+                        return True
+                except Exception as e:
+                    self.__log.debug(f'Leader lock is not available yet: {e}')
+
+                self.__log.info(f'Waiting for Vault to accept the leader lock, retrying in {self.__poll_seconds}s...')
+                self.__stopped.wait(self.__poll_seconds)
+
+        self.__log.error(f'Unable to elect a leader in {self.__wait_seconds}s.')
+
+        return False
+
+    def follow(self, step: str, bundle: str):
+        deadline = time.monotonic() + self.__wait_seconds
+
+        while time.monotonic() < deadline and not self.__stopped.is_set():
+            try:
+                self.__authenticate()
+
+                _, record = self.__read()
+            except Exception as e:
+                self.__log.debug(f'Unable to read the leader lock: {e}')
+
+                self.__stopped.wait(self.__poll_seconds)
+                continue
+
+            if record is None:
+                return None
+
+            state = record.get('steps', {}).get(step, {}).get('state')
+
+            if record.get('bundle') == bundle and state in LeaderLock.RESULT_STATES:
+                self.__log.info(f'Step "{step}" was {state} by the leader {record.get("holder")}.')
+
+                return state == InitConstants.FINISHED_STATE
+
+            if record.get('result') is not None:
+                self.__log.info(f'Leader lock was released without finishing step "{step}" for this HCL bundle.')
+
+                return None
+
+            if not self.__held(record):
+                self.__log.warning(f'Leader {record.get("holder")} has gone before step "{step}" was finished.')
+
+                return None
+
+            self.__stopped.wait(self.__poll_seconds)
+
+        self.__log.error(f'Leader has not finished step "{step}" in {self.__wait_seconds}s.')
+
+        return False
+
+    def release(self, succeeded: bool):
+        result = InitConstants.FINISHED_STATE if succeeded else InitConstants.FAILED_STATE
+
+        with self.__lock:
+            if not self.__enabled or not self.__leading:
+                return
+
+            self.__leading = False
+
+            try:
+                released = self.__renew(result=result, finished_at=time.time(), expires_at=time.time())
+            except Exception as e:
+                self.__log.warning(f'Unable to release the leader lock: {e}')
+                released = False
+
+        self.__resign()
+
+        if released:
+            self.__log.info(f'Released the leader lock, reconcile {result}.')
+
+    def __resign(self):
+        self.__resigned.set()
+        self.__changed.set()
+
+        if self.__heartbeat is not None and self.__heartbeat is not threading.current_thread():
+            self.__heartbeat.join()
+
+    def close(self):
+        self.__stopped.set()
+        self.__resign()
@@ -0,0 +1,138 @@
+import random
+import time
+
+from constants import HealthProbeConstants
+from exceptions import HealthProbeFailedException
+from metrics import Metrics
+from util import Logger
+
+
+class HealthProbe(object):
+    READY = 'ready'
+    RUNNING = 'running'
+
+    def __init__(self, log_level: str = 'INFO', name: str = 'health',
+                 failure_threshold: int = HealthProbeConstants.FAILURE_THRESHOLD,
+                 initial_delay_seconds: int = HealthProbeConstants.INITIAL_DELAY,
+                 period_seconds: int = HealthProbeConstants.PERIOD,
+                 success_threshold: int = HealthProbeConstants.SUCCESS_THRESHOLD,
+                 timeout_seconds: int = HealthProbeConstants.TIMEOUT,
+                 connect_timeout_seconds: int = HealthProbeConstants.CONNECT_TIMEOUT,
+                 max_period_seconds: int = HealthProbeConstants.MAX_PERIOD,
+                 backoff_multiplier: float = HealthProbeConstants.BACKOFF_MULTIPLIER,
+                 jitter: float = HealthProbeConstants.JITTER,
+                 deadline_seconds: int = HealthProbeConstants.DEADLINE):
+
+        self.__log = Logger.getLogger(HealthProbe.__name__)
+        self.__log.setLevel(log_level)
+
+        self.__failure_threshold = failure_threshold
+        self.__initial_delay_seconds = initial_delay_seconds
+        self.__period_seconds = period_seconds
+        self.__success_threshold = success_threshold
+        self.__timeout_seconds = timeout_seconds
+        self.__connect_timeout_seconds = connect_timeout_seconds
+        self.__max_period_seconds = max_period_seconds
+        self.__backoff_multiplier = backoff_multiplier
+        self.__jitter = jitter
+        self.__deadline_seconds = deadline_seconds
+        self.__name = name
+        self.__closed = False
+
+        self.__attempts = 0
+        self.__time_to_ready = None
+
+    @classmethod
+    def of(cls, vault_properties, name: str, failure_threshold: int, deadline_seconds: int):
+        return HealthProbe(log_level=vault_properties.vault_ping_log_level,
+                           name=name,
+                           failure_threshold=failure_threshold,
+                           initial_delay_seconds=vault_properties.vault_ping_initial_delay_seconds,
+                           period_seconds=vault_properties.vault_ping_period_seconds,
+                           success_threshold=vault_properties.vault_ping_success_threshold,
+                           timeout_seconds=vault_properties.vault_ping_timeout_seconds,
+                           connect_timeout_seconds=vault_properties.vault_ping_connect_timeout_seconds,
+                           max_period_seconds=vault_properties.vault_ping_max_period_seconds,
+                           backoff_multiplier=vault_properties.vault_ping_backoff_multiplier,
+                           jitter=vault_properties.vault_ping_jitter,
+                           deadline_seconds=deadline_seconds)
+
+    def is_closed(self) -> bool:
+        return self.__closed
+
+    @property
+    def attempts(self) -> int:
+        return self.__attempts
+
+    @property
+    def time_to_ready(self):
+        return self.__time_to_ready
+
+    def __delay(self, failures: int, remaining: float) -> float:
+        delay = min(self.__max_period_seconds,
+                    self.__period_seconds * self.__backoff_multiplier ** max(0, failures - 1))
+        delay *= 1 - self.__jitter * random.random()
+
+        return max(0.0, min(delay, remaining))
+
+    def __timeout(self, remaining: float) -> tuple:
+        return min(self.__connect_timeout_seconds, remaining), min(self.__timeout_seconds, remaining)
+
+    def run(self, request, check=lambda response: response.status_code == 200) -> bool:
+        if self.__closed:
+            return False
+
+        failures = 0
+        successes = 0
+
+        self.__log.info('Health probe started...')
+
+        started = time.monotonic()
+        deadline = started + self.__deadline_seconds
+
+        time.sleep(max(0.0, min(self.__initial_delay_seconds, deadline - time.monotonic())))
+
+        while not failures == self.__failure_threshold and not successes == self.__success_threshold:
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+                self.__log.info(f'Health probe deadline of {self.__deadline_seconds}s exceeded.')
+                break
+
+            self.__log.info('Trying to perform health probe...')
+            self.__attempts += 1
+
+            try:
+                if check(request(self.__timeout(remaining))):
+                    successes += 1
+                    Metrics.PROBE_ATTEMPTS.labels(self.__name, 'success').inc()
+                    self.__log.info('Health probe succeeded!')
+                else:
+                    failures += 1
+                    Metrics.PROBE_ATTEMPTS.labels(self.__name, 'failure').inc()
+                    self.__log.info('Health probe failed.')
+            except Exception as e:
+                failures += 1
+                Metrics.PROBE_ATTEMPTS.labels(self.__name, 'error').inc()
+                self.__log.info('Health probe failed.')
+                self.__log.error(e)
+
+            if not successes == self.__success_threshold and not failures == self.__failure_threshold:
+                delay = self.__delay(failures, deadline - time.monotonic())
+
+                self.__log.info(f'Retrying in {delay:.1f}s...')
+                time.sleep(delay)
+
+        if not successes == self.__success_threshold:
+            self.__closed = True
+
+            self.__log.error('Health probe failed for current request. Please, double-check if source is alive.')
+
+            raise HealthProbeFailedException
+
+        self.__time_to_ready = time.monotonic() - started
+        Metrics.PROBE_TIME_TO_READY.labels(self.__name).set(self.__time_to_ready)
+
+        self.__log.info(f'Health probe succeeded after {self.__attempts} attempts in {self.__time_to_ready:.2f}s.')
+
+        return True
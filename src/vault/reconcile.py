@@ -0,0 +1,532 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Final
+
+from hvac import exceptions
+
+from constants import ReconcileConstants
+from exceptions import EntriesFailedException
+from metrics import Metrics
+from util import Logger, Checkpoint
+from .config import ConfigType, HCLParser, HCLConfigBundle, VaultProperties
+from .snapshot import VaultSnapshot
+
+
+class StateDiff(object):
+    KV_V2_ENGINE = 'kv-v2'
+
+    @classmethod
+    def fingerprint(cls, value) -> str:
+        return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+    @classmethod
+    def changed(cls, desired, current) -> bool:
+        return current is None or cls.fingerprint(desired) != cls.fingerprint(current)
+
+    @classmethod
+    def normalize_policy(cls, rules):
+        if isinstance(rules, str):
+            try:
+                return HCLParser.loads(rules)
+            except Exception:
+                return rules
+
+        return rules
+
+    @classmethod
+    def engine_matches(cls, engine: str, mount: dict) -> bool:
+        if engine == cls.KV_V2_ENGINE:
+            return mount.get('type') == 'kv' and (mount.get('options') or {}).get('version') == '2'
+
+        return mount.get('type') == engine
+
+    @classmethod
+    def subset(cls, data: dict, keys) -> dict:
+        return {key: data.get(key) for key in keys} if data is not None else None
+
+
+class ReconcileReport(object):
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__counts = {}
+
+    @classmethod
+    def __empty(cls) -> dict:
+        return {
+            ReconcileConstants.UNCHANGED: 0,
+            ReconcileConstants.UPDATED: 0,
+            ReconcileConstants.REMOVED: 0
+        }
+
+    def reset(self, config_type: ConfigType):
+        with self.__lock:
+            self.__counts[config_type.config_type] = ReconcileReport.__empty()
+
+    def record(self, config_type: ConfigType, action: str):
+        with self.__lock:
+            counts = self.__counts.setdefault(config_type.config_type, ReconcileReport.__empty())
+            counts[action] += 1
+
+    def count(self, config_type: ConfigType, action: str) -> int:
+        with self.__lock:
+            return self.__counts.get(config_type.config_type, {}).get(action, 0)
+
+    def summary(self, config_type: ConfigType) -> str:
+        with self.__lock:
+            counts = self.__counts.get(config_type.config_type, {})
+
+        return ', '.join(f'{action}: {counts.get(action, 0)}' for action in
+                         (ReconcileConstants.UNCHANGED, ReconcileConstants.UPDATED, ReconcileConstants.REMOVED))
+
+    def to_dict(self) -> dict:
+        with self.__lock:
+            return {config_type: dict(counts) for config_type, counts in self.__counts.items()}
+
+    def to_str(self):
+        return json.dumps(self.to_dict())
+
+
+class VaultRequest(object):
+    READ = 'GET'
+    WRITE = 'POST'
+    PUT = 'PUT'
+    DELETE = 'DELETE'
+    STATE = 'STATE'
+    CALL = 'CALL'
+
+    def __init__(self, method: str, path: str = None, data: dict = None, wrap_ttl: str = None, state: str = None,
+                 update=None, call=None):
+        self.__method = method
+        self.__path = path
+        self.__data = data
+        self.__wrap_ttl = wrap_ttl
+        self.__state = state
+        self.__update = update
+        self.__call = call
+
+    @property
+    def method(self) -> str:
+        return self.__method
+
+    @property
+    def path(self) -> str:
+        return self.__path
+
+    @property
+    def data(self) -> dict:
+        return self.__data
+
+    @property
+    def wrap_ttl(self) -> str:
+        return self.__wrap_ttl
+
+    @property
+    def state(self) -> str:
+        return self.__state
+
+    @property
+    def update(self):
+        return self.__update
+
+    def __call__(self):
+        return self.__call()
+
+    @classmethod
+    def read(cls, path: str):
+        return VaultRequest(VaultRequest.READ, path)
+
+    @classmethod
+    def write(cls, path: str, data: dict, wrap_ttl: str = None, state: str = None, update=None):
+        return VaultRequest(VaultRequest.WRITE, path, data, wrap_ttl, state, update)
+
+    @classmethod
+    def put(cls, path: str, data: dict, state: str = None, update=None):
+        return VaultRequest(VaultRequest.PUT, path, data, state=state, update=update)
+
+    @classmethod
+    def delete(cls, path: str, state: str = None, update=None):
+        return VaultRequest(VaultRequest.DELETE, path, state=state, update=update)
+
+    @classmethod
+    def listing(cls, key: str):
+        return VaultRequest(VaultRequest.STATE, state=key)
+
+    @classmethod
+    def blocking(cls, func, *args, state: str = None):
+        return VaultRequest(VaultRequest.CALL, state=state, call=lambda: func(*args))
+
+
+class Reconciler(object):
+    KEY_SEPARATOR: Final = '=' * 86
+    TITLES: Final = {
+        ConfigType.AUTH: 'Auth backends',
+        ConfigType.SECRET: 'Secrets',
+        ConfigType.POLICY: 'Policies',
+        ConfigType.ROLE: 'Auth roles'
+    }
+
+    # Every reconcile is a generator yielding VaultRequests (or tuples of them to run together) and returning the
+    # action taken; VaultClient and AsyncVaultClient only differ in how they send the requests.
+    def __init__(self, config_bundle: HCLConfigBundle, kube_client, cluster=None, checkpoint: Checkpoint = None,
+                 vault_pod_name=None, namespace: str = None, log_level: str = 'INFO'):
+        self.__vault_properties = VaultProperties()
+
+        self.__log = Logger.getLogger(Reconciler.__name__)
+        self.__log.setLevel(log_level)
+
+        self.__config_bundle = config_bundle
+        self.__kube_client = kube_client
+        self.__cluster = cluster
+        self.__checkpoint = checkpoint or Checkpoint()
+        self.__namespace = namespace or os.environ.get('VAULT_K8S_NAMESPACE')
+        self.__vault_pod_name = vault_pod_name or (lambda: f'{self.__namespace}-vault-0')
+
+        self.__report = ReconcileReport()
+
+        # Vault never returns token_reviewer_jwt, so a rotated token is told apart by the one pushed last
+        self.__lock = threading.Lock()
+        self.__reviewer_jwts = {}
+
+        self.__role_plans = {
+            'github': lambda role_name, role: self.__github_role(role_name, role),
+            'kubernetes': lambda role_name, role: self.__kube_role(role_name, role)
+        }
+
+    @property
+    def report(self) -> ReconcileReport:
+        return self.__report
+
+    @property
+    def checkpoint(self) -> Checkpoint:
+        return self.__checkpoint
+
+    @property
+    def config_bundle(self) -> HCLConfigBundle:
+        return self.__config_bundle
+
+    # Bookkeeping
+    def select(self, config_type: ConfigType, names: set = None) -> dict:
+        entries = self.__config_bundle.get_whole_bundle_config(config_type)
+
+        if names is not None:
+            # entries removed from the HCL files are not enabled in the bundle, so they are taken out like disabled
+            removed = self.__config_bundle.get_removed_bundle_config(config_type)
+            entries = {**{name: removed[name] for name in removed if name in names}, **entries}
+
+        if config_type == ConfigType.SECRET and self.__vault_properties.vault_lock_enabled \
+                and self.__vault_properties.vault_lock_mount in entries:
+            # the leader lock lives there, so a secret config must neither remount nor disable it
+            self.__log.warning(f'Secret {self.__vault_properties.vault_lock_mount} is reserved for the leader lock '
+                               f'and is not reconciled.')
+
+            entries = {name: entry for name, entry in entries.items()
+                       if name != self.__vault_properties.vault_lock_mount}
+
+        return entries if names is None else {name: entries[name] for name in entries if name in names}
+
+    def pending(self, config_type: ConfigType, entries: dict) -> list:
+        self.__report.reset(config_type)
+
+        pending = [name for name in entries if not self.__checkpoint.confirmed(config_type.config_type, name)]
+
+        if len(pending) < len(entries):
+            self.__log.info(f'Skipping {len(entries) - len(pending)} {config_type.config_type} entries '
+                            f'confirmed by the checkpoint.')
+
+        return pending
+
+    def confirm(self, config_type: ConfigType, name: str, action: str) -> str:
+        self.__checkpoint.confirm(config_type.config_type, name, action=action)
+
+        return action
+
+    def record(self, config_type: ConfigType, results: dict, errors: dict):
+        for action in results.values():
+            self.__report.record(config_type, action)
+            Metrics.ENTRIES_APPLIED.labels(config_type.config_type, action).inc()
+
+        for name in errors:
+            Metrics.ENTRIES_APPLIED.labels(config_type.config_type, 'failed').inc()
+            self.__log.error(f'Failed to reconcile {config_type.config_type} {name}: {errors[name]}')
+
+        if errors:
+            raise EntriesFailedException(config_type.config_type, errors)
+
+        self.__log.info(f'{Reconciler.TITLES[config_type]} reconciled - {self.__report.summary(config_type)}.')
+
+    # Init
+    def init_vault(self, on_root_token):
+        seal_status = yield VaultRequest.listing(VaultSnapshot.SEAL_STATUS)
+
+        if not seal_status['initialized']:
+            self.__log.info('Vault is not initialized. Initializing...')
+
+            try:
+                init_result = yield VaultRequest.put('sys/init', {
+                    'secret_shares': self.__vault_properties.vault_key_shares,
+                    'secret_threshold': self.__vault_properties.vault_key_threshold}, state=VaultSnapshot.SEAL_STATUS)
+            except exceptions.InvalidRequest:
+                self.__log.info('Vault was initialized by another instance, leaving unseal to it.')
+
+                return True
+
+            unseal_keys = init_result['keys']
+
+            on_root_token(init_result['root_token'])
+
+            seal_status = yield VaultRequest.listing(VaultSnapshot.SEAL_STATUS)
+
+            if seal_status['initialized'] and seal_status['sealed']:
+                log_message = f"Vault was initialized! Performing unseal... Please, share this info only with " \
+                              f"trusted sources!'"
+
+                for key in unseal_keys:
+                    log_message += f"\n{Reconciler.KEY_SEPARATOR}\n Vault unseal key: {key} " \
+                                   f"\n{Reconciler.KEY_SEPARATOR}"
+
+                self.__log.info(log_message)
+
+                if self.__cluster is not None:
+                    unsealed = yield VaultRequest.blocking(self.__cluster.unseal, unseal_keys,
+                                                           state=VaultSnapshot.SEAL_STATUS)
+                else:
+                    for key in unseal_keys:
+                        yield VaultRequest.put('sys/unseal', {'key': key}, state=VaultSnapshot.SEAL_STATUS)
+
+                    unsealed = True
+
+                self.__log.info('Vault was unsealed.' if unsealed else 'Some Vault replicas are still sealed.')
+        else:
+            self.__log.info('Vault was already initialized.')
+
+        seal_status = yield VaultRequest.listing(VaultSnapshot.SEAL_STATUS)
+
+        return seal_status['initialized'] and not seal_status['sealed']
+
+    def internal_kube_auth(self, jwt: str):
+        namespace = self.__namespace
+        sa_name = yield VaultRequest.blocking(
+            lambda: self.__kube_client.get_service_account_name_for_pod(self.__vault_pod_name(), namespace))
+
+        self.__log.info(f'Enabling internal Kubernetes auth on /kubernetes with role: ' +
+                        f'{self.__vault_properties.vault_kube_internal_role_name} for account: {sa_name} ' +
+                        f'with policies: {self.__vault_properties.vault_kube_internal_policies}')
+
+        auth_methods = yield VaultRequest.listing(VaultSnapshot.AUTH_METHODS)
+
+        if 'kubernetes/' not in auth_methods:
+            yield VaultRequest.write('sys/auth/kubernetes', {'type': 'kubernetes'}, state=VaultSnapshot.AUTH_METHODS,
+                                     update=lambda methods: methods.update({'kubernetes/': {'type': 'kubernetes'}}))
+
+        yield VaultRequest.write('auth/kubernetes/config', {
+            'token_reviewer_jwt': jwt,
+            'kubernetes_host': f"https://{os.environ['KUBERNETES_PORT_443_TCP_ADDR']}:443",
+            'kubernetes_ca_cert': '@/var/run/secrets/kubernetes.io/serviceaccount/ca.crt'}), \
+            VaultRequest.write(f'auth/kubernetes/role/{self.__vault_properties.vault_kube_internal_role_name}', {
+                'bound_service_account_names': sa_name,
+                'bound_service_account_namespaces': namespace,
+                'policies': self.__vault_properties.vault_kube_internal_policies},
+                wrap_ttl=self.__vault_properties.vault_kube_internal_ttl)
+
+        self.__log.info('Internal Kubernetes auth at /kubernetes was enabled.')
+
+    # Entries
+    def __github_role(self, role_name: str, role: dict):
+        desired_config = {'organization': role['org']}
+        desired_team = {'value': ','.join(role['policies'])}
+
+        current_config, current_team = yield \
+            VaultRequest.read(f'auth/{role["auth_path"]}/config'), \
+            VaultRequest.read(f'auth/{role["auth_path"]}/map/teams/{role["team_name"]}')
+
+        config_changed = StateDiff.changed(desired_config, StateDiff.subset(
+            current_config['data'] if current_config else None, desired_config.keys()))
+        team_changed = StateDiff.changed(desired_team, StateDiff.subset(
+            current_team['data'] if current_team else None, desired_team.keys()))
+
+        if not config_changed and not team_changed:
+            return ReconcileConstants.UNCHANGED
+
+        self.__log.info(f'Configuring GitHub role {role_name}...')
+
+        if config_changed:
+            yield VaultRequest.write(f'auth/{role["auth_path"]}/config', desired_config)
+
+        if team_changed:
+            yield VaultRequest.write(f'auth/{role["auth_path"]}/map/teams/{role["team_name"]}', desired_team)
+
+        self.__log.info(f'GitHub role {role_name} is set up.')
+
+        return ReconcileConstants.UPDATED
+
+    def __kube_role(self, role_name: str, role: dict):
+        namespace = role['bound_service_account_namespace']
+        sa_name = role['bound_service_account_name']
+
+        secrets = yield VaultRequest.blocking(self.__kube_client.get_service_account_secrets, sa_name, namespace)
+
+        desired_config = {
+            'kubernetes_host': f"https://{os.environ['KUBERNETES_PORT_443_TCP_ADDR']}:443",
+            'kubernetes_ca_cert': secrets['ca'],
+            'disable_local_ca_jwt': True
+        }
+        desired_role = {
+            'bound_service_account_names': [sa_name],
+            'bound_service_account_namespaces': [namespace],
+            'policies': sorted(role['policies'])
+        }
+
+        current_config, current_role = yield \
+            VaultRequest.read(f'auth/{role["auth_path"]}/config'), \
+            VaultRequest.read(f'auth/{role["auth_path"]}/role/{role_name}')
+
+        if current_role:
+            current_role['data']['policies'] = sorted(current_role['data'].get('policies') or [])
+
+        reviewer = (role['auth_path'], namespace, sa_name)
+        jwt_fingerprint = StateDiff.fingerprint(secrets['jwt'])
+
+        with self.__lock:
+            jwt_changed = self.__reviewer_jwts.get(reviewer) != jwt_fingerprint
+
+        config_changed = jwt_changed or StateDiff.changed(desired_config, StateDiff.subset(
+            current_config['data'] if current_config else None, desired_config.keys()))
+        role_changed = StateDiff.changed(desired_role, StateDiff.subset(
+            current_role['data'] if current_role else None, desired_role.keys()))
+
+        if not config_changed and not role_changed:
+            return ReconcileConstants.UNCHANGED
+
+        self.__log.info(f'Configuring Kubernetes role {role_name}...')
+
+        if config_changed:
+            yield VaultRequest.write(f'auth/{role["auth_path"]}/config',
+                                     dict(desired_config, token_reviewer_jwt=secrets['jwt']))
+
+            with self.__lock:
+                self.__reviewer_jwts[reviewer] = jwt_fingerprint
+
+        if role_changed:
+            yield VaultRequest.write(f'auth/{role["auth_path"]}/role/{role_name}', {
+                'bound_service_account_names': sa_name,
+                'bound_service_account_namespaces': namespace,
+                'policies': role['policies']}, wrap_ttl=role['wrap_ttl'])
+
+        self.__log.info(f'Kubernetes role {role_name} is set up.')
+
+        return ReconcileConstants.UPDATED
+
+    def secret(self, secret: str, config: dict, backends: dict):
+        secret_engine = config['engine']
+        mount = backends.get(f'{secret}/')
+
+        if self.__config_bundle.is_bundle_config_enabled(ConfigType.SECRET, secret):
+            if mount is not None:
+                if not StateDiff.engine_matches(secret_engine, mount):
+                    self.__log.warning(f'Path /{secret} is mounted with {mount.get("type")} instead of '
+                                       f'{secret_engine}. Remount it manually to avoid data loss.')
+
+                return ReconcileConstants.UNCHANGED
+
+            self.__log.info(f'Enabling {secret_engine} on path /{secret}.')
+
+            yield VaultRequest.write(f'sys/mounts/{secret}', {'type': secret_engine}, state=VaultSnapshot.MOUNTS)
+
+            return ReconcileConstants.UPDATED
+        elif mount is not None:
+            self.__log.info(f'Disabling {secret_engine} on path /{secret}.')
+
+            yield VaultRequest.delete(f'sys/mounts/{secret}', state=VaultSnapshot.MOUNTS,
+                                      update=lambda mounts: mounts.pop(f'{secret}/', None))
+
+            return ReconcileConstants.REMOVED
+
+        return ReconcileConstants.UNCHANGED
+
+    def policy(self, policy: str, config: dict, policy_names: list):
+        if self.__config_bundle.is_bundle_config_enabled(ConfigType.POLICY, policy):
+            if policy in policy_names:
+                current = (yield VaultRequest.read(f'sys/policy/{policy}')) or {}
+
+                if not StateDiff.changed(StateDiff.normalize_policy(config['config']),
+                                         StateDiff.normalize_policy(current.get('rules'))):
+                    return ReconcileConstants.UNCHANGED
+
+            self.__log.info(f'Enabling policy {policy}.')
+
+            rules = config['config']
+
+            yield VaultRequest.put(f'sys/policy/{policy}', {
+                'policy': rules if isinstance(rules, str) else json.dumps(rules)}, state=VaultSnapshot.POLICIES,
+                update=lambda names: names.append(policy) if policy not in names else None)
+
+            return ReconcileConstants.UPDATED
+        elif policy in policy_names:
+            self.__log.info(f'Disabling policy {policy}.')
+
+            yield VaultRequest.delete(f'sys/policy/{policy}', state=VaultSnapshot.POLICIES,
+                                      update=lambda names: names.remove(policy) if policy in names else None)
+
+            return ReconcileConstants.REMOVED
+
+        return ReconcileConstants.UNCHANGED
+
+    def auth(self, auth_path: str, config: dict, auth_backends: dict):
+        auth_type = config['type']
+        backend = auth_backends.get(f'{auth_path}/')
+
+        if self.__config_bundle.is_bundle_config_enabled(ConfigType.AUTH, auth_path):
+            if backend is not None:
+                if backend.get('type') != auth_type:
+                    self.__log.warning(f'Path /{auth_path} is enabled with {backend.get("type")} instead of '
+                                       f'{auth_type}. Disable it manually to switch the auth method.')
+                elif backend.get('description') != config['description']:
+                    self.__log.info(f'Updating description of {auth_type} on path /{auth_path}.')
+
+                    yield VaultRequest.write(f'sys/auth/{auth_path}/tune', {'description': config['description']},
+                                             state=VaultSnapshot.AUTH_METHODS)
+
+                    return ReconcileConstants.UPDATED
+
+                return ReconcileConstants.UNCHANGED
+
+            self.__log.info(f'Enabling {auth_type} on path /{auth_path}.')
+
+            yield VaultRequest.write(f'sys/auth/{auth_path}', {'type': auth_type, 'description': config['description']},
+                                     state=VaultSnapshot.AUTH_METHODS)
+
+            return ReconcileConstants.UPDATED
+        elif backend is not None:
+            self.__log.info(f'Disabling {auth_type} on path /{auth_path}.')
+
+            yield VaultRequest.delete(f'sys/auth/{auth_path}', state=VaultSnapshot.AUTH_METHODS,
+                                      update=lambda methods: methods.pop(f'{auth_path}/', None))
+
+            return ReconcileConstants.REMOVED
+
+        return ReconcileConstants.UNCHANGED
+
+    def __shared_auth_path(self, role_name: str, auth_path: str) -> bool:
+        return any(other['auth_path'] == auth_path and other['type'] in self.__role_plans
+                   and self.__config_bundle.is_bundle_config_enabled(ConfigType.ROLE, other_name)
+                   for other_name, other in self.__config_bundle.get_whole_bundle_config(ConfigType.ROLE).items()
+                   if other_name != role_name)
+
+    def role(self, role_name: str, role: dict, auth_backends: dict):
+        if f'{role["auth_path"]}/' not in auth_backends:
+            return ReconcileConstants.UNCHANGED
+
+        if role['type'] in self.__role_plans \
+                and self.__config_bundle.is_bundle_config_enabled(ConfigType.ROLE, role_name):
+            return (yield from self.__role_plans[role['type']](role_name, role))
+        elif self.__shared_auth_path(role_name, role['auth_path']):
+            # roles run concurrently, so the config stays while an enabled role on the same path writes it
+            return ReconcileConstants.UNCHANGED
+        elif (yield VaultRequest.read(f'auth/{role["auth_path"]}/config')):
+            yield VaultRequest.delete(f'auth/{role["auth_path"]}/config')
+
+            return ReconcileConstants.REMOVED
+
+        return ReconcileConstants.UNCHANGED
@@ -0,0 +1,138 @@
+import threading
+
+from metrics import Metrics
+from util import Logger
+
+
+class VaultSnapshot(object):
+    SEAL_STATUS = 'seal_status'
+    AUTHENTICATED = 'authenticated'
+    AUTH_METHODS = 'auth_methods'
+    MOUNTS = 'mounts'
+    POLICIES = 'policies'
+
+    # where each listing comes from, shared with AsyncVaultClient which reads it without a snapshot
+    SOURCES = {
+        SEAL_STATUS: ('sys/seal-status', lambda response: response),
+        AUTH_METHODS: ('sys/auth', lambda response: response),
+        MOUNTS: ('sys/mounts', lambda response: response),
+        POLICIES: ('sys/policy', lambda response: response.get('policies', []))
+    }
+
+    def __init__(self, api, log_level: str = 'INFO'):
+        self.__log = Logger.getLogger(VaultSnapshot.__name__)
+        self.__log.setLevel(log_level)
+
+        self.__api = api
+        self.__lock = threading.Lock()
+        self.__loading = {key: threading.Lock() for key in list(VaultSnapshot.SOURCES) + [VaultSnapshot.AUTHENTICATED]}
+
+        self.__state = {}
+        self.__generations = {}
+        self.__token = None
+
+        self.__hits = 0
+        self.__misses = 0
+
+        self.__loaders = {key: lambda path=path, extract=extract: extract(self.__api.read(path))
+                          for key, (path, extract) in VaultSnapshot.SOURCES.items()}
+        self.__loaders[VaultSnapshot.AUTHENTICATED] = lambda: self.__api.is_authenticated()
+
+    def __cached(self, key: str) -> tuple:
+        with self.__lock:
+            if key in self.__state:
+                self.__hits += 1
+                Metrics.SNAPSHOT_LOOKUPS.labels(key, 'hit').inc()
+
+                return True, self.__state[key], None
+
+            return False, None, self.__generations.get(key, 0)
+
+    def __get(self, key: str):
+        found, state, _ = self.__cached(key)
+
+        if found:
+            return state
+
+        # one load per key at a time, and none of them holds up the other keys
+        with self.__loading[key]:
+            found, state, generation = self.__cached(key)
+
+            if found:
+                return state
+
+            state = self.__loaders[key]()
+
+            with self.__lock:
+                self.__misses += 1
+                Metrics.SNAPSHOT_LOOKUPS.labels(key, 'miss').inc()
+
+                # a write or an invalidation that raced the load leaves the key to be read again
+                if self.__generations.get(key, 0) == generation:
+                    self.__state[key] = state
+
+            return state
+
+    def __forget(self, key: str):
+        self.__state.pop(key, None)
+        self.__generations[key] = self.__generations.get(key, 0) + 1
+
+    @property
+    def hits(self) -> int:
+        return self.__hits
+
+    @property
+    def misses(self) -> int:
+        return self.__misses
+
+    def refresh(self):
+        with self.__lock:
+            for key in self.__loading:
+                self.__forget(key)
+
+            hits, misses = self.__hits, self.__misses
+
+        self.__log.debug(f'Vault state snapshot was reset - hits: {hits}, misses: {misses}.')
+
+    def invalidate(self, *keys: str):
+        with self.__lock:
+            for key in keys:
+                self.__forget(key)
+
+    def update(self, key: str, mutator):
+        with self.__lock:
+            if key in self.__state:
+                mutator(self.__state[key])
+            else:
+                self.__generations[key] = self.__generations.get(key, 0) + 1
+
+    def read(self, key: str):
+        state = self.__get(key)
+
+        return type(state)(state) if isinstance(state, (dict, list)) else state
+
+    def is_initialized(self) -> bool:
+        return self.__get(VaultSnapshot.SEAL_STATUS)['initialized']
+
+    def is_sealed(self) -> bool:
+        return self.__get(VaultSnapshot.SEAL_STATUS)['sealed']
+
+    def is_running(self) -> bool:
+        return self.is_initialized() and not self.is_sealed()
+
+    def is_authenticated(self) -> bool:
+        with self.__lock:
+            if self.__token != self.__api.token:
+                self.__token = self.__api.token
+                self.__forget(VaultSnapshot.AUTHENTICATED)
+
+        return self.__get(VaultSnapshot.AUTHENTICATED)
+
+    def auth_methods(self) -> dict:
+        return dict(self.__get(VaultSnapshot.AUTH_METHODS))
+
+    def mounts(self) -> dict:
+        return dict(self.__get(VaultSnapshot.MOUNTS))
+
+    def policies(self) -> list:
+        return list(self.__get(VaultSnapshot.POLICIES))
@@ -0,0 +1,188 @@
+import threading
+
+from constants import InitConstants
+from kube.client import KubernetesClient
+from util import Logger, Steps, TaskPool
+from .aio import AsyncVaultClient
+from .config import HCLConfigBundle, ConfigType, VaultProperties
+from .vault import VaultClient
+
+
+class VaultTarget(object):
+    def __init__(self, name: str, address: str, steps: Steps, notify, namespace: str = None,
+                 log_level: str = 'INFO'):
+        self.__log = Logger.getLogger(f'{VaultTarget.__name__}[{name}]')
+        self.__log.setLevel(log_level)
+
+        self.__name = name
+        self.__address = address
+        self.__namespace = namespace
+        self.__steps = steps.with_scope(name)
+        self.__notify = notify
+
+        self.__lock = threading.Lock()
+        self.__client = None
+        self.__pipeline = None
+        self.__error = None
+        self.__succeeded = None
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def address(self) -> str:
+        return self.__address
+
+    @property
+    def steps(self) -> Steps:
+        return self.__steps
+
+    @property
+    def client(self) -> VaultClient:
+        return self.__client
+
+    @property
+    def pipeline(self):
+        return self.__pipeline
+
+    def key(self, step: str) -> str:
+        return self.__steps.key(step)
+
+    def notify(self, update: dict, key: str = None):
+        self.__notify({self.key(step): state for step, state in update.items()}, key and self.key(key))
+
+    def connect(self, config_bundle: HCLConfigBundle, kube_client: KubernetesClient, use_async: bool) -> bool:
+        with self.__lock:
+            if self.__client is not None:
+                return True
+
+            try:
+                self.__client = VaultClient(self.__address, config_bundle, kube_client, self.__namespace)
+                self.__pipeline = AsyncVaultClient(self.__client.reconciler, self.__client.token_manager,
+                                                   self.__address, self.__client.adopt_root_token,
+                                                   self.__client.limiter).blocking() \
+                    if use_async else self.__client
+                self.__steps.with_checkpoint(self.__client.checkpoint)
+                self.__error = None
+            except Exception as e:
+                self.__error = str(e) or type(e).__name__
+                self.__log.error(f'Unable to connect to Vault at {self.__address}: {self.__error}')
+
+                self.notify(self.__steps.trace(InitConstants.INIT_STEP, InitConstants.FAILED_STATE,
+                                               f'Vault at {self.__address} is not reachable: {self.__error}')
+                            .delta(InitConstants.INIT_STEP), InitConstants.INIT_STEP)
+
+                return False
+
+        return True
+
+    def done(self, succeeded: bool, error: Exception = None):
+        self.__succeeded = succeeded
+
+        if error is not None:
+            self.__error = str(error) or type(error).__name__
+
+    def status(self) -> dict:
+        return {
+            'address': self.__address,
+            'namespace': self.__namespace,
+            'connected': self.__client is not None,
+            'succeeded': self.__succeeded,
+            'error': self.__error,
+            'steps': self.__steps.to_dict()
+        }
+
+    def close(self):
+        if self.__pipeline is not None and self.__pipeline is not self.__client:
+            self.__pipeline.close_client()
+
+        if self.__client is not None:
+            self.__client.close_client()
+
+
+class VaultTargets(object):
+    def __init__(self, targets: dict, steps_factory, notify):
+        self.__vault_properties = VaultProperties()
+
+        self.__log = Logger.getLogger(VaultTargets.__name__)
+        self.__log.setLevel(self.__vault_properties.vault_client_log_level)
+
+        self.__config_bundle = HCLConfigBundle(self.__vault_properties.vault_client_log_level,
+                                               self.__vault_properties.vault_hcl_cache_path,
+                                               self.__vault_properties.vault_hcl_parse_workers)
+        self.__kube_client = KubernetesClient(self.__vault_properties.vault_client_log_level,
+                                              self.__vault_properties.vault_kube_config_path,
+                                              self.__vault_properties.vault_kube_pod_account_ttl)
+
+        namespaces = self.__vault_properties.vault_targets_namespaces
+
+        self.__targets = {name: VaultTarget(name, address, steps_factory(), notify, namespaces.get(name),
+                                            self.__vault_properties.vault_client_log_level)
+                          for name, address in targets.items()}
+        self.__pool = TaskPool(min(len(self.__targets), self.__vault_properties.vault_targets_concurrency),
+                               VaultTargets.__name__, self.__vault_properties.vault_client_log_level)
+
+        self.__log.info(f'Reconciling {len(self.__targets)} Vault targets: '
+                        f'{", ".join(f"{name} ({target.address})" for name, target in self.__targets.items())}.')
+
+    @property
+    def config_bundle(self) -> HCLConfigBundle:
+        return self.__config_bundle
+
+    @property
+    def kube_client(self) -> KubernetesClient:
+        return self.__kube_client
+
+    @property
+    def config_paths(self) -> list:
+        return [HCLConfigBundle.directory(config) for config in ConfigType]
+
+    @property
+    def targets(self) -> list:
+        return list(self.__targets.values())
+
+    def notify_all(self):
+        for target in self.__targets.values():
+            target.notify(target.steps.to_dict())
+
+    def run(self, task) -> bool:
+        def run_target(target: VaultTarget) -> bool:
+            if not target.connect(self.__config_bundle, self.__kube_client,
+                                  self.__vault_properties.vault_async_enabled):
+                return False
+
+            return bool(task(target))
+
+        results, errors = self.__pool.run(run_target, self.__targets.values())
+
+        for target in self.__targets.values():
+            target.done(results.get(target, False), errors.get(target))
+
+            if target in errors:
+                self.__log.error(f'Vault target "{target.name}" failed: {errors[target]}')
+
+        self.__log.info(f'{sum(1 for result in results.values() if result)} of {len(self.__targets)} '
+                        f'Vault targets were reconciled.')
+
+        return not errors and all(results.values())
+
+    def reload_configs(self, filenames: set) -> dict:
+        changes = self.__config_bundle.reload(filenames)
+
+        if changes:
+            for target in self.__targets.values():
+                if target.client is not None:
+                    target.client.snapshot.refresh()
+
+        return changes
+
+    def status(self) -> dict:
+        return {name: target.status() for name, target in self.__targets.items()}
+
+    def close(self):
+        for target in self.__targets.values():
+            target.close()
+
+        self.__kube_client.close()
+        self.__pool.close()
@@ -0,0 +1,135 @@
+import copy
+import os
+import threading
+import time
+
+from util import Logger
+
+
+class TokenManager(object):
+    MIN_RENEW_SECONDS = 5
+
+    def __init__(self, api, role: str, jwt_path: str, renew_ratio: float = 0.66, log_level: str = 'INFO'):
+        self.__log = Logger.getLogger(TokenManager.__name__)
+        self.__log.setLevel(log_level)
+
+        self.__api = api
+        self.__role = role
+        self.__jwt_path = jwt_path
+        self.__renew_ratio = renew_ratio
+
+        self.__lock = threading.RLock()
+        self.__stopped = threading.Event()
+        self.__renewer = None
+
+        self.__jwt = None
+        self.__jwt_mtime = None
+
+        self.__token = None
+        self.__renewable = False
+        self.__expires_at = None
+        self.__renew_at = None
+
+    @property
+    def active(self) -> bool:
+        return self.__token is not None
+
+    @property
+    def jwt(self) -> str:
+        with self.__lock:
+            mtime = os.stat(self.__jwt_path).st_mtime
+
+            if self.__jwt is None or mtime != self.__jwt_mtime:
+                self.__log.debug(f'Reloading service account JWT from {self.__jwt_path}.')
+
+                with open(self.__jwt_path) as f:
+                    self.__jwt = f.read()
+
+                self.__jwt_mtime = mtime
+
+            return self.__jwt
+
+    def __accept(self, auth: dict):
+        ttl = auth['lease_duration']
+
+        self.__token = auth['client_token']
+        self.__renewable = auth['renewable']
+        self.__expires_at = time.monotonic() + ttl if ttl else None
+        self.__renew_at = time.monotonic() + max(TokenManager.MIN_RENEW_SECONDS, ttl * self.__renew_ratio) \
+            if ttl else None
+
+    def __adapter(self):
+        # the client may be using the root token right now, so the renewal carries the manager's own token
+        adapter = copy.copy(self.__api.adapter)
+        adapter.token = self.__token
+
+        return adapter
+
+    def __valid(self) -> bool:
+        return self.__token is not None and (self.__expires_at is None or time.monotonic() < self.__expires_at)
+
+    def login(self) -> str:
+        with self.__lock:
+            self.__log.info(f'Logging in to Vault with Kubernetes role {self.__role}...')
+
+            self.__accept(self.__api.auth.kubernetes.login(self.__role, self.jwt, use_token=False)['auth'])
+            self.__start()
+
+            return self.__token
+
+    def renew(self) -> str:
+        with self.__lock:
+            if not self.__renewable:
+                return self.login()
+
+            try:
+                auth = self.__adapter().post('/v1/auth/token/renew-self')['auth']
+            except Exception as e:
+                self.__log.warning(f'Vault token renewal failed, logging in again: {e}')
+
+                return self.login()
+
+            if auth['lease_duration'] < TokenManager.MIN_RENEW_SECONDS * 2:
+                self.__log.info('Vault token reached its max TTL, logging in again.')
+
+                return self.login()
+
+            self.__accept(auth)
+
+            self.__log.debug('Vault token was renewed.')
+
+            return self.__token
+
+    def token(self) -> str:
+        with self.__lock:
+            return self.__token if self.__valid() else self.login()
+
+    def __start(self):
+        if self.__renewer is None and self.__renew_at is not None:
+            self.__renewer = threading.Thread(target=self.__run, name=TokenManager.__name__, daemon=True)
+            self.__renewer.start()
+
+    def __run(self):
+        while not self.__stopped.wait(max(0.0, self.__renew_at - time.monotonic())):
+            try:
+                self.renew()
+            except Exception as e:
+                self.__log.error(f'Unable to refresh Vault token: {e}')
+
+                self.__stopped.wait(TokenManager.MIN_RENEW_SECONDS)
+
+            if self.__renew_at is None:
+                break
+
+        self.__renewer = None
+
+    def close(self):
+        self.__stopped.set()
+
+        renewer = self.__renewer
+
+        if renewer is not None and renewer is not threading.current_thread():
+            renewer.join()
+
+        with self.__lock:
+            self.__token = None
@@ -1,18 +1,26 @@
 import functools
 import os
+import re
 import threading
-import time
 from typing import Final
+from urllib.parse import urlsplit, urlunsplit
 
 import hvac
-import requests
 
-from constants import HealthProbeConstants
 from exceptions import HealthProbeFailedException, VaultNotReadyException, ValidationException, \
     VaultClientNotAuthenticatedException
 from kube.client import KubernetesClient
-from util import Logger
+from util import Logger, TaskPool, PooledSession, Checkpoint
+from .adapter import InstrumentedAdapter
+from .cluster import VaultCluster
+from .limiter import AdaptiveLimiter, CircuitBreaker, RetryPolicy
+from .lock import LeaderLock
 from .config import HCLConfigBundle, ConfigType, VaultProperties
+from .export import HCLExporter
+from .probe import HealthProbe
+from .reconcile import ReconcileReport, Reconciler, VaultRequest
+from .snapshot import VaultSnapshot
+from .token import TokenManager
 
 
 def synchronized(wrapped):
@@ -26,160 +34,261 @@ def synchronized(wrapped):
     return _wrap
 
 
-class HealthProbe(object):
-    def __init__(self, log_level: str = 'INFO', failure_threshold: int = HealthProbeConstants.FAILURE_THRESHOLD,
-                 initial_delay_seconds: int = HealthProbeConstants.INITIAL_DELAY,
-                 period_seconds: int = HealthProbeConstants.PERIOD,
-                 success_threshold: int = HealthProbeConstants.SUCCESS_THRESHOLD,
-                 timeout_seconds: int = HealthProbeConstants.TIMEOUT):
+class VaultClient(object):
+    MAX_SHARES: Final = 10
+    READY_PROBE: Final = HealthProbe.READY
+    RUNNING_PROBE: Final = HealthProbe.RUNNING
 
-        self.__log = Logger.getLogger(HealthProbe.__name__)
-        self.__log.setLevel(log_level)
+    def __init__(self, address: str = None, config_bundle: HCLConfigBundle = None,
+                 kube_client: KubernetesClient = None, namespace: str = None):
+        self.__vault_properties = VaultProperties()
 
-        self.__failure_threshold = failure_threshold
-        self.__initial_delay_seconds = initial_delay_seconds
-        self.__period_seconds = period_seconds
-        self.__success_threshold = success_threshold
-        self.__timeout_seconds = timeout_seconds
-        self.__closed = False
+        self.__log = Logger.getLogger(VaultClient.__name__)
+        self.__log.setLevel(self.__vault_properties.vault_client_log_level)
 
-    def is_closed(self) -> bool:
-        return self.__closed
+        if self.__vault_properties.vault_key_shares > VaultClient.MAX_SHARES \
+                or self.__vault_properties.vault_key_threshold > VaultClient.MAX_SHARES:
+            raise ValidationException(f'Vault keys cannot be split for more than {VaultClient.MAX_SHARES} parts')
 
-    def run(self, request) -> bool:
-        if self.__closed:
-            return False
+        self.__config_bundle = config_bundle or HCLConfigBundle(self.__vault_properties.vault_client_log_level,
+                                                                self.__vault_properties.vault_hcl_cache_path,
+                                                                self.__vault_properties.vault_hcl_parse_workers)
 
-        failures = 0
-        successes = 0
+        self.__address = address or self.__vault_properties.vault_address
+        self.__ping_address = self.__vault_properties.vault_ping_address if address is None \
+            else urlunsplit(urlsplit(address)[:2] + urlsplit(self.__vault_properties.vault_ping_address)[2:])
+        self.__discovery = self.__vault_properties.vault_replicas_discovery if address is None else 'none'
+        self.__namespace = namespace or os.environ.get('VAULT_K8S_NAMESPACE')
 
-        self.__log.info('Health probe started...')
+        self.__probe = lambda name, failure_threshold, deadline_seconds: HealthProbe.of(
+            self.__vault_properties, name, failure_threshold, deadline_seconds)
+        self.__probes = {}
 
-        time.sleep(self.__initial_delay_seconds)
+        self.__session = PooledSession(pool_size=self.__vault_properties.vault_http_pool_size,
+                                       keep_alive=self.__vault_properties.vault_http_keep_alive,
+                                       timeout_seconds=self.__vault_properties.vault_http_timeout_seconds)
 
-        while not failures == self.__failure_threshold and not successes == self.__success_threshold:
-            self.__log.info('Trying to perform health probe...')
+        if not self.vault_ready():
+            raise VaultNotReadyException
 
-            try:
-                response = request()
+        self.__limiter = AdaptiveLimiter(
+            self.__address,
+            initial_limit=self.__vault_properties.vault_limiter_initial_limit,
+            min_limit=self.__vault_properties.vault_limiter_min_limit,
+            max_limit=self.__vault_properties.vault_limiter_max_limit,
+            backoff_ratio=self.__vault_properties.vault_limiter_backoff_ratio,
+            latency_tolerance=self.__vault_properties.vault_limiter_latency_tolerance,
+            breaker=CircuitBreaker(self.__vault_properties.vault_breaker_failure_threshold,
+                                   self.__vault_properties.vault_breaker_open_seconds,
+                                   self.__vault_properties.vault_breaker_max_open_seconds),
+            max_wait_seconds=self.__vault_properties.vault_breaker_max_wait_seconds,
+            log_level=self.__vault_properties.vault_client_log_level) \
+            if self.__vault_properties.vault_limiter_enabled else None
+
+        self.__api = hvac.Client(url=self.__address, adapter=InstrumentedAdapter, session=self.__session,
+                                 timeout=self.__session.timeout_seconds, limiter=self.__limiter,
+                                 retry=RetryPolicy(self.__vault_properties.vault_retry_attempts,
+                                                   self.__vault_properties.vault_retry_base_seconds,
+                                                   self.__vault_properties.vault_retry_max_seconds))
+        # a shared client belongs to whoever passed it in, only a client created here is closed here
+        self.__owns_kube_client = kube_client is None
+        self.__kube_client = kube_client or KubernetesClient(self.__vault_properties.vault_client_log_level,
+                                                             self.__vault_properties.vault_kube_config_path,
+                                                             self.__vault_properties.vault_kube_pod_account_ttl)
+        self.__snapshot = VaultSnapshot(self.__api, self.__vault_properties.vault_client_log_level)
+        self.__token_manager = TokenManager(self.__api, self.__vault_properties.vault_kube_internal_role_name,
+                                            self.__vault_properties.vault_kube_jwt_path,
+                                            self.__vault_properties.vault_token_renew_ratio,
+                                            self.__vault_properties.vault_client_log_level)
+
+        self.__cluster = VaultCluster(self.__discover_replicas, self.__session,
+                                      self.__vault_properties.vault_replicas_unseal_attempts,
+                                      self.__vault_properties.vault_replicas_retry_seconds,
+                                      self.__vault_properties.vault_replicas_refresh_seconds,
+                                      self.__vault_properties.vault_client_log_level)
+
+        self.__checkpoint = Checkpoint(self.__checkpoint_path(), self.__config_bundle.digest,
+                                       self.__vault_properties.vault_client_log_level)
+
+        self.__lock = LeaderLock(self.__api, self.__snapshot, self.auth, self.__vault_properties.vault_lock_mount,
+                                 self.__vault_properties.vault_lock_path,
+                                 lease_seconds=self.__vault_properties.vault_lock_lease_seconds,
+                                 poll_seconds=self.__vault_properties.vault_lock_poll_seconds,
+                                 wait_seconds=self.__vault_properties.vault_lock_wait_seconds,
+                                 result_ttl_seconds=self.__vault_properties.vault_lock_result_ttl_seconds,
+                                 enabled=self.__vault_properties.vault_lock_enabled,
+                                 log_level=self.__vault_properties.vault_client_log_level)
+
+        self.__reconciler = Reconciler(self.__config_bundle, self.__kube_client, self.__cluster, self.__checkpoint,
+                                       self.__vault_pod_name, self.__namespace,
+                                       self.__vault_properties.vault_client_log_level)
 
-                if response.status_code == 200:
-                    successes += 1
-                    self.__log.info('Health probe succeeded!')
-                else:
-                    failures += 1
-                    self.__log.info('Health probe failed.')
-            except Exception as e:
-                failures += 1
-                self.__log.info('Health probe failed.')
-                self.__log.error(e)
+        self.__root_token = None
 
-            if not successes == self.__success_threshold:
-                self.__log.info('Retrying...')
-                time.sleep(self.__period_seconds)
+        self.__pool = TaskPool(self.__vault_properties.vault_apply_concurrency, VaultClient.__name__,
+                               self.__vault_properties.vault_client_log_level)
 
-        if failures == self.__failure_threshold:
-            self.__closed = True
+    # Private helpers
+    def __checkpoint_path(self) -> str:
+        if self.__vault_properties.vault_checkpoint_path is None:
+            return None
 
-            self.__log.error('Health probe failed for current request. Please, double-check if source is alive.')
+        return os.path.join(self.__vault_properties.vault_checkpoint_path,
+                            f'{re.sub(r"[^A-Za-z0-9.-]+", "_", self.__address)}.jsonl')
 
-            raise HealthProbeFailedException
+    def __running(self, timeout: tuple) -> bool:
+        if not self.auth():
+            raise VaultClientNotAuthenticatedException()
 
-        return successes == self.__success_threshold and not failures == self.__failure_threshold
+        response = self.__session.get(f'{self.__address.rstrip("/")}/v1/sys/seal-status', timeout=timeout)
+        response.raise_for_status()
 
+        seal_status = response.json()
 
-class VaultClient(object):
-    MAX_SHARES: Final = 10
-    KEY_SEPARATOR: Final = '=' * 86
+        return seal_status['initialized'] and not seal_status['sealed']
 
-    def __init__(self):
-        self.__vault_properties = VaultProperties()
+    def __vault_pods(self) -> list:
+        pods = self.__kube_client.get_pods(self.__namespace, self.__vault_properties.vault_replicas_label_selector)
 
-        self.__log = Logger.getLogger(VaultClient.__name__)
-        self.__log.setLevel(self.__vault_properties.vault_client_log_level)
+        return sorted((pod for pod in pods if pod.status.pod_ip), key=lambda pod: pod.metadata.name)
 
-        if self.__vault_properties.vault_key_shares > VaultClient.MAX_SHARES \
-                or self.__vault_properties.vault_key_threshold > VaultClient.MAX_SHARES:
-            raise ValidationException(f'Vault keys cannot be split for more than {VaultClient.MAX_SHARES} parts')
+    def __discover_replicas(self) -> list:
+        addresses = []
 
-        self.__config_bundle = HCLConfigBundle(self.__vault_properties.vault_client_log_level)
+        if self.__discovery == 'static':
+            addresses = self.__vault_properties.vault_replicas_addresses
+        elif self.__discovery == 'kubernetes':
+            addresses = [self.__vault_properties.vault_replicas_address_template.format(
+                pod=pod.metadata.name, ip=pod.status.pod_ip, namespace=pod.metadata.namespace)
+                for pod in self.__vault_pods()]
 
-        self.__probe = lambda initial_delay_seconds=5: HealthProbe(
-            log_level=self.__vault_properties.vault_client_log_level,
-            initial_delay_seconds=initial_delay_seconds)
+        return addresses or [self.__address]
 
-        if not self.vault_ready():
-            raise VaultNotReadyException
+    def __vault_pod_name(self) -> str:
+        if self.__discovery == 'kubernetes':
+            pods = self.__vault_pods()
 
-        self.__api = hvac.Client(url=self.__vault_properties.vault_address)
-        self.__kube_client = KubernetesClient(self.__vault_properties.vault_client_log_level)
+            if pods:
+                return pods[0].metadata.name
 
-        self.__root_token = None
+        return f'{self.__namespace}-vault-0'
 
-        self.__role_actions = {
-            'github': lambda role_name, role: self.__config_github(role_name, role),
-            'kubernetes': lambda role_name, role: self.__config_kube(role_name, role)
-        }
+    def __perform(self, request):
+        if isinstance(request, tuple):
+            return tuple(self.__perform(item) for item in request)
 
-    # Private helpers
-    def __enable_incluster_kube_auth(self):
-        sa_name = self.__kube_client.get_service_account_name_for_pod(f'{os.environ["VAULT_K8S_NAMESPACE"]}-vault-0',
-                                                                      os.environ['VAULT_K8S_NAMESPACE'])
+        if request.method == VaultRequest.STATE:
+            return self.__snapshot.read(request.state)
+
+        try:
+            if request.method == VaultRequest.CALL:
+                response = request()
+            elif request.method == VaultRequest.READ:
+                response = self.__api.read(request.path)
+            else:
+                response = self.__api.adapter.request(request.method, f'/v1/{request.path}', json=request.data,
+                                                      wrap_ttl=request.wrap_ttl)
+        except Exception:
+            if request.state is not None:
+                self.__snapshot.invalidate(request.state)
+
+            raise
+
+        if request.state is not None and request.update is not None:
+            self.__snapshot.update(request.state, request.update)
+        elif request.state is not None:
+            self.__snapshot.invalidate(request.state)
 
-        self.__log.info(f'Enabling internal Kubernetes auth on /kubernetes with role: ' +
-                        f'{self.__vault_properties.vault_kube_internal_role_name} for account: {sa_name} ' +
-                        f'with policies: {self.__vault_properties.vault_kube_internal_policies}')
+        return response
 
-        self.__api.sys.enable_auth_method(method_type='kubernetes', path='kubernetes')
+    def __drive(self, plan):
+        response = error = None
 
-        f = open('/var/run/secrets/kubernetes.io/serviceaccount/token')
-        jwt = f.read()
+        while True:
+            try:
+                request = plan.throw(error) if error is not None else plan.send(response)
+            except StopIteration as e:
+                return e.value
 
-        self.__api.write(f'auth/kubernetes/config', None, token_reviewer_jwt=jwt,
-                         kubernetes_host=f"https://{os.environ['KUBERNETES_PORT_443_TCP_ADDR']}:443",
-                         kubernetes_ca_cert='@/var/run/secrets/kubernetes.io/serviceaccount/ca.crt')
+            try:
+                response, error = self.__perform(request), None
+            except Exception as e:
+                response, error = None, e
 
-        self.__api.write(f'auth/kubernetes/role/{self.__vault_properties.vault_kube_internal_role_name}',
-                         wrap_ttl=self.__vault_properties.vault_kube_internal_ttl,
-                         bound_service_account_names=sa_name,
-                         bound_service_account_namespaces=os.environ['VAULT_K8S_NAMESPACE'],
-                         policies=self.__vault_properties.vault_kube_internal_policies)
+    def __apply_all(self, config_type: ConfigType, entries: dict, plan):
+        pending = self.__reconciler.pending(config_type, entries)
 
-        self.__log.info('Internal Kubernetes auth at /kubernetes was enabled.')
+        results, errors = self.__pool.run(
+            lambda name: self.__reconciler.confirm(config_type, name, self.__drive(plan(name))), pending)
 
-    def __config_github(self, role_name: str, role: dict):
-        self.__log.info(f'Configuring GitHub role {role_name}...')
+        self.__reconciler.record(config_type, results, errors)
 
-        self.__api.write(f'auth/{role["auth_path"]}/config', None, organization=role['org'])
+    # Misc
+    @property
+    def report(self) -> ReconcileReport:
+        return self.__reconciler.report
 
-        policies = ','.join(role['policies'])
+    @property
+    def reconciler(self) -> Reconciler:
+        return self.__reconciler
 
-        self.__api.write(f'auth/{role["auth_path"]}/map/teams/{role["team_name"]}', None,
-                         value=policies)
+    @property
+    def token_manager(self) -> TokenManager:
+        return self.__token_manager
 
-        self.__log.info(f'GitHub role {role_name} is set up.')
+    @property
+    def address(self) -> str:
+        return self.__address
 
-    def __config_kube(self, role_name: str, role: dict):
-        self.__log.info(f'Configuring Kubernetes role {role_name}...')
+    @property
+    def checkpoint(self) -> Checkpoint:
+        return self.__checkpoint
 
-        namespace = role['bound_service_account_namespace']
-        sa_name = role['bound_service_account_name']
+    @property
+    def lock(self) -> LeaderLock:
+        return self.__lock
 
-        secrets = self.__kube_client.get_service_account_secrets(sa_name, namespace)
+    @property
+    def limiter(self) -> AdaptiveLimiter:
+        return self.__limiter
 
-        self.__api.write(f'auth/{role["auth_path"]}/config', None, token_reviewer_jwt=secrets['jwt'],
-                         kubernetes_host=f"https://{os.environ['KUBERNETES_PORT_443_TCP_ADDR']}:443",
-                         kubernetes_ca_cert=secrets['ca'],
-                         disable_local_ca_jwt=True)
+    @property
+    def config_bundle(self) -> HCLConfigBundle:
+        return self.__config_bundle
 
-        self.__api.write(f'auth/{role["auth_path"]}/role/{role_name}', wrap_ttl=role['wrap_ttl'],
-                         bound_service_account_names=sa_name,
-                         bound_service_account_namespaces=namespace,
-                         policies=role['policies'])
+    @property
+    def kube_client(self) -> KubernetesClient:
+        return self.__kube_client
 
-        self.__log.info(f'Kubernetes role {role_name} is set up.')
+    @property
+    def cluster(self) -> VaultCluster:
+        return self.__cluster
+
+    @property
+    def session(self) -> PooledSession:
+        return self.__session
+
+    @property
+    def snapshot(self) -> VaultSnapshot:
+        return self.__snapshot
+
+    @property
+    def config_paths(self) -> list:
+        return [HCLConfigBundle.directory(config) for config in ConfigType]
+
+    @synchronized
+    def reload_configs(self, filenames: set) -> dict:
+        changes = self.__config_bundle.reload(filenames)
+
+        if changes:
+            self.__snapshot.refresh()
+
+        return changes
+
+    @synchronized
+    def adopt_root_token(self, token: str):
+        self.__root_token = token
 
-    # Misc
     @synchronized
     def void_root_token(self) -> bool:
         self.__root_token = None
@@ -189,188 +298,159 @@ class VaultClient(object):
     @synchronized
     def close_client(self):
         self.void_root_token()
+        self.__lock.close()
+        self.__token_manager.close()
+        self.__checkpoint.close()
+
+        if self.__owns_kube_client:
+            self.__kube_client.close()
+        self.__pool.close()
         self.__api.adapter.close()
 
     @synchronized
     def vault_ready(self):
-        health_probe = self.__probe(self.__vault_properties.vault_ping_initial_delay_seconds)
+        health_probe = self.__probe(VaultClient.READY_PROBE,
+                                    self.__vault_properties.vault_ping_failure_threshold,
+                                    self.__vault_properties.vault_ping_deadline_seconds)
+        self.__probes[VaultClient.READY_PROBE] = health_probe
 
         if not health_probe.run(
-                lambda: requests.get(self.__vault_properties.vault_ping_address)) \
+                lambda timeout: self.__session.get(self.__ping_address, timeout=timeout)) \
                 or health_probe.is_closed():
             raise HealthProbeFailedException
 
         return True
 
+    def wait_until_running(self) -> bool:
+        health_probe = self.__probe(VaultClient.RUNNING_PROBE,
+                                    self.__vault_properties.vault_up_failure_threshold,
+                                    self.__vault_properties.vault_up_deadline_seconds)
+        self.__probes[VaultClient.RUNNING_PROBE] = health_probe
+
+        try:
+            return health_probe.run(self.__running, check=bool)
+        except HealthProbeFailedException:
+            return False
+        finally:
+            self.__snapshot.invalidate(VaultSnapshot.SEAL_STATUS)
+
+    @property
+    def probes(self) -> dict:
+        return dict(self.__probes)
+
     @synchronized
     def is_sealed(self):
         if not self.auth():
             raise VaultClientNotAuthenticatedException()
 
-        client = self.__api
-
-        return client.sys.is_sealed()
+        return self.__snapshot.is_sealed()
 
     @synchronized
     def is_running(self):
         if not self.auth():
             raise VaultClientNotAuthenticatedException()
 
-        client = self.__api
+        running = self.__snapshot.is_running()
 
-        return client.sys.is_initialized() and not client.sys.is_sealed()
+        if not running:
+            self.__snapshot.invalidate(VaultSnapshot.SEAL_STATUS)
+
+        return running
 
     # Core
     @synchronized
     def auth(self):
         if self.__root_token:
             self.__api.token = self.__root_token
-        elif "kubernetes/" in self.__api.sys.list_auth_methods():
-            f = open('/var/run/secrets/kubernetes.io/serviceaccount/token')
-            jwt = f.read()
-
-            self.__api.auth_kubernetes(role=self.__vault_properties.vault_kube_internal_role_name, jwt=jwt)
+        elif self.__api.token is None or "kubernetes/" in self.__snapshot.auth_methods():
+            self.__api.token = self.__token_manager.token()
 
-        return self.__api.is_authenticated()
+        return self.__snapshot.is_authenticated()
 
     @synchronized
-    def enable_secrets(self):
+    def enable_secrets(self, names: set = None):
         if not self.auth():
             return False
 
-        client = self.__api
-
-        if client.sys.is_initialized() and not client.sys.is_sealed() and client.is_authenticated():
-            backends = client.sys.list_mounted_secrets_engines()
-
-            secrets = self.__config_bundle.get_whole_bundle_config(ConfigType.SECRET)
-
-            for secret in secrets:
-                secret_engine = secrets[secret]['engine']
+        if self.__snapshot.is_running() and self.__snapshot.is_authenticated():
+            backends = self.__snapshot.mounts()
 
-                if self.__config_bundle.is_bundle_config_enabled(ConfigType.SECRET, secret):
-                    self.__log.info(f'Enabling {secret_engine} on path /{secret}.')
+            secrets = self.__reconciler.select(ConfigType.SECRET, names)
 
-                    client.sys.enable_secrets_engine(secret_engine, path=secret)
-                elif f'{secret}/' in backends:
-                    self.__log.info(f'Disabling {secret_engine} on path /{secret}.')
-
-                    client.sys.disable_secrets_engine(secret)
+            self.__apply_all(ConfigType.SECRET, secrets,
+                             lambda secret: self.__reconciler.secret(secret, secrets[secret], backends))
 
             return True
         else:
             return False
 
     @synchronized
-    def apply_policies(self):
+    def apply_policies(self, names: set = None):
         if not self.auth():
             return False
 
-        client = self.__api
-
-        if client.sys.is_initialized() and not client.sys.is_sealed() and client.is_authenticated():
-            policy_backends = client.sys.list_policies()
-
-            policies = self.__config_bundle.get_whole_bundle_config(ConfigType.POLICY)
+        if self.__snapshot.is_running() and self.__snapshot.is_authenticated():
+            policy_names = self.__snapshot.policies()
 
-            for policy in policies:
-                if self.__config_bundle.is_bundle_config_enabled(ConfigType.POLICY, policy):
-                    self.__log.info(f'Enabling policy {policy}.')
+            policies = self.__reconciler.select(ConfigType.POLICY, names)
 
-                    client.sys.create_or_update_policy(policy, policies[policy]['config'])
-                elif f'{policy}/' in policy_backends:
-                    self.__log.info(f'Disabling policy {policy}.')
-
-                    client.sys.delete_policy(policy)
+            self.__apply_all(ConfigType.POLICY, policies,
+                             lambda policy: self.__reconciler.policy(policy, policies[policy], policy_names))
 
             return True
         else:
             return False
 
     @synchronized
-    def enable_auth_backends(self):
+    def enable_auth_backends(self, names: set = None):
         if not self.auth():
             return False
 
-        client = self.__api
-
-        if client.sys.is_initialized() and not client.sys.is_sealed() and client.is_authenticated():
-            self.__enable_incluster_kube_auth()
+        if self.__snapshot.is_running() and self.__snapshot.is_authenticated():
+            if names is None:
+                self.__drive(self.__reconciler.internal_kube_auth(self.__token_manager.jwt))
 
-            auth_backends = client.sys.list_auth_methods()
+            auth_backends = self.__snapshot.auth_methods()
 
-            auth_list = self.__config_bundle.get_whole_bundle_config(ConfigType.AUTH)
+            auth_list = self.__reconciler.select(ConfigType.AUTH, names)
 
-            for auth_path in auth_list:
-                auth_type = auth_list[auth_path]['type']
-
-                if self.__config_bundle.is_bundle_config_enabled(ConfigType.AUTH, auth_path):
-                    self.__log.info(f'Enabling {auth_type} on path /{auth_path}.')
-
-                    client.sys.enable_auth_method(method_type=auth_type,
-                                                  description=auth_list[auth_path]["description"],
-                                                  path=auth_path)
-                elif f'{auth_path}/' in auth_backends:
-                    self.__log.info(f'Disabling {auth_type} on path /{auth_path}.')
-
-                    client.sys.disable_auth_method(auth_path)
+            self.__apply_all(ConfigType.AUTH, auth_list,
+                             lambda auth_path: self.__reconciler.auth(auth_path, auth_list[auth_path], auth_backends))
 
             return True
         else:
             return False
 
     @synchronized
-    def apply_auth_roles(self):
+    def apply_auth_roles(self, names: set = None):
         if not self.auth():
             return False
 
-        client = self.__api
-
-        if client.sys.is_initialized() and not client.sys.is_sealed() and client.is_authenticated():
-            auth_backends = client.sys.list_auth_methods()
-
-            roles = self.__config_bundle.get_whole_bundle_config(ConfigType.ROLE)
+        if self.__snapshot.is_running() and self.__snapshot.is_authenticated():
+            auth_backends = self.__snapshot.auth_methods()
 
-            for role_name in roles:
-                role = roles[role_name]
+            roles = self.__reconciler.select(ConfigType.ROLE, names)
 
-                if f'{role["auth_path"]}/' in auth_backends and role['type'] in self.__role_actions \
-                        and self.__config_bundle.is_bundle_config_enabled(ConfigType.ROLE, role_name):
-                    self.__role_actions[role['type']](role_name, role)
-                elif f'{role["auth_path"]}/' in auth_backends:
-                    self.__api.delete(f'auth/{role["auth_path"]}/config')
+            self.__apply_all(ConfigType.ROLE, roles,
+                             lambda role_name: self.__reconciler.role(role_name, roles[role_name], auth_backends))
 
             return True
         else:
             return False
 
     @synchronized
-    def init_vault(self) -> bool:
-        client = self.__api
-
-        if not client.sys.is_initialized():
-            self.__log.info('Vault is not initialized. Initializing...')
-
-            init_result = client.sys.initialize(
-                self.__vault_properties.vault_key_shares,
-                self.__vault_properties.vault_key_threshold
-            )
-
-            unseal_keys = init_result['keys']
-            self.__root_token = init_result['root_token']
-
-            if client.sys.is_initialized() and client.sys.is_sealed():
-                log_message = f"Vault was initialized! Performing unseal... Please, share this info only with " \
-                              f"trusted sources!'"
-
-                for key in unseal_keys:
-                    self.__api.sys.submit_unseal_key(key)
+    def export_configs(self, directory: str = None) -> dict:
+        if not self.__snapshot.is_authenticated() and not self.auth():
+            raise VaultClientNotAuthenticatedException()
 
-                    log_message += f"\n{VaultClient.KEY_SEPARATOR}\n Vault unseal key: {key} \n{VaultClient.KEY_SEPARATOR}"
+        return HCLExporter(self.__api, self.__snapshot, directory or self.__vault_properties.vault_export_path,
+                           self.__vault_properties.vault_export_concurrency,
+                           (self.__vault_properties.vault_lock_mount,) if self.__vault_properties.vault_lock_enabled
+                           else (), self.__vault_properties.vault_export_wrap_ttl,
+                           self.__vault_properties.vault_client_log_level).export()
 
-                self.__log.info(log_message)
-                self.__log.info('Vault was unsealed.')
-        else:
-            self.__log.info('Vault was already initialized.')
+    @synchronized
+    def init_vault(self) -> bool:
+        self.__snapshot.refresh()
 
-        return client.sys.is_initialized() and not client.sys.is_sealed()
+        return self.__drive(self.__reconciler.init_vault(self.adopt_root_token))
@@ -0,0 +1,146 @@
+import ctypes
+import ctypes.util
+import glob
+import os
+import select
+import struct
+import time
+
+from util import Logger
+from .cache import HCLCache
+
+
+class Inotify(object):
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_NONBLOCK = os.O_NONBLOCK
+
+    MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    EVENT_SIZE = struct.calcsize('iIII')
+
+    def __init__(self, paths: list):
+        self.__libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+
+        self.__fd = self.__libc.inotify_init1(Inotify.IN_NONBLOCK)
+
+        if self.__fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        for path in paths:
+            if self.__libc.inotify_add_watch(self.__fd, path.encode(), Inotify.MASK) < 0:
+                os.close(self.__fd)
+
+                raise OSError(ctypes.get_errno(), f'inotify_add_watch failed for {path}')
+
+    @classmethod
+    def create(cls, paths: list):
+        try:
+            return Inotify(paths)
+        except (OSError, AttributeError):
+            return None
+
+    def wait(self, timeout: float) -> bool:
+        readable, _, _ = select.select([self.__fd], [], [], timeout)
+
+        if not readable:
+            return False
+
+        self.drain()
+
+        return True
+
+    def drain(self):
+        try:
+            while os.read(self.__fd, 64 * Inotify.EVENT_SIZE):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self):
+        os.close(self.__fd)
+
+
+class HCLWatcher(object):
+    def __init__(self, paths: list, poll_seconds: float = 10, debounce_seconds: float = 1, log_level: str = 'INFO'):
+        self.__log = Logger.getLogger(HCLWatcher.__name__)
+        self.__log.setLevel(log_level)
+
+        self.__paths = [path for path in paths if os.path.isdir(path)]
+        self.__poll_seconds = poll_seconds
+        self.__debounce_seconds = debounce_seconds
+
+        self.__files = self.__scan()
+        self.__inotify = Inotify.create(self.__paths)
+
+        self.__log.info(f'Watching {", ".join(self.__paths)} for HCL changes using '
+                        f'{"inotify" if self.__inotify else f"polling every {poll_seconds}s"}.')
+
+    def __scan(self) -> dict:
+        files = {}
+
+        for path in self.__paths:
+            for filename in glob.glob(os.path.join(path, '*.hcl')):
+                try:
+                    stat = os.stat(filename)
+                except FileNotFoundError:
+                    continue
+
+                files[filename] = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'hash': None}
+
+        return files
+
+    @classmethod
+    def __digest(cls, filename: str):
+        try:
+            with open(filename, 'rb') as f:
+                return HCLCache.digest(f.read())
+        except FileNotFoundError:
+            return None
+
+    def __changes(self) -> set:
+        current = self.__scan()
+        changed = set(self.__files.keys() ^ current.keys())
+
+        for filename in self.__files.keys() & current.keys():
+            previous = self.__files[filename]
+            state = current[filename]
+
+            if previous['mtime'] == state['mtime'] and previous['size'] == state['size']:
+                state['hash'] = previous['hash']
+                continue
+
+            state['hash'] = HCLWatcher.__digest(filename)
+
+            if previous['hash'] is None or previous['hash'] != state['hash']:
+                changed.add(filename)
+
+        self.__files = current
+
+        return changed
+
+    def wait(self) -> set:
+        while True:
+            if self.__inotify is not None:
+                if not self.__inotify.wait(self.__poll_seconds):
+                    continue
+
+                time.sleep(self.__debounce_seconds)
+                self.__inotify.drain()
+            else:
+                time.sleep(self.__poll_seconds)
+
+            changed = self.__changes()
+
+            if changed:
+                self.__log.info(f'Detected changes in {", ".join(sorted(changed))}.')
+
+                return changed
+
+    def close(self):
+        if self.__inotify is not None:
+            self.__inotify.close()
@@ -0,0 +1,15 @@
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# properties and the log file are resolved against HOME when the modules are imported
+HOME = tempfile.mkdtemp(prefix='vault-init-tests-')
+
+os.makedirs(os.path.join(HOME, 'logs'))
+shutil.copy(os.path.join(ROOT, 'application.properties'), HOME)
+
+os.environ['HOME'] = HOME
+sys.path.insert(0, os.path.join(ROOT, 'src'))
@@ -0,0 +1,66 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from requests.exceptions import ConnectionError
+
+from metrics import Metrics
+from util import PooledSession
+from vault.adapter import InstrumentedAdapter
+from vault.limiter import RetryPolicy
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requests = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        Handler.requests += 1
+
+        # the request was read, so the connection drops after Vault may have acted on it
+        self.close_connection = True
+
+
+def retries(reason: str) -> float:
+    return Metrics.REGISTRY.get_sample_value('vault_init_vault_request_retries_total', {'reason': reason}) or 0
+
+
+def adapter(address: str) -> InstrumentedAdapter:
+    return InstrumentedAdapter(base_uri=address, session=PooledSession(), retry=RetryPolicy(2, 0, 0))
+
+
+def test_the_session_does_not_retry_on_its_own():
+    assert PooledSession().get_adapter('http://vault:8200').max_retries.total == 0
+
+
+def test_a_login_is_retried_when_the_connection_was_never_opened():
+    with socket.socket() as closed:
+        closed.bind(('127.0.0.1', 0))
+        port = closed.getsockname()[1]
+
+    before = retries(ConnectionError.__name__)
+
+    with pytest.raises(ConnectionError):
+        adapter(f'http://127.0.0.1:{port}').request('POST', '/v1/auth/kubernetes/login', json={'role': 'internal'})
+
+    assert retries(ConnectionError.__name__) == before + 2
+
+
+def test_a_login_that_reached_vault_is_not_retried():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    Handler.requests = 0
+
+    try:
+        with pytest.raises(ConnectionError):
+            adapter(f'http://127.0.0.1:{server.server_port}').request('POST', '/v1/auth/kubernetes/login',
+                                                                      json={'role': 'internal'})
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert Handler.requests == 1
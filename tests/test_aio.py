@@ -0,0 +1,117 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import aiohttp
+import pytest
+from hvac import exceptions
+
+from vault.aio import AsyncVaultApi, AsyncVaultClient
+from vault.limiter import AdaptiveLimiter, RetryPolicy
+
+
+class TokenManager(object):
+    active = False
+
+    def __init__(self):
+        self.logins = 0
+
+    def token(self) -> str:
+        self.logins += 1
+
+        return 'token'
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    paths = []
+    unavailable = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        Handler.paths.append((self.path, self.headers.get('X-Vault-Token')))
+
+        if Handler.unavailable:
+            Handler.unavailable -= 1
+            status, payload = 503, {'errors': ['Vault is sealed']}
+        elif self.headers.get('X-Vault-Token') == 'token':
+            status, payload = 200, {'data': {'id': 'token'}}
+        else:
+            status, payload = 403, {'errors': ['permission denied']}
+
+        self.__reply(status, payload)
+
+    do_PUT = do_POST = do_GET
+
+    def __reply(self, status: int, payload: dict):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        body = json.dumps(payload).encode()
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def vault():
+    Handler.paths = []
+    Handler.unavailable = 0
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield f'http://127.0.0.1:{server.server_port}'
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_auth_logs_in_before_the_first_token(vault):
+    token_manager = TokenManager()
+    client = AsyncVaultClient(None, token_manager, vault)
+
+    try:
+        assert client.blocking().auth()
+    finally:
+        client.close_client()
+
+    assert token_manager.logins == 1
+    assert Handler.paths == [('/v1/auth/token/lookup-self', 'token')]
+
+
+def call(address: str, limiter: AdaptiveLimiter, method: str, path: str, payload: dict = None):
+    async def send():
+        async with aiohttp.ClientSession() as session:
+            api = AsyncVaultApi(address, session, limiter, RetryPolicy(2, base_seconds=0.01))
+            api.token = 'token'
+
+            return await api.request(method, path, payload)
+
+    return asyncio.run(send())
+
+
+def test_request_retries_through_the_limiter(vault):
+    limiter = AdaptiveLimiter('test-async-retry', initial_limit=8)
+    Handler.unavailable = 1
+
+    assert call(vault, limiter, 'GET', 'auth/token/lookup-self') == {'data': {'id': 'token'}}
+
+    assert len(Handler.paths) == 2
+    assert limiter.in_flight == 0
+    assert limiter.limit == 4
+
+
+def test_request_does_not_retry_check_and_set_writes(vault):
+    limiter = AdaptiveLimiter('test-async-cas', initial_limit=8)
+    Handler.unavailable = 1
+
+    with pytest.raises(exceptions.VaultDown):
+        call(vault, limiter, 'POST', 'kv/data/leader', {'options': {'cas': 0}, 'data': {}})
+
+    assert len(Handler.paths) == 1
+    assert limiter.in_flight == 0
@@ -0,0 +1,69 @@
+import json
+
+from util import Checkpoint
+
+
+def lines(path) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_resumes_with_the_same_digest(tmp_path):
+    path = str(tmp_path / 'checkpoint.jsonl')
+
+    checkpoint = Checkpoint(path, 'digest')
+    checkpoint.confirm('secret', 'kv', action='updated')
+    checkpoint.close()
+
+    resumed = Checkpoint(path, 'digest')
+
+    assert resumed.active
+    assert resumed.confirmed('secret', 'kv')
+    assert not resumed.confirmed('policy', 'kv')
+
+
+def test_discards_when_the_digest_changes(tmp_path):
+    path = str(tmp_path / 'checkpoint.jsonl')
+
+    checkpoint = Checkpoint(path, 'digest')
+    checkpoint.confirm('secret', 'kv')
+    checkpoint.close()
+
+    changed = Checkpoint(path, 'changed')
+    changed.close()
+
+    assert not changed.confirmed('secret', 'kv')
+    assert lines(path) == [{'version': 'changed'}]
+
+
+def test_ignores_a_truncated_last_line(tmp_path):
+    path = tmp_path / 'checkpoint.jsonl'
+    path.write_text('{"version": "digest"}\n{"kind": "secret", "name": "kv"}\n{"kind": "policy", "na')
+
+    checkpoint = Checkpoint(str(path), 'digest')
+    checkpoint.confirm('policy', 'admin')
+    checkpoint.close()
+
+    assert checkpoint.confirmed('secret', 'kv')
+    assert lines(path) == [{'version': 'digest'}, {'kind': 'secret', 'name': 'kv'},
+                           {'kind': 'policy', 'name': 'admin'}]
+
+
+def test_complete_removes_the_file(tmp_path):
+    path = tmp_path / 'checkpoint.jsonl'
+
+    checkpoint = Checkpoint(str(path), 'digest')
+    checkpoint.confirm('secret', 'kv')
+    checkpoint.complete()
+
+    assert not path.exists()
+    assert not checkpoint.active
+    assert not checkpoint.confirmed('secret', 'kv')
+
+
+def test_confirms_nothing_without_a_path():
+    checkpoint = Checkpoint()
+    checkpoint.confirm('secret', 'kv')
+
+    assert not checkpoint.active
+    assert not checkpoint.confirmed('secret', 'kv')
@@ -0,0 +1,34 @@
+import requests
+
+from vault.cluster import VaultCluster
+
+
+def cluster(discovered: list, refresh_seconds: float) -> VaultCluster:
+    session = requests.Session()
+    session.timeout_seconds = 1
+
+    return VaultCluster(lambda: discovered.append(1) or ['http://127.0.0.1:9'], session,
+                        refresh_seconds=refresh_seconds)
+
+
+def test_health_reuses_discovered_replicas():
+    discovered = []
+    nodes = cluster(discovered, 60)
+
+    for _ in range(3):
+        assert list(nodes.health()) == ['http://127.0.0.1:9']
+
+    assert len(discovered) == 1
+
+    nodes.refresh()
+    assert len(discovered) == 2
+
+
+def test_health_discovers_again_when_replicas_are_stale():
+    discovered = []
+    nodes = cluster(discovered, 0)
+
+    nodes.health()
+    nodes.health()
+
+    assert len(discovered) == 2
@@ -0,0 +1,206 @@
+import os
+import shutil
+
+import pytest
+
+from exceptions import ValidationException
+from vault.config import ConfigType, HCLConfigBundle, VaultProperties
+from vault.reconcile import Reconciler, VaultRequest
+
+
+def policy(name: str, enabled: bool = True, capabilities: str = 'read') -> str:
+    return f'''policy "{name}" {{
+  enabled = {str(enabled).lower()}
+
+  config {{
+    path "kv/*" {{
+      capabilities = ["{capabilities}"]
+    }}
+  }}
+}}
+'''
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    shutil.copy(os.path.join(os.environ['HOME'], 'application.properties'), tmp_path)
+
+    for config in ConfigType:
+        os.makedirs(tmp_path / config.path.lstrip('/'))
+
+    monkeypatch.setenv('HOME', str(tmp_path))
+
+    return tmp_path
+
+
+def write(home, config_type: ConfigType, filename: str, *entries: str) -> str:
+    path = home / config_type.path.lstrip('/') / filename
+    path.write_text(''.join(entries))
+
+    return str(path)
+
+
+def test_reload_returns_added_changed_and_removed_names(home):
+    admin = write(home, ConfigType.POLICY, 'admin.hcl', policy('admin'), policy('audit'))
+    write(home, ConfigType.POLICY, 'dev.hcl', policy('dev'))
+    bundle = HCLConfigBundle()
+
+    write(home, ConfigType.POLICY, 'admin.hcl', policy('admin', capabilities='list'), policy('ops'))
+
+    assert bundle.reload({admin}) == {ConfigType.POLICY: {'admin', 'audit', 'ops'}}
+    assert set(bundle.get_whole_bundle_config(ConfigType.POLICY)) == {'admin', 'dev', 'ops'}
+    assert set(bundle.get_removed_bundle_config(ConfigType.POLICY)) == {'audit'}
+    assert not bundle.is_bundle_config_enabled(ConfigType.POLICY, 'audit')
+
+
+def test_a_deleted_file_removes_all_its_names(home):
+    dev = write(home, ConfigType.POLICY, 'dev.hcl', policy('dev'), policy('qa'))
+    bundle = HCLConfigBundle()
+
+    os.remove(dev)
+
+    assert bundle.reload({dev}) == {ConfigType.POLICY: {'dev', 'qa'}}
+    assert bundle.get_whole_bundle_config(ConfigType.POLICY) == {}
+
+
+def test_an_unchanged_reload_reports_nothing(home):
+    dev = write(home, ConfigType.POLICY, 'dev.hcl', policy('dev'))
+    bundle = HCLConfigBundle()
+    digest = bundle.digest
+
+    assert bundle.reload({dev}) == {}
+    assert bundle.digest == digest
+
+
+def test_a_name_added_back_is_no_longer_removed(home):
+    dev = write(home, ConfigType.POLICY, 'dev.hcl', policy('dev'))
+    bundle = HCLConfigBundle()
+
+    write(home, ConfigType.POLICY, 'dev.hcl')
+    bundle.reload({dev})
+    write(home, ConfigType.POLICY, 'dev.hcl', policy('dev'))
+
+    assert bundle.reload({dev}) == {ConfigType.POLICY: {'dev'}}
+    assert bundle.get_removed_bundle_config(ConfigType.POLICY) == {}
+
+
+def test_removed_names_are_reconciled_as_disabled(home):
+    dev = write(home, ConfigType.POLICY, 'dev.hcl', policy('dev'), policy('qa'))
+    bundle = HCLConfigBundle()
+
+    write(home, ConfigType.POLICY, 'dev.hcl', policy('dev'))
+    changes = bundle.reload({dev})
+
+    reconciler = Reconciler(bundle, None)
+    entries = reconciler.select(ConfigType.POLICY, changes[ConfigType.POLICY])
+
+    assert set(entries) == {'qa'}
+    assert set(reconciler.select(ConfigType.POLICY)) == {'dev'}
+
+    plan = reconciler.policy('qa', entries['qa'], ['default', 'dev', 'qa'])
+    request = next(plan)
+
+    assert (request.method, request.path) == (VaultRequest.DELETE, 'sys/policy/qa')
+
+
+def properties(home, **values) -> VaultProperties:
+    path = home / 'application.properties'
+    lines = path.read_text().splitlines()
+
+    for key, value in values.items():
+        lines = [f'{key} = {value}' if line.partition('=')[0].strip() == key else line for line in lines]
+
+    path.write_text('\n'.join(lines) + '\n')
+
+    return VaultProperties()
+
+
+def test_target_namespaces_are_read_by_name(home):
+    assert properties(home, **{'vault.targets.namespaces': ' dev = vault-dev, prod=vault '}) \
+        .vault_targets_namespaces == {'dev': 'vault-dev', 'prod': 'vault'}
+
+
+def test_a_target_namespace_needs_a_name(home):
+    with pytest.raises(ValidationException):
+        properties(home, **{'vault.targets.namespaces': 'vault-dev'}).vault_targets_namespaces
+
+
+def cached_bundle(home) -> HCLConfigBundle:
+    return HCLConfigBundle(cache_path=str(home / 'cache' / 'hcl.cache'))
+
+
+def test_a_warm_cache_skips_parsing(home):
+    write(home, ConfigType.POLICY, 'dev.hcl', policy('dev'))
+    write(home, ConfigType.POLICY, 'qa.hcl', policy('qa'))
+
+    cold = cached_bundle(home)
+    warm = cached_bundle(home)
+
+    assert (cold.cache.hits, cold.cache.misses) == (0, 2)
+    assert (warm.cache.hits, warm.cache.misses) == (2, 0)
+    assert warm.digest == cold.digest
+
+
+def test_a_touched_file_is_matched_by_its_hash(home):
+    dev = write(home, ConfigType.POLICY, 'dev.hcl', policy('dev'))
+    cached_bundle(home)
+
+    stat = os.stat(dev)
+    os.utime(dev, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    touched = cached_bundle(home)
+
+    assert (touched.cache.hits, touched.cache.misses) == (1, 0)
+    assert cached_bundle(home).cache.hits == 1
+
+
+def test_a_changed_file_is_parsed_again(home):
+    dev = write(home, ConfigType.POLICY, 'dev.hcl', policy('dev'))
+    cached_bundle(home)
+
+    write(home, ConfigType.POLICY, 'dev.hcl', policy('dev', capabilities='list'))
+    stat = os.stat(dev)
+    os.utime(dev, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    changed = cached_bundle(home)
+
+    assert (changed.cache.hits, changed.cache.misses) == (0, 1)
+    assert changed.get_bundle_config(ConfigType.POLICY, 'dev')['config']['path']['kv/*']['capabilities'] == ['list']
+
+
+def test_an_unreadable_cache_is_ignored(home):
+    write(home, ConfigType.POLICY, 'dev.hcl', policy('dev'))
+    os.makedirs(home / 'cache')
+    (home / 'cache' / 'hcl.cache').write_bytes(b'not a cache')
+
+    bundle = cached_bundle(home)
+
+    assert (bundle.cache.hits, bundle.cache.misses) == (0, 1)
+    assert cached_bundle(home).cache.hits == 1
+
+
+def test_an_entry_defined_twice_is_rejected(home):
+    write(home, ConfigType.POLICY, 'dev.hcl', policy('dev'))
+    write(home, ConfigType.POLICY, 'qa.hcl', policy('qa'), policy('dev'))
+
+    with pytest.raises(ValidationException, match='"dev" is defined both in'):
+        HCLConfigBundle()
+
+
+def test_a_reload_with_a_duplicate_keeps_the_previous_entries(home):
+    write(home, ConfigType.POLICY, 'dev.hcl', policy('dev'))
+    qa = write(home, ConfigType.POLICY, 'qa.hcl', policy('qa'))
+    bundle = HCLConfigBundle()
+
+    write(home, ConfigType.POLICY, 'qa.hcl', policy('qa', capabilities='list'), policy('dev'))
+
+    with pytest.raises(ValidationException):
+        bundle.reload({qa})
+
+    assert set(bundle.get_whole_bundle_config(ConfigType.POLICY)) == {'dev', 'qa'}
+    assert bundle.get_bundle_config(ConfigType.POLICY, 'qa')['config']['path']['kv/*']['capabilities'] == ['read']
+
+
+def test_parse_workers_load_the_same_bundle(home):
+    for name in ('dev', 'qa', 'prod', 'ops'):
+        write(home, ConfigType.POLICY, f'{name}.hcl', policy(name))
+
+    assert HCLConfigBundle(parse_workers=2).digest == HCLConfigBundle().digest
@@ -0,0 +1,39 @@
+import pytest
+
+from vault.config import ConfigType, HCLParser
+from vault.export import HCLWriter
+
+
+def round_trip(config_type: ConfigType, name: str, body: dict) -> dict:
+    return HCLParser.loads(HCLWriter.dumps(config_type, name, body))[config_type.config_type][name]
+
+
+@pytest.mark.parametrize('config_type, body', [
+    (ConfigType.AUTH, {'enabled': True, 'type': 'github', 'description': 'GitHub "org" logins'}),
+    (ConfigType.SECRET, {'enabled': False, 'engine': 'kv-v2', 'description': ''}),
+    (ConfigType.ROLE, {'enabled': True, 'type': 'kubernetes', 'auth_path': 'dev', 'bound_service_account_name': 'dev',
+                       'bound_service_account_namespace': 'elpis-dev', 'wrap_ttl': '1h',
+                       'policies': ['kube-dev', 'default'], 'ttl': 3600, 'token_bound_cidrs': []})
+])
+def test_entries_parse_back_to_the_same_config(config_type, body):
+    assert round_trip(config_type, 'dev', body) == body
+
+
+def test_policies_with_several_paths_are_stable():
+    body = {'enabled': True, 'config': {'path': {
+        'kv/data/*': {'capabilities': ['read', 'list']},
+        'sys/policies/acl/"quoted"': {'capabilities': ['deny']}}}}
+
+    exported = HCLWriter.dumps(ConfigType.POLICY, 'admin', body)
+    parsed = round_trip(ConfigType.POLICY, 'admin', body)
+
+    assert parsed['config']['path'] == [{'kv/data/*': {'capabilities': ['read', 'list']}},
+                                        {'sys/policies/acl/"quoted"': {'capabilities': ['deny']}}]
+    assert HCLWriter.dumps(ConfigType.POLICY, 'admin', parsed) == exported
+
+
+def test_names_that_are_not_identifiers_are_quoted():
+    body = {'enabled': True, 'config': {'path': {'kv/*': {'capabilities': ['read'], 'allowed_parameters': {
+        'key.with.dots': ['a']}}}}}
+
+    assert round_trip(ConfigType.POLICY, 'team/admin', body)['config']['path'] == body['config']['path']
@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from instrument import Call, Hook, Instrumentation, JsonLinesSink, MetricsHook, SpanExporter
+from metrics import Metrics
+
+
+class Recorder(Hook):
+    def __init__(self):
+        self.started = []
+        self.ended = []
+
+    def on_start(self, call: Call):
+        self.started.append(call)
+
+    def on_end(self, call: Call):
+        self.ended.append(call)
+
+
+class Broken(Hook):
+    def on_start(self, call: Call):
+        raise RuntimeError('broken')
+
+    def on_end(self, call: Call):
+        raise RuntimeError('broken')
+
+
+@pytest.fixture
+def subscribe():
+    hooks = []
+
+    def subscribe(hook: Hook) -> Hook:
+        hooks.append(Instrumentation.subscribe(hook))
+
+        return hook
+
+    yield subscribe
+
+    for hook in hooks:
+        Instrumentation.unsubscribe(hook)
+        hook.close()
+
+
+def test_calls_are_free_without_hooks():
+    assert not Instrumentation.enabled()
+    assert Instrumentation.start(Instrumentation.VAULT, 'GET', '/v1/sys/health') is None
+
+    Instrumentation.end(None, 200)
+
+
+def test_a_broken_hook_does_not_stop_the_others(subscribe):
+    subscribe(Broken())
+    recorder = subscribe(Recorder())
+
+    call = Instrumentation.start(Instrumentation.VAULT, 'GET', '/v1/sys/health')
+    Instrumentation.end(call, 200, 12)
+
+    assert recorder.started == recorder.ended == [call]
+    assert (call.status, call.bytes, call.error) == (200, 12, None)
+    assert call.duration >= 0 and call.ended_at >= call.started_at
+
+
+def test_errors_are_recorded_by_type(subscribe):
+    recorder = subscribe(Recorder())
+
+    Instrumentation.end(Instrumentation.start(Instrumentation.KUBERNETES, 'GET', '/api/v1/pods'),
+                        error=TimeoutError('slow'))
+
+    assert recorder.ended[0].to_dict()['error'] == 'TimeoutError'
+
+
+def test_metrics_hook_observes_the_templated_path(subscribe):
+    subscribe(MetricsHook())
+    labels = {'method': 'GET', 'path': '/sys/policy/:name', 'status': '200'}
+    before = Metrics.REGISTRY.get_sample_value('vault_init_vault_request_duration_seconds_count', labels) or 0
+
+    Instrumentation.end(Instrumentation.start(Instrumentation.VAULT, 'GET', '/v1/sys/policy/admin'), 200)
+
+    assert Metrics.REGISTRY.get_sample_value('vault_init_vault_request_duration_seconds_count', labels) == before + 1
+
+
+def test_json_lines_sink_writes_one_line_per_call(subscribe, tmp_path):
+    path = tmp_path / 'trace' / 'calls.jsonl'
+    sink = subscribe(JsonLinesSink(str(path)))
+
+    for status in (200, 404):
+        Instrumentation.end(Instrumentation.start(Instrumentation.VAULT, 'GET', '/v1/kv/app'), status)
+
+    sink.close()
+
+    assert [json.loads(line)['status'] for line in path.read_text().splitlines()] == [200, 404]
+
+
+def test_span_exporter_batches_and_flushes_on_close(subscribe, tmp_path):
+    path = tmp_path / 'spans.json'
+    exporter = subscribe(SpanExporter(str(path), batch_size=2))
+
+    for status in (200, 500, 204):
+        Instrumentation.end(Instrumentation.start(Instrumentation.VAULT, 'PUT', '/v1/sys/policy/admin'), status)
+
+    exporter.close()
+
+    batches = [json.loads(line)['resourceSpans'][0]['scopeSpans'][0]['spans'] for line in path.read_text().splitlines()]
+
+    assert [len(spans) for spans in batches] == [2, 1]
+    assert [span['status']['code'] for span in batches[0]] == [SpanExporter.STATUS_OK, SpanExporter.STATUS_ERROR]
@@ -0,0 +1,154 @@
+import base64
+import queue
+import time
+
+import pytest
+from kubernetes.client import V1ListMeta, V1ObjectMeta, V1Pod, V1PodSpec, V1Secret, V1SecretList
+
+import kube.client
+from constants import EnvConstants
+from kube.client import KubernetesClient, SecretIndex
+
+
+def secret(name: str, sa_name: str, jwt: str, resource_version: str) -> V1Secret:
+    return V1Secret(metadata=V1ObjectMeta(name=name, resource_version=resource_version,
+                                          annotations={SecretIndex.SA_NAME_ANNOTATION: sa_name}),
+                    type=SecretIndex.SA_TOKEN_TYPE,
+                    data={'token': base64.b64encode(jwt.encode()).decode(),
+                          'ca.crt': base64.b64encode(b'ca').decode()})
+
+
+class CoreV1Api(object):
+    def __init__(self, *secrets: V1Secret):
+        self.secrets = list(secrets)
+        self.lists = 0
+        self.pods = {}
+        self.reads = 0
+
+    def list_namespaced_secret(self, namespace: str, field_selector: str = None, **kwargs):
+        self.lists += 1
+
+        return V1SecretList(items=list(self.secrets), metadata=V1ListMeta(resource_version=str(self.lists)))
+
+    def read_namespaced_pod(self, name: str, namespace: str):
+        self.reads += 1
+
+        return V1Pod(spec=V1PodSpec(containers=[], service_account=self.pods[(namespace, name)]))
+
+
+class Watch(object):
+    events = None
+    streams = []
+
+    def stream(self, func, **kwargs):
+        Watch.streams.append(kwargs)
+
+        while True:
+            event = Watch.events.get()
+
+            if event is None:
+                return
+
+            yield event
+
+    def stop(self):
+        Watch.events.put(None)
+
+
+@pytest.fixture
+def events(monkeypatch):
+    monkeypatch.setattr(Watch, 'events', queue.Queue())
+    monkeypatch.setattr(Watch, 'streams', [])
+    monkeypatch.setattr(kube.client.watch, 'Watch', Watch)
+
+    return Watch.events
+
+
+def eventually(check, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        if check():
+            return True
+
+        time.sleep(0.01)
+
+    return check()
+
+
+def test_lists_service_account_tokens_once(events):
+    api = CoreV1Api(secret('dev-token', 'dev', 'jwt-1', '1'))
+    index = SecretIndex(api, 'dev')
+
+    assert index.get('dev') == {'jwt': 'jwt-1', 'ca': 'ca'}
+    assert index.get('qa') == {}
+    assert api.lists == 1
+    assert eventually(lambda: Watch.streams)
+    assert Watch.streams[0]['resource_version'] == '1'
+
+    index.close()
+
+
+def test_watch_events_update_the_index(events):
+    api = CoreV1Api(secret('dev-token', 'dev', 'jwt-1', '1'))
+    index = SecretIndex(api, 'dev')
+
+    events.put({'type': 'MODIFIED', 'object': secret('dev-token', 'dev', 'jwt-2', '2')})
+    events.put({'type': 'ADDED', 'object': secret('qa-token', 'qa', 'jwt-3', '3')})
+
+    assert eventually(lambda: index.get('dev').get('jwt') == 'jwt-2' and index.get('qa'))
+
+    events.put({'type': 'DELETED', 'object': secret('dev-token', 'dev', 'jwt-2', '4')})
+
+    assert eventually(lambda: index.get('dev') == {})
+    assert api.lists == 1
+
+    index.close()
+
+
+def test_an_expired_watch_lists_again(events):
+    api = CoreV1Api(secret('dev-token', 'dev', 'jwt-1', '1'))
+    index = SecretIndex(api, 'dev')
+
+    api.secrets = [secret('dev-token', 'dev', 'jwt-2', '5')]
+    events.put({'type': 'ERROR', 'object': None})
+
+    assert eventually(lambda: index.get('dev').get('jwt') == 'jwt-2')
+    assert eventually(lambda: len(Watch.streams) == 2)
+    assert (api.lists, Watch.streams[1]['resource_version']) == (2, '2')
+
+    index.close()
+
+
+def kubernetes_client(monkeypatch, api: CoreV1Api, ttl: float) -> KubernetesClient:
+    monkeypatch.delenv(EnvConstants.K8S_ADDRESS, raising=False)
+    monkeypatch.setattr(kube.client.config, 'load_kube_config', lambda **kwargs: None)
+    monkeypatch.setattr(kube.client.client, 'CoreV1Api', lambda api_client: api)
+
+    return KubernetesClient(pod_account_ttl=ttl)
+
+
+def test_pod_service_accounts_are_cached(monkeypatch):
+    api = CoreV1Api()
+    api.pods[('vault', 'vault-0')] = 'vault'
+    client = kubernetes_client(monkeypatch, api, 60)
+
+    assert client.get_service_account_name_for_pod('vault-0', 'vault') == 'vault'
+
+    api.pods[('vault', 'vault-0')] = 'vault-server'
+
+    assert client.get_service_account_name_for_pod('vault-0', 'vault') == 'vault'
+    assert api.reads == 1
+
+
+def test_pod_service_accounts_expire(monkeypatch):
+    api = CoreV1Api()
+    api.pods[('vault', 'vault-0')] = 'vault'
+    client = kubernetes_client(monkeypatch, api, 0)
+
+    assert client.get_service_account_name_for_pod('vault-0', 'vault') == 'vault'
+
+    api.pods[('vault', 'vault-0')] = 'vault-server'
+
+    assert client.get_service_account_name_for_pod('vault-0', 'vault') == 'vault-server'
+    assert api.reads == 2
@@ -0,0 +1,111 @@
+import pytest
+
+from exceptions import CircuitOpenException
+from vault.limiter import AdaptiveLimiter, CircuitBreaker
+
+
+def test_breaker_opens_at_the_failure_threshold():
+    breaker = CircuitBreaker(failure_threshold=3, open_seconds=5)
+
+    assert not breaker.record(False, 0)
+    assert not breaker.record(False, 1)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    assert breaker.record(False, 2)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.wait_seconds(4) == pytest.approx(3)
+
+
+def test_breaker_lets_one_trial_through_when_half_open():
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=5)
+    breaker.record(False, 0)
+
+    assert breaker.wait_seconds(5) == 0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.wait_seconds(5) is None
+
+
+def test_breaker_closes_after_a_healthy_trial():
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=5)
+    breaker.record(False, 0)
+    breaker.wait_seconds(5)
+
+    assert breaker.record(True, 6)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.wait_seconds(6) == 0
+    assert not breaker.record(True, 7)
+
+
+def test_breaker_reopens_longer_after_a_failed_trial():
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=5, max_open_seconds=8)
+    breaker.record(False, 0)
+    breaker.wait_seconds(5)
+
+    assert breaker.record(False, 6)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.wait_seconds(6) == pytest.approx(8)
+
+    breaker.wait_seconds(14)
+    breaker.record(True, 15)
+
+    breaker.record(False, 16)
+    assert breaker.wait_seconds(16) == pytest.approx(5)
+
+
+def test_limiter_backs_off_once_per_round_trip():
+    limiter = AdaptiveLimiter('test-backoff', initial_limit=8)
+
+    first = limiter.acquire(False)
+    second = limiter.acquire(False)
+
+    limiter.release(first, True)
+    assert limiter.limit == 4
+
+    # started before the first back-off, so it reports the same congestion
+    limiter.release(second, True)
+    assert limiter.limit == 4
+
+    limiter.release(limiter.acquire(False), True)
+    assert limiter.limit == 2
+    assert limiter.in_flight == 0
+
+
+def test_limiter_keeps_the_minimum_limit():
+    limiter = AdaptiveLimiter('test-minimum', initial_limit=2, min_limit=1)
+
+    for _ in range(3):
+        limiter.release(limiter.acquire(False), True)
+
+    assert limiter.limit == 1
+
+
+def test_limiter_grows_additively_on_success():
+    # only the failures back off here, not the latency of the calls
+    limiter = AdaptiveLimiter('test-growth', initial_limit=2, max_limit=3, latency_tolerance=float('inf'))
+
+    for _ in range(2):
+        limiter.release(limiter.acquire(False), False)
+
+    assert limiter.limit == 2
+
+    limiter.release(limiter.acquire(False), False)
+    assert limiter.limit == 3
+
+    for _ in range(10):
+        limiter.release(limiter.acquire(False), False)
+
+    assert limiter.limit == 3
+
+
+def test_limiter_holds_writes_while_the_circuit_is_open():
+    limiter = AdaptiveLimiter('test-circuit', breaker=CircuitBreaker(failure_threshold=1, open_seconds=60),
+                              max_wait_seconds=0.1)
+
+    limiter.release(limiter.acquire(True), True)
+    assert limiter.circuit == CircuitBreaker.OPEN
+
+    # reads are not held back by the circuit
+    limiter.release(limiter.acquire(False), True)
+
+    with pytest.raises(CircuitOpenException):
+        limiter.acquire(True)
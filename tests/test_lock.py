@@ -0,0 +1,152 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from hvac import exceptions
+
+from constants import InitConstants
+from vault.lock import LeaderLock
+
+
+class KvStore(object):
+    def __init__(self):
+        self.versions = []
+        self.writes = 0
+
+    def read_secret_version(self, path: str, mount_point: str) -> dict:
+        if not self.versions:
+            raise exceptions.InvalidPath()
+
+        return {'data': {'data': self.versions[-1], 'metadata': {'version': len(self.versions)}}}
+
+    def read_secret_metadata(self, path: str, mount_point: str) -> dict:
+        raise exceptions.InvalidPath()
+
+    def create_or_update_secret(self, path: str, secret: dict, cas: int, mount_point: str) -> dict:
+        self.writes += 1
+
+        if cas != len(self.versions):
+            raise exceptions.InvalidRequest('check-and-set parameter did not match the current version')
+
+        self.versions.append(secret)
+
+        return {'data': {'version': len(self.versions)}}
+
+
+class Snapshot(object):
+    def mounts(self) -> dict:
+        return {'vault-init/': {'type': 'kv'}}
+
+
+def leader_lock(store: KvStore) -> LeaderLock:
+    api = SimpleNamespace(secrets=SimpleNamespace(kv=SimpleNamespace(v2=store)))
+
+    return LeaderLock(api, Snapshot(), lambda: True, 'vault-init', 'leader', lease_seconds=30, poll_seconds=0.01,
+                      wait_seconds=1)
+
+
+def heartbeats() -> int:
+    return sum(1 for thread in threading.enumerate() if thread.name == LeaderLock.__name__)
+
+
+@pytest.fixture
+def store():
+    return KvStore()
+
+
+def test_follows_a_live_holder(store):
+    store.versions.append({'holder': 'other', 'bundle': 'digest', 'expires_at': time.time() + 30, 'result': None})
+    lock = leader_lock(store)
+
+    assert lock.elect(None, 'digest')
+    assert not lock.leading
+    assert store.writes == 0
+
+
+def test_takes_over_an_expired_lease(store):
+    store.versions.append({'holder': 'other', 'bundle': 'digest', 'expires_at': time.time() - 1, 'result': None})
+    lock = leader_lock(store)
+
+    try:
+        assert lock.elect(None, 'digest')
+        assert lock.leading
+        assert store.versions[-1]['holder'] == lock.identity
+    finally:
+        lock.close()
+
+
+def test_loses_the_check_and_set_race(store):
+    lock = leader_lock(store)
+    write = store.create_or_update_secret
+
+    def race(path: str, secret: dict, cas: int, mount_point: str) -> dict:
+        store.versions.append({'holder': 'other', 'bundle': 'digest', 'expires_at': time.time() + 30,
+                               'result': None})
+
+        return write(path, secret, cas, mount_point)
+
+    store.create_or_update_secret = race
+
+    assert lock.elect(None, 'digest')
+    assert not lock.leading
+    assert store.versions[-1]['holder'] == 'other'
+
+
+def test_keeps_a_retried_write_that_landed(store):
+    lock = leader_lock(store)
+    write = store.create_or_update_secret
+
+    def retried(path: str, secret: dict, cas: int, mount_point: str) -> dict:
+        write(path, secret, cas, mount_point)
+
+        return write(path, secret, cas, mount_point)
+
+    store.create_or_update_secret = retried
+
+    try:
+        assert lock.elect(None, 'digest')
+        assert lock.leading
+    finally:
+        lock.close()
+
+
+def test_reuses_a_finished_result_for_the_same_bundle(store):
+    store.versions.append({'holder': 'other', 'bundle': 'digest', 'expires_at': time.time() - 1,
+                           'result': InitConstants.FINISHED_STATE, 'finished_at': time.time()})
+
+    follower = leader_lock(store)
+
+    assert follower.elect(None, 'digest')
+    assert not follower.leading
+    assert store.writes == 0
+
+    leader = leader_lock(store)
+
+    try:
+        assert leader.elect(None, 'changed')
+        assert leader.leading
+        assert store.versions[-1]['bundle'] == 'changed'
+    finally:
+        leader.close()
+
+
+def test_release_and_elect_again_keep_one_heartbeat(store):
+    lock = leader_lock(store)
+    running = heartbeats()
+
+    try:
+        for succeeded in (True, False, True):
+            assert lock.elect(None, f'digest-{succeeded}')
+            assert lock.leading
+            assert heartbeats() == running + 1
+
+            lock.touch()
+            lock.release(succeeded)
+
+            assert not lock.leading
+            assert heartbeats() == running
+    finally:
+        lock.close()
+
+    assert store.versions[-1]['result'] == InitConstants.FINISHED_STATE
@@ -0,0 +1,101 @@
+import json
+import logging
+import sys
+import threading
+
+from util import Logger
+from util.logger import JsonFormatter, RecordQueueHandler, RingBufferHandler
+
+
+def record(message: str, *args, level: int = logging.INFO, exc_info=None) -> logging.LogRecord:
+    return logging.LogRecord('test', level, __file__, 1, message, args, exc_info)
+
+
+def failure():
+    try:
+        raise ValueError('bad value')
+    except ValueError:
+        return sys.exc_info()
+
+
+def test_json_formatter_writes_one_object_per_record():
+    entry = json.loads(JsonFormatter().format(record('%s entries applied', 3, level=logging.WARNING,
+                                                     exc_info=failure())))
+
+    assert (entry['level'], entry['logger'], entry['message']) == ('WARNING', 'test', '3 entries applied')
+    assert entry['exception'].endswith('ValueError: bad value')
+    assert entry['time'].endswith('+00:00')
+
+
+def test_queued_records_are_merged_and_tagged_on_the_logging_thread():
+    with Logger.tagged('dev/policies'):
+        prepared = RecordQueueHandler(None).prepare(record('%s of %s', 1, 2, exc_info=failure()))
+
+    assert (prepared.msg, prepared.args, prepared.step) == ('1 of 2', None, 'dev/policies')
+    assert prepared.exc_info is None and 'ValueError: bad value' in prepared.exc_text
+    assert Logger.step() is None
+
+
+def test_sync_waits_for_queued_records():
+    log = Logger.getLogger('test_sync')
+    log.setLevel('INFO')
+
+    with Logger.tagged('sync-step'):
+        log.info('queued before the barrier')
+
+    assert Logger.sync()
+    assert Logger.buffer.tail('sync-step')[-1]['message'] == 'queued before the barrier'
+
+
+def buffered(handler: RingBufferHandler, step: str, *messages: str, level: int = logging.INFO):
+    with Logger.tagged(step):
+        for message in messages:
+            handler.handle(record(message, level=level))
+
+
+def test_tail_keeps_the_latest_records_per_step():
+    handler = RingBufferHandler(capacity=4, step_capacity=2)
+
+    buffered(handler, 'dev/init', 'one', 'two', 'three')
+    buffered(handler, 'dev/policies', 'four', 'five')
+
+    assert [entry['message'] for entry in handler.tail()] == ['two', 'three', 'four', 'five']
+    assert [entry['message'] for entry in handler.tail('dev/init')] == ['two', 'three']
+    assert [entry['message'] for entry in handler.tail('dev', lines=3)] == ['three', 'four', 'five']
+    assert handler.tail('dev/init', lines=0) == []
+    assert handler.tail('prod') == []
+
+
+def test_since_returns_newer_records_of_a_step():
+    handler = RingBufferHandler()
+
+    buffered(handler, 'dev/init', 'one')
+    sequence = handler.sequence
+    buffered(handler, 'prod/init', 'two')
+    buffered(handler, 'dev/init', 'three')
+
+    entries, latest = handler.since(sequence, 'dev')
+
+    assert [entry['message'] for entry in entries] == ['three']
+    assert latest == handler.sequence == 3
+
+
+def test_since_waits_for_the_next_record():
+    handler = RingBufferHandler()
+
+    assert handler.since(0, timeout=0.01) == ([], 0)
+
+    threading.Timer(0.05, buffered, (handler, 'dev/init', 'late')).start()
+    entries, latest = handler.since(0, timeout=5)
+
+    assert ([entry['message'] for entry in entries], latest) == (['late'], 1)
+
+
+def test_last_prefers_the_step_error():
+    handler = RingBufferHandler()
+
+    buffered(handler, 'dev/init', 'unseal failed', level=logging.ERROR)
+    buffered(handler, 'dev/init', 'retrying')
+
+    assert handler.last('dev/init').endswith(' - test - ERROR - unseal failed')
+    assert handler.last('prod/init') is None
@@ -0,0 +1,36 @@
+import pytest
+
+from metrics import Metrics
+
+
+@pytest.mark.parametrize('url, path', [
+    ('/v1/sys/health?standby=ok', '/sys/health'),
+    ('/v1/sys/policy/admin', '/sys/policy/:name'),
+    ('/v1/sys/policies/acl/admin/extra', '/sys/policies/:name'),
+    ('/v1/auth/dev/role/kube-dev', '/auth/:mount/role/:name'),
+    ('/v1/auth/kubernetes/login', '/auth/:mount/login'),
+    ('/v1/kv/data/app/db', '/:mount/:path'),
+    ('/v1/', '/')
+])
+def test_vault_paths_keep_the_label_set_small(url, path):
+    assert Metrics.vault_path(url) == path
+
+
+@pytest.mark.parametrize('url, path', [
+    ('https://10.0.0.1/api/v1/namespaces/vault/pods/vault-0', '/api/v1/namespaces/:namespace/pods/:name'),
+    ('https://10.0.0.1/api/v1/namespaces/vault/secrets?watch=true', '/api/v1/namespaces/:namespace/secrets'),
+    ('https://10.0.0.1/apis/apps/v1/namespaces/vault/statefulsets/vault',
+     '/apis/apps/v1/namespaces/:namespace/statefulsets/:name'),
+    ('https://10.0.0.1/api/v1/nodes/node-1', '/api/v1/nodes/:name')
+])
+def test_kubernetes_paths_keep_the_label_set_small(url, path):
+    assert Metrics.kube_path(url) == path
+
+
+def test_exposition_renders_the_registry():
+    Metrics.ENTRIES_APPLIED.labels('policy', 'updated').inc()
+
+    body, content_type = Metrics.exposition()
+
+    assert content_type.startswith('text/plain')
+    assert b'vault_init_entries_applied_total{action="updated",config_type="policy"}' in body
@@ -0,0 +1,140 @@
+import json
+import threading
+import time
+
+from metrics import Metrics
+from notification import NotificationEngine
+
+
+class FakeServer(object):
+    def __init__(self):
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def set_fn_new_client(self, fn):
+        self.connect = fn
+
+    def set_fn_client_left(self, fn):
+        self.leave = fn
+
+    def set_fn_message_received(self, fn):
+        self.receive = fn
+
+    def send_message(self, client, message):
+        with self.lock:
+            self.sent.append(json.loads(message))
+
+    def received(self, count: int, timeout: float = 5) -> list:
+        deadline = time.monotonic() + timeout
+
+        while time.monotonic() < deadline:
+            with self.lock:
+                if len(self.sent) >= count:
+                    return list(self.sent)
+
+            time.sleep(0.01)
+
+        return list(self.sent)
+
+
+def test_live_updates_wait_for_the_replay():
+    server = FakeServer()
+    engine = NotificationEngine(server)
+    client = {'id': 1, 'handler': None}
+
+    engine.notify({'init': {'state': 'finished'}}, 'init')
+    server.connect(client, server)
+    engine.notify({'up': {'state': 'active'}}, 'up')
+
+    time.sleep(0.1)
+    assert server.sent == []
+
+    server.receive(client, server, json.dumps({'since': 0}))
+    engine.notify({'up': {'state': 'finished'}}, 'up')
+
+    replay, update = server.received(2)
+
+    assert replay == {'seq': 2, 'replay': True,
+                      'steps': {'init': {'state': 'finished'}, 'up': {'state': 'active'}}}
+    assert update == {'seq': 3, 'steps': {'up': {'state': 'finished'}}}
+
+
+def test_unknown_history_is_replayed_as_a_snapshot():
+    server = FakeServer()
+    engine = NotificationEngine(server)
+    client = {'id': 1, 'handler': None}
+
+    engine.notify({'init': {'state': 'finished'}}, 'init')
+    server.connect(client, server)
+    server.receive(client, server, json.dumps({'since': 7}))
+
+    assert server.received(1) == [{'seq': 1, 'replay': True, 'snapshot': True,
+                                   'steps': {'init': {'state': 'finished'}}}]
+
+
+class BlockedServer(FakeServer):
+    def __init__(self):
+        super().__init__()
+
+        self.released = threading.Event()
+
+    def send_message(self, client, message):
+        self.released.wait(5)
+
+        super().send_message(client, message)
+
+
+def dropped(kind: str) -> float:
+    return Metrics.REGISTRY.get_sample_value('vault_init_notification_dropped_total', {'kind': kind}) or 0
+
+
+def test_queue_overflow_is_counted():
+    engine = NotificationEngine(FakeServer(), queue_size=0)
+    before = dropped('message')
+
+    for step in ('init', 'up', 'auth'):
+        engine.notify({step: {'state': 'active'}})
+
+    assert engine.queue_depth == 0
+    assert engine.stats()['dropped_messages'] == 3
+    assert dropped('message') == before + 3
+
+
+def test_lagging_client_coalesces_updates_by_key():
+    server = BlockedServer()
+    engine = NotificationEngine(server, client_buffer_size=4)
+    client = {'id': 1, 'handler': None}
+
+    server.connect(client, server)
+    server.receive(client, server, json.dumps({'since': 0}))
+
+    for state in ('active', 'finished', 'active', 'finished'):
+        engine.notify({'up': {'state': state}}, 'up')
+
+    time.sleep(0.1)
+    assert engine.client_depths == {1: 1}
+    assert Metrics.REGISTRY.get_sample_value('vault_init_notification_client_queue_depth_max') == 1
+
+    server.released.set()
+
+    assert server.received(2)[-1] == {'seq': 4, 'steps': {'up': {'state': 'finished'}}}
+
+
+def test_lagging_client_is_dropped_on_overflow():
+    server = BlockedServer()
+    engine = NotificationEngine(server, client_buffer_size=2)
+    client = {'id': 1, 'handler': None}
+    before = dropped('client')
+
+    server.connect(client, server)
+    server.receive(client, server, json.dumps({'since': 0}))
+
+    for step in ('init', 'up', 'auth', 'secret'):
+        engine.notify({step: {'state': 'active'}}, step)
+
+    time.sleep(0.1)
+    server.released.set()
+
+    assert engine.client_depths == {}
+    assert engine.stats()['dropped_clients'] == 1
+    assert dropped('client') == before + 1
@@ -0,0 +1,71 @@
+import threading
+import time
+
+from util import Logger, TaskPool
+
+
+def test_collects_results_and_errors_by_item():
+    pool = TaskPool(4, 'test-errors')
+
+    def task(item: int) -> int:
+        if item % 3 == 0:
+            raise ValueError(f'bad {item}')
+
+        return item * 2
+
+    try:
+        results, errors = pool.run(task, range(1, 10))
+    finally:
+        pool.close()
+
+    assert results == {item: item * 2 for item in range(1, 10) if item % 3}
+    assert sorted(errors) == [3, 6, 9]
+    assert all(isinstance(error, ValueError) and str(error) == f'bad {item}' for item, error in errors.items())
+
+
+def test_runs_at_most_workers_tasks_at_once():
+    pool = TaskPool(3, 'test-bounded')
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def task(item: int):
+        with lock:
+            running.append(item)
+            peak.append(len(running))
+
+        time.sleep(0.01)
+
+        with lock:
+            running.remove(item)
+
+    try:
+        results, errors = pool.run(task, range(12))
+    finally:
+        pool.close()
+
+    assert len(results) == 12 and not errors
+    assert max(peak) <= 3
+
+
+def test_runs_inline_with_one_worker():
+    pool = TaskPool(1)
+    threads = set()
+
+    results, errors = pool.run(lambda item: threads.add(threading.current_thread()) or 1 / item, [1, 0])
+
+    assert results == {1: 1.0}
+    assert isinstance(errors[0], ZeroDivisionError)
+    assert threads == {threading.current_thread()}
+
+
+def test_tasks_keep_the_caller_step_tag():
+    pool = TaskPool(2, 'test-tagged')
+
+    try:
+        with Logger.tagged('secret'):
+            results, _ = pool.run(lambda item: Logger.step(), ['a', 'b'])
+    finally:
+        pool.close()
+
+    assert results == {'a': 'secret', 'b': 'secret'}
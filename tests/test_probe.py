@@ -0,0 +1,77 @@
+import pytest
+
+from exceptions import HealthProbeFailedException
+from vault import probe
+from vault.probe import HealthProbe
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Response(object):
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(probe, 'time', clock)
+
+    return clock
+
+
+def health_probe(**kwargs) -> HealthProbe:
+    return HealthProbe(**dict(dict(failure_threshold=5, initial_delay_seconds=0, period_seconds=1,
+                                   success_threshold=1, timeout_seconds=10, connect_timeout_seconds=2,
+                                   max_period_seconds=5, backoff_multiplier=2, jitter=0, deadline_seconds=600),
+                              **kwargs))
+
+
+def test_backs_off_exponentially_up_to_the_max_period(clock):
+    unhealthy = health_probe()
+
+    with pytest.raises(HealthProbeFailedException):
+        unhealthy.run(lambda timeout: Response(503))
+
+    assert clock.sleeps == [0, 1, 2, 4, 5]
+    assert unhealthy.attempts == 5
+    assert unhealthy.is_closed()
+    assert not unhealthy.run(lambda timeout: Response(200))
+
+
+def test_stops_at_the_deadline_and_shortens_the_timeouts(clock):
+    timeouts = []
+    unhealthy = health_probe(deadline_seconds=6)
+
+    def request(timeout: tuple):
+        timeouts.append(timeout)
+        clock.now += 1
+
+        raise ConnectionError('refused')
+
+    with pytest.raises(HealthProbeFailedException):
+        unhealthy.run(request)
+
+    assert clock.sleeps == [0, 1, 2, 0]
+    assert timeouts == [(2, 6), (2, 4), (1, 1)]
+    assert clock.now - 100 == 6
+
+
+def test_reports_the_time_to_ready(clock):
+    responses = iter([Response(503), Response(503), Response(200)])
+    healthy = health_probe()
+
+    assert healthy.run(lambda timeout: next(responses))
+    assert healthy.attempts == 3
+    assert healthy.time_to_ready == 3
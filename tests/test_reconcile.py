@@ -0,0 +1,102 @@
+import pytest
+
+from constants import ReconcileConstants
+from vault.reconcile import Reconciler, VaultRequest
+
+ROLE = {
+    'auth_path': 'dev',
+    'bound_service_account_name': 'dev',
+    'bound_service_account_namespace': 'elpis-dev',
+    'wrap_ttl': '1h',
+    'policies': ['kube-dev', 'default'],
+    'type': 'kubernetes'
+}
+
+
+class ConfigBundle(object):
+    def is_bundle_config_enabled(self, config_type, name: str) -> bool:
+        return True
+
+
+class KubernetesClient(object):
+    def __init__(self):
+        self.jwt = 'jwt-1'
+
+    def get_service_account_secrets(self, sa_name: str, namespace: str) -> dict:
+        return {'jwt': self.jwt, 'ca': 'ca'}
+
+
+class Vault(object):
+    def __init__(self):
+        self.data = {}
+        self.writes = []
+
+    def send(self, request: VaultRequest):
+        if request.method == VaultRequest.CALL:
+            return request()
+
+        if request.method == VaultRequest.READ:
+            return {'data': dict(self.data[request.path])} if request.path in self.data else None
+
+        self.writes.append((request.path, request.data))
+
+        # like Vault, the reviewer JWT is never read back and lists are returned for the bound names
+        self.data[request.path] = {key: [value] if key.startswith('bound_') and isinstance(value, str) else value
+                                   for key, value in request.data.items() if key != 'token_reviewer_jwt'}
+
+    def apply(self, plan):
+        try:
+            request = next(plan)
+
+            while True:
+                request = plan.send(tuple(self.send(each) for each in request)
+                                    if isinstance(request, tuple) else self.send(request))
+        except StopIteration as e:
+            return e.value
+
+
+@pytest.fixture
+def kube_client(monkeypatch):
+    monkeypatch.setenv('KUBERNETES_PORT_443_TCP_ADDR', '10.0.0.1')
+
+    return KubernetesClient()
+
+
+@pytest.fixture
+def reconciler(kube_client):
+    return Reconciler(ConfigBundle(), kube_client)
+
+
+def test_an_unchanged_role_is_only_read(reconciler):
+    vault = Vault()
+
+    assert vault.apply(reconciler.role('kube-dev', ROLE, {'dev/': {}})) == ReconcileConstants.UPDATED
+    assert [path for path, _ in vault.writes] == ['auth/dev/config', 'auth/dev/role/kube-dev']
+
+    vault.writes.clear()
+
+    assert vault.apply(reconciler.role('kube-dev', ROLE, {'dev/': {}})) == ReconcileConstants.UNCHANGED
+    assert vault.writes == []
+
+
+def test_a_rotated_reviewer_jwt_is_pushed(reconciler, kube_client):
+    vault = Vault()
+    vault.apply(reconciler.role('kube-dev', ROLE, {'dev/': {}}))
+    vault.writes.clear()
+
+    kube_client.jwt = 'jwt-2'
+
+    assert vault.apply(reconciler.role('kube-dev', ROLE, {'dev/': {}})) == ReconcileConstants.UPDATED
+    assert [(path, data['token_reviewer_jwt']) for path, data in vault.writes] == [('auth/dev/config', 'jwt-2')]
+
+
+def test_a_new_process_pushes_the_reviewer_jwt_once(reconciler, kube_client):
+    vault = Vault()
+    vault.apply(reconciler.role('kube-dev', ROLE, {'dev/': {}}))
+    vault.writes.clear()
+
+    restarted = Reconciler(ConfigBundle(), kube_client)
+
+    assert vault.apply(restarted.role('kube-dev', ROLE, {'dev/': {}})) == ReconcileConstants.UPDATED
+    assert vault.apply(restarted.role('kube-dev', ROLE, {'dev/': {}})) == ReconcileConstants.UNCHANGED
+    assert [path for path, _ in vault.writes] == ['auth/dev/config']
@@ -0,0 +1,66 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from util import PooledSession
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    clients = []
+    headers_seen = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        Handler.clients.append(self.client_address)
+        Handler.headers_seen.append(dict(self.headers))
+
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+@pytest.fixture
+def address():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    Handler.clients, Handler.headers_seen = [], []
+
+    yield f'http://127.0.0.1:{server.server_port}'
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_requests_reuse_the_pooled_connection(address):
+    session = PooledSession(pool_size=2)
+
+    for _ in range(3):
+        assert session.get(f'{address}/v1/sys/health').status_code == 200
+
+    assert len(set(Handler.clients)) == 1
+
+
+def test_keep_alive_can_be_turned_off(address):
+    session = PooledSession(keep_alive=False)
+
+    for _ in range(2):
+        session.get(f'{address}/v1/sys/health')
+
+    assert len(set(Handler.clients)) == 2
+    assert Handler.headers_seen[0]['Connection'] == 'close'
+
+
+def test_requests_get_the_default_timeout(monkeypatch):
+    timeouts = []
+    session = PooledSession(timeout_seconds=7)
+
+    monkeypatch.setattr(session, 'send', lambda request, **kwargs: timeouts.append(kwargs['timeout']))
+
+    session.get('http://vault:8200/v1/sys/health')
+    session.get('http://vault:8200/v1/sys/health', timeout=(1, 2))
+
+    assert timeouts == [7, (1, 2)]
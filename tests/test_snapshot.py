@@ -0,0 +1,111 @@
+import threading
+
+from metrics import Metrics
+from vault.snapshot import VaultSnapshot
+
+
+class Api(object):
+    def __init__(self):
+        self.token = 'token'
+        self.reads = []
+        self.mounts = {'kv/': {'type': 'kv'}}
+        self.policies = ['default']
+        self.loading = None
+
+    def read(self, path: str):
+        self.reads.append(path)
+
+        if self.loading is not None and path == 'sys/mounts':
+            started, resume = self.loading
+            started.set()
+            resume.wait(5)
+
+        return dict(self.mounts) if path == 'sys/mounts' else {'policies': list(self.policies)}
+
+    def is_authenticated(self) -> bool:
+        self.reads.append('auth/token/lookup-self')
+
+        return True
+
+
+def lookups(result: str) -> float:
+    return Metrics.REGISTRY.get_sample_value('vault_init_snapshot_lookups_total',
+                                             {'key': VaultSnapshot.MOUNTS, 'result': result}) or 0
+
+
+def test_reads_each_listing_once_until_invalidated():
+    api = Api()
+    snapshot = VaultSnapshot(api)
+    hits, misses = lookups('hit'), lookups('miss')
+
+    assert snapshot.mounts() == {'kv/': {'type': 'kv'}}
+    assert snapshot.mounts() == {'kv/': {'type': 'kv'}}
+    assert api.reads == ['sys/mounts']
+    assert (snapshot.hits, snapshot.misses) == (1, 1)
+    assert (lookups('hit'), lookups('miss')) == (hits + 1, misses + 1)
+
+    api.mounts['secret/'] = {'type': 'kv'}
+    snapshot.invalidate(VaultSnapshot.MOUNTS)
+
+    assert 'secret/' in snapshot.mounts()
+    assert api.reads == ['sys/mounts', 'sys/mounts']
+
+
+def test_update_applies_a_write_to_the_cached_listing():
+    api = Api()
+    snapshot = VaultSnapshot(api)
+
+    snapshot.policies()
+    snapshot.update(VaultSnapshot.POLICIES, lambda policies: policies.append('admin'))
+
+    assert snapshot.policies() == ['default', 'admin']
+    assert api.reads == ['sys/policy']
+
+
+def test_refresh_drops_every_listing():
+    api = Api()
+    snapshot = VaultSnapshot(api)
+
+    snapshot.mounts()
+    snapshot.policies()
+    snapshot.refresh()
+    snapshot.mounts()
+    snapshot.policies()
+
+    assert api.reads == ['sys/mounts', 'sys/policy', 'sys/mounts', 'sys/policy']
+
+
+def test_a_new_token_checks_authentication_again():
+    api = Api()
+    snapshot = VaultSnapshot(api)
+
+    assert snapshot.is_authenticated()
+    assert snapshot.is_authenticated()
+
+    api.token = 'renewed'
+
+    assert snapshot.is_authenticated()
+    assert api.reads == ['auth/token/lookup-self', 'auth/token/lookup-self']
+
+
+def test_a_load_does_not_block_other_keys_and_a_racing_write_is_not_cached():
+    api = Api()
+    snapshot = VaultSnapshot(api)
+    started, resume = threading.Event(), threading.Event()
+    api.loading = (started, resume)
+
+    loader = threading.Thread(target=snapshot.mounts)
+    loader.start()
+    started.wait(5)
+
+    assert snapshot.policies() == ['default']
+
+    api.mounts['secret/'] = {'type': 'kv'}
+    snapshot.update(VaultSnapshot.MOUNTS, lambda mounts: mounts.update({'secret/': {'type': 'kv'}}))
+
+    resume.set()
+    loader.join(5)
+    api.loading = None
+
+    assert 'secret/' in snapshot.mounts()
+    assert api.reads == ['sys/mounts', 'sys/policy', 'sys/mounts']
@@ -0,0 +1,140 @@
+import os
+
+import pytest
+
+from vault.token import TokenManager
+
+
+class Vault(object):
+    def __init__(self):
+        self.logins = []
+        self.renewals = []
+        self.lease_duration = 3600
+        self.renewable = True
+        self.down = False
+
+    def auth(self, token: str) -> dict:
+        return {'auth': {'client_token': token, 'lease_duration': self.lease_duration, 'renewable': self.renewable}}
+
+    def login(self, role: str, jwt: str, use_token: bool = True) -> dict:
+        self.logins.append((role, jwt, use_token))
+
+        return self.auth(f'login-{len(self.logins)}')
+
+    def renew(self, token: str) -> dict:
+        if self.down:
+            raise ConnectionError('Vault is down')
+
+        self.renewals.append(token)
+
+        return self.auth(f'renewed-{len(self.renewals)}')
+
+
+class Adapter(object):
+    def __init__(self, vault: Vault):
+        self.vault = vault
+        self.token = 'root'
+
+    def post(self, url: str) -> dict:
+        assert url == '/v1/auth/token/renew-self'
+
+        return self.vault.renew(self.token)
+
+
+class Kubernetes(object):
+    def __init__(self, vault: Vault):
+        self.login = vault.login
+
+
+class Auth(object):
+    def __init__(self, vault: Vault):
+        self.kubernetes = Kubernetes(vault)
+
+
+class Api(object):
+    def __init__(self, vault: Vault):
+        self.adapter = Adapter(vault)
+        self.auth = Auth(vault)
+
+
+@pytest.fixture
+def vault():
+    return Vault()
+
+
+@pytest.fixture
+def jwt_path(tmp_path):
+    path = tmp_path / 'token'
+    path.write_text('jwt-1')
+
+    return str(path)
+
+
+@pytest.fixture
+def manager(vault, jwt_path):
+    manager = TokenManager(Api(vault), 'internal', jwt_path)
+
+    yield manager
+
+    manager.close()
+
+
+def test_logs_in_once_and_reuses_the_token(vault, manager):
+    assert not manager.active
+    assert manager.token() == 'login-1'
+    assert manager.token() == 'login-1'
+    assert manager.active
+    assert vault.logins == [('internal', 'jwt-1', False)]
+
+
+def test_renews_with_its_own_token(vault, manager):
+    manager.token()
+
+    assert manager.renew() == 'renewed-1'
+    assert manager.renew() == 'renewed-2'
+    assert vault.renewals == ['login-1', 'renewed-1']
+    assert len(vault.logins) == 1
+
+
+def test_logs_in_again_when_renewal_fails(vault, manager):
+    manager.token()
+    vault.down = True
+
+    assert manager.renew() == 'login-2'
+
+
+def test_logs_in_again_at_the_max_ttl(vault, manager):
+    manager.token()
+    vault.lease_duration = TokenManager.MIN_RENEW_SECONDS
+
+    assert manager.renew() == 'login-2'
+    assert vault.renewals == ['login-1']
+
+
+def test_a_token_that_cannot_be_renewed_is_replaced(vault, manager):
+    vault.renewable = False
+    manager.token()
+
+    assert manager.renew() == 'login-2'
+    assert vault.renewals == []
+
+
+def test_a_rotated_jwt_is_read_again(vault, manager, jwt_path):
+    manager.token()
+
+    with open(jwt_path, 'w') as f:
+        f.write('jwt-2')
+
+    stat = os.stat(jwt_path)
+    os.utime(jwt_path, (stat.st_atime, stat.st_mtime + 1))
+
+    manager.login()
+
+    assert [jwt for _, jwt, _ in vault.logins] == ['jwt-1', 'jwt-2']
+
+
+def test_a_closed_manager_drops_its_token(manager):
+    manager.token()
+    manager.close()
+
+    assert not manager.active
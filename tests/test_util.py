@@ -0,0 +1,57 @@
+from constants import InitConstants
+from util import Checkpoint, Steps, StepGraph
+
+
+def test_skipped_steps_are_notified_with_the_reason():
+    steps = Steps().step('a').step('b').step('c')
+    updates = {}
+
+    graph = StepGraph(steps, lambda update, key=None: updates.update(update)) \
+        .node('a', lambda: False, 'A failed') \
+        .node('b', lambda: True, 'B needs A', 'a') \
+        .node('c', lambda: True, 'C needs B', 'b')
+
+    assert not graph.run()
+
+    assert updates['b'] == {'state': InitConstants.FAILED_STATE, 'trace': 'Skipped since a failed: B needs A'}
+    assert updates['c'] == {'state': InitConstants.FAILED_STATE, 'trace': 'Skipped since b failed: C needs B'}
+
+
+def test_resumable_steps_confirmed_by_the_checkpoint_are_skipped(tmp_path):
+    path = str(tmp_path / 'checkpoint.jsonl')
+
+    checkpoint = Checkpoint(path, 'digest')
+    checkpoint.confirm(Steps.CHECKPOINT_KIND, 'a')
+    checkpoint.confirm(Steps.CHECKPOINT_KIND, 'b')
+    checkpoint.close()
+
+    steps = Steps().with_checkpoint(Checkpoint(path, 'digest')).step('a').step('b').step('c')
+    runs = []
+
+    graph = StepGraph(steps, lambda update, key=None: None) \
+        .node('a', lambda: runs.append('a') or True, 'A failed') \
+        .node('b', lambda: runs.append('b') or True, 'B failed', 'a', resumable=True) \
+        .node('c', lambda: runs.append('c') or True, 'C failed', 'b', resumable=True)
+
+    assert graph.run()
+
+    assert runs == ['a', 'c']
+    assert {step: state['state'] for step, state in steps.to_dict().items()} == \
+           {'a': InitConstants.FINISHED_STATE, 'b': InitConstants.FINISHED_STATE, 'c': InitConstants.FINISHED_STATE}
+
+
+def test_finished_steps_are_confirmed_for_the_next_run(tmp_path):
+    path = str(tmp_path / 'checkpoint.jsonl')
+
+    steps = Steps().with_checkpoint(Checkpoint(path, 'digest')).step('a').step('b')
+
+    graph = StepGraph(steps, lambda update, key=None: None) \
+        .node('a', lambda: True, 'A failed', resumable=True) \
+        .node('b', lambda: False, 'B failed', 'a', resumable=True)
+
+    assert not graph.run()
+
+    resumed = Checkpoint(path, 'digest')
+
+    assert resumed.confirmed(Steps.CHECKPOINT_KIND, 'a')
+    assert not resumed.confirmed(Steps.CHECKPOINT_KIND, 'b')